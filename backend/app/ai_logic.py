@@ -1,22 +1,44 @@
-import os
 import json
-import google.generativeai as genai
 import re
 
-# APIキーの取得（.envは main.py で読み込まれるのでここでは os.getenv でOK）
-API_KEY = os.getenv("GOOGLE_API_KEY")
-if API_KEY:
-    genai.configure(api_key=API_KEY)
+from app.config import GOOGLE_API_KEY as API_KEY
+from app.core.clients import gemini_model
+from app.services.chat_stream_service import iter_chunk_texts
+from app.services.llm_gateway import run_llm, stream_llm
+from app.services.llm_providers import opinion_hedger
+from app.services.resilience import InvalidOutput
+
+# genai.configure と GenerativeModel の使い回しは app.core.clients が受け持つ
 
 MODEL_NAME = "gemini-2.5-flash-lite"
+# これより少ない意見しか返らない出力は不採用
+MIN_OPINIONS = 3
 
 # --- 1. 意見生成 (スコア付き) ---
-def generate_opinions(topic: str):
+def parse_opinions(text: str):
+    """
+    モデルの出力から意見のリストを取り出す。使えない出力は InvalidOutput（ヘッジ側で別プロバイダーの結果を待つ）
+    """
+    # Markdownの ```json ... ``` を除去する安全策
+    json_match = re.search(r'\[.*\]', text or "", re.DOTALL)
+    if not json_match:
+        raise InvalidOutput("no JSON list in the answer")
+    items = json.loads(json_match.group(0))
+    if not isinstance(items, list):
+        raise InvalidOutput("answer is not a list")
+    opinions = [
+        item for item in items
+        if isinstance(item, dict) and item.get("content") and isinstance(item.get("position_score", 0), (int, float))
+    ]
+    if len(opinions) < MIN_OPINIONS:
+        raise InvalidOutput(f"only {len(opinions)} usable opinions")
+    return opinions
+
+async def generate_opinions(topic: str):
     """
     テーマに基づいた意見、情報源、そしてポジションスコアを生成する
+    （OPINIONS_PROVIDERS の先頭に投げ、遅ければ次のプロバイダーにもヘッジして先に妥当な答えを返した方を使う）
     """
-    model = genai.GenerativeModel(MODEL_NAME, generation_config={"response_mime_type": "application/json"})
-    
     # ★修正: position_score を追加したプロンプト
     prompt = f"""
     テーマ「{topic}」について、異なる立場の意見を5つ生成してください。
@@ -48,28 +70,19 @@ def generate_opinions(topic: str):
     """
     
     try:
-        response = model.generate_content(prompt)
-        text = response.text
-        
-        # Markdownの ```json ... ``` を除去する安全策
-        json_match = re.search(r'\[.*\]', text, re.DOTALL)
-        if json_match:
-            text = json_match.group(0)
-            
-        return json.loads(text)
+        result = await opinion_hedger.run(prompt, parse_opinions, json_output=True)
+        if result.hedged:
+            print(f"opinions for {topic}: {result.provider} won after hedging ({result.latency:.1f}s)")
+        return result.value
     except Exception as e:
         print(f"Error in opinions: {e}")
         return []
 
 # --- 2. チャット応答 ---
-def generate_chat_reply(topic, opinion_title, opinion_body, history):
+def _start_opinion_chat(topic, opinion_title, opinion_body, history):
     """
-    チャットの返答を生成する
-    history: [{"role": "user", "parts": ["..."]}, ...]
+    意見の人物として振る舞うチャットセッションと、送信する最後のメッセージを返す
     """
-    if not API_KEY:
-        return {"reply": "APIキー設定エラー"}
-
     system_instruction = f"""
     あなたは「{topic}」というテーマにおける「{opinion_title}」という立場の人物として振る舞ってください。
     
@@ -80,21 +93,35 @@ def generate_chat_reply(topic, opinion_title, opinion_body, history):
     短く、対話的に、相手に問いかけるように返答してください。
     """
 
-    model = genai.GenerativeModel(MODEL_NAME, system_instruction=system_instruction)
-    
-    try:
-        # 最後のメッセージ以外を履歴として渡す
-        chat = model.start_chat(history=history[:-1])
-        # 最後のメッセージを送信
-        last_msg = history[-1]["parts"][0]
-        response = chat.send_message(last_msg)
-        
-        return {"reply": response.text}
-    except Exception as e:
-        print(f"Error in chat: {e}")
-        return {"reply": "すみません、うまく思考できませんでした。"}
+    model = gemini_model(MODEL_NAME, system_instruction=system_instruction)
+
+    # 最後のメッセージ以外を履歴として渡す
+    chat = model.start_chat(history=history[:-1])
+    last_msg = history[-1]["parts"][0]
+    return chat, last_msg
+
+async def send_opinion_chat(topic, opinion_title, opinion_body, history) -> str:
+    """
+    history の最後のメッセージを送って返答テキストを返す（失敗時は例外のまま）
+    サーバー側のチャットセッションは、成功したときだけ履歴に追記するためにこちらを使う
+    """
+    chat, last_msg = _start_opinion_chat(topic, opinion_title, opinion_body, history)
+    response = await run_llm(chat.send_message, last_msg)
+    return response.text
+
+async def stream_chat_reply(topic, opinion_title, opinion_body, history):
+    """
+    send_opinion_chat のストリーミング版。返答テキストを届いた順に yield する
+    """
+    if not API_KEY:
+        yield "APIキー設定エラー"
+        return
+
+    chat, last_msg = _start_opinion_chat(topic, opinion_title, opinion_body, history)
+    async for text in stream_llm(lambda: iter_chunk_texts(chat.send_message(last_msg, stream=True))):
+        yield text
 
 # --- 3. 座標分析 (今回は使わないかもですが残しておきます) ---
-def analyze_position(topic: str, history: list):
+async def analyze_position(topic: str, history: list):
     # 必要なら実装
     pass
\ No newline at end of file
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import Response
+
+from app.services.theme_store_service import ThemesSnapshot
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [t.strip() for t in if_none_match.split(",")]
+    # weak comparison (W/"...") is fine for a GET body
+    return any(t == etag or t == f"W/{etag}" for t in tags)
+
+
+# preferred order when the client accepts several
+_ENCODING_PREFERENCE = ("br", "gzip")
+
+
+def choose_encoding(accept_encoding: Optional[str], available) -> Optional[str]:
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for enc in _ENCODING_PREFERENCE:
+        if enc in available and accepted.get(enc, accepted.get("*", 0.0)) > 0:
+            return enc
+    return None
+
+
+def themes_snapshot_response(
+    snap: ThemesSnapshot,
+    if_none_match: Optional[str],
+    accept_encoding: Optional[str] = None,
+) -> Response:
+    """
+    Serve the pre-serialized (and pre-compressed) themes payload, or 304 if
+    the client already has it. `no-cache` makes browsers revalidate every
+    time, which is cheap here.
+    """
+    headers = {"ETag": snap.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, snap.etag):
+        return Response(status_code=304, headers=headers)
+
+    encoding = choose_encoding(accept_encoding, snap.encoded)
+    if encoding is None:
+        return Response(content=snap.body, media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(content=snap.encoded[encoding], media_type="application/json", headers=headers)
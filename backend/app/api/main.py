@@ -1,20 +1,37 @@
 # backend/app/api/main.py
 
+import asyncio
 import uuid
 import random
-from fastapi import FastAPI, HTTPException, Header
+from fastapi import FastAPI, HTTPException, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
-import google.generativeai as genai
 import urllib.parse
 import itertools
-from app.services.news_service import news_service
-
-from app.ai_logic import generate_opinions, generate_chat_reply, analyze_position
-from app.services.theme_store_service import list_themes_with_opinions, upsert_theme_and_opinions
-
-app = FastAPI()
+from app.services.news_service import news_service, user_locks
+
+from app.ai_logic import generate_opinions, send_opinion_chat, stream_chat_reply, analyze_position
+from app.config import GOOGLE_API_KEY, OPINIONS_CACHE_TTL_SECONDS, OPINIONS_CACHE_MAX_ENTRIES
+from app.services.chat_compaction import chat_compactor
+from app.services.chat_session_store import ChatSession, chat_sessions
+from app.services.chat_stream_service import END_MARKER, chat_event_stream, iter_chunk_texts
+from app.services.generation_cache import GenerationCache
+from app.services.llm_gateway import run_llm, stream_llm, gateway_stats
+from app.services.openai_data_collect_service import _normalize_topic_key
+from app.services.theme_store_service import get_themes_snapshot, themes_snapshot_if_fresh, list_themes_page, upsert_theme_and_opinions
+from app.api.http_cache import themes_snapshot_response
+from app.core.clients import client_stats, gemini_model
+from app.core.lifespan import lifespan
+from app.services.opinion_score_index import opinion_score_index
+from app.services.llm_providers import opinion_hedger
+from app.services.resilience import breaker_stats
+from app.services.seed_service import seed_stats
+from app.services.stance_distribution import stance_distributions
+from app.services.stance_store import stance_write_behind, VoteQueueFull
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -31,11 +48,16 @@ class ChatMessage(BaseModel):
     role: str
     parts: List[str]
 
+# newSession: true で送ると返答に sessionId が付き、以降は sessionId と新しい発言（message）だけを送ればよい。
+# どちらも無ければ従来どおり全履歴（最後が新しい発言）を毎回送る
 class ChatRequest(BaseModel):
-    topic: str
-    viewpoint: str
-    content: str
-    history: List[ChatMessage]
+    topic: Optional[str] = None
+    viewpoint: Optional[str] = None
+    content: Optional[str] = None
+    history: List[ChatMessage] = []
+    message: Optional[str] = None
+    sessionId: Optional[str] = None
+    newSession: bool = False
 
 class UserRegisterRequest(BaseModel):
     username: str
@@ -60,23 +82,54 @@ THEME_COLORS = [
 
 color_cycle = itertools.cycle(THEME_COLORS)
 
+# ストリーミング版チャット (Server-Sent Events) 用
+# event: token {"text"} を生成された順に送り、最後に event: done {"reply", "ended"} を送る
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 @app.get("/api/themes")
-async def api_get_themes():
+async def api_get_themes(
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    max_opinions: Optional[int] = Query(None, ge=0, le=100),
+):
+    # ページング・項目指定があるときは必要な行と列だけを Supabase から取る
+    if limit is not None or cursor or fields or max_opinions is not None:
+        try:
+            return await asyncio.to_thread(
+                list_themes_page, limit=limit or 20, cursor=cursor, fields=fields, max_opinions=max_opinions
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        data = list_themes_with_opinions()
-        # 最新の順に並べ替えたりする処理が必要ならここで
-        return data
+        # 組み立て済みのスナップショットを返す（書き込み時か一定時間経過で作り直す）
+        snap = themes_snapshot_if_fresh() or await asyncio.to_thread(get_themes_snapshot)
     except Exception as e:
         print(f"Fetch error: {e}")
         return {"themes": []}
+    return themes_snapshot_response(snap, if_none_match, accept_encoding)
+
+# 同じトピック（表記ゆれを正規化したもの）への生成は TTL の間使い回し、
+# 同時に来た同一トピックのリクエストは1回の生成を待ち合わせる
+opinions_cache = GenerationCache(
+    ttl_seconds=OPINIONS_CACHE_TTL_SECONDS,
+    max_entries=OPINIONS_CACHE_MAX_ENTRIES,
+)
 
 # backend/app/api/main.py の api_generate_opinions 関数
 
 @app.post("/api/opinions")
 async def api_generate_opinions(req: TopicRequest):
-    print(f"Generating opinions for: {req.topic}")
+    key = _normalize_topic_key(req.topic)
+    return await opinions_cache.get_or_create(key, lambda: _generate_theme_with_opinions(req.topic))
+
+async def _generate_theme_with_opinions(topic: str):
+    print(f"Generating opinions for: {topic}")
     
-    ai_raw_data = generate_opinions(req.topic)
+    ai_raw_data = await generate_opinions(topic)
     
     if not ai_raw_data:
         raise HTTPException(status_code=500, detail="AI generation failed")
@@ -86,7 +139,7 @@ async def api_generate_opinions(req: TopicRequest):
     
     theme_data = {
         "id": theme_id,
-        "title": req.topic,
+        "title": topic,
         "color": theme_color 
     }
 
@@ -103,7 +156,7 @@ async def api_generate_opinions(req: TopicRequest):
         opinion_id = str(uuid.uuid4()) # IDをここで生成
 
         # ★重要: ここでサービス層にスコアを登録する！
-        news_service.register_opinion(opinion_id, position_score)
+        news_service.register_opinion(opinion_id, position_score, theme_id)
 
         # 色決めロジック
         if position_score > 20:
@@ -114,7 +167,7 @@ async def api_generate_opinions(req: TopicRequest):
             op_color = "#F5F5F5" # グレー
         
         # Google検索URL
-        search_query = f"{req.topic} {viewpoint} {source_name}"
+        search_query = f"{topic} {viewpoint} {source_name}"
         encoded_query = urllib.parse.quote(search_query)
         google_search_url = f"https://www.google.com/search?q={encoded_query}"
 
@@ -130,30 +183,109 @@ async def api_generate_opinions(req: TopicRequest):
         })
 
     try:
-        upsert_theme_and_opinions(theme_data, formatted_opinions)
+        await asyncio.to_thread(upsert_theme_and_opinions, theme_data, formatted_opinions)
     except Exception as e:
         print(f"Database save error: {e}")
 
     return {
         "themes": [{
             "id": theme_id,
-            "title": req.topic,
+            "title": topic,
             "color": theme_color,
             "opinions": formatted_opinions
         }]
     }
 
-# チャット・分析APIはそのまま
+# 運用監視用のカウンタ
+@app.get("/api/metrics")
+async def api_metrics():
+    return {
+        "llmGateway": gateway_stats(),
+        "clients": client_stats(),
+        "opinionsCache": opinions_cache.stats(),
+        "stanceWriteBehind": stance_write_behind.stats(),
+        "userLocks": user_locks.stats(),
+        "opinionScoreIndex": opinion_score_index.stats(),
+        "stanceDistributions": stance_distributions.stats(),
+        "chatSessions": chat_sessions.stats(),
+        "chatCompaction": chat_compactor.stats(),
+        "circuitBreakers": breaker_stats(),
+        "opinionHedging": opinion_hedger.stats(),
+        "seedRuns": seed_stats(),
+    }
+
+# --- チャットセッション ---
+# 会話履歴とターン数はサーバー側（ワーカーのメモリ）に持ち、クライアントは毎ターン新しい発言だけを送る。
+# セッションが無い（期限切れ・別ワーカー）ときは 410 を返すので、クライアントは history 付きで送り直す
+def _resolve_chat_session(kind: str, session_id: Optional[str], new_session: bool, context: dict, history: List[dict]) -> ChatSession:
+    if session_id:
+        session = chat_sessions.get(session_id, kind)
+        if session is not None:
+            return session
+        if not history:
+            raise HTTPException(status_code=410, detail="チャットセッションが見つかりません。history を付けて送り直してください")
+    # 全履歴つきのリクエスト: その履歴でセッションを作る。
+    # sessionId / newSession が無い従来のクライアントには保存しない使い捨てのセッションを使う
+    if None in context.values():
+        raise HTTPException(status_code=422, detail="セッションが無いときは topic / viewpoint / content が必要です")
+    return chat_sessions.create(kind, context, history, store=bool(session_id) or new_session)
+
+def _session_fields(session: ChatSession) -> dict:
+    return {"sessionId": session.session_id} if chat_sessions.is_stored(session) else {}
+
+def _opinion_chat_turn(req: ChatRequest):
+    """(セッション, 送る発言) を返す"""
+    if req.message is not None:
+        history, message = [m.dict() for m in req.history], req.message
+    elif req.history:
+        history, message = [m.dict() for m in req.history[:-1]], req.history[-1].parts[0]
+    else:
+        raise HTTPException(status_code=422, detail="message か history が必要です")
+    context = {"topic": req.topic, "viewpoint": req.viewpoint, "content": req.content}
+    return _resolve_chat_session("opinion", req.sessionId, req.newSession, context, history), message
+
 @app.post("/api/chat")
 async def api_chat(req: ChatRequest):
-    history_dicts = [m.dict() for m in req.history]
-    result = generate_chat_reply(req.topic, req.viewpoint, req.content, history_dicts)
-    return result
+    session, message = _opinion_chat_turn(req)
+    ctx = session.context
+    if not GOOGLE_API_KEY:
+        return {"reply": "APIキー設定エラー", **_session_fields(session)}
+    try:
+        async with session.lock:
+            reply = await send_opinion_chat(
+                ctx["topic"], ctx["viewpoint"], ctx["content"],
+                chat_compactor.prompt_history(session) + [{"role": "user", "parts": [message]}],
+            )
+            chat_sessions.record_turn(session, message, reply)
+    except Exception as e:
+        print(f"Error in chat: {e}")
+        reply = "すみません、うまく思考できませんでした。"
+    return {"reply": reply, **_session_fields(session)}
+
+@app.post("/api/chat/stream")
+async def api_chat_stream(req: ChatRequest):
+    session, message = _opinion_chat_turn(req)
+    ctx = session.context
+
+    async def chunks():
+        async with session.lock:
+            parts = []
+            history = chat_compactor.prompt_history(session) + [{"role": "user", "parts": [message]}]
+            async for text in stream_chat_reply(ctx["topic"], ctx["viewpoint"], ctx["content"], history):
+                parts.append(text)
+                yield text
+            # 最後まで受け取れたターンだけを履歴に残す
+            chat_sessions.record_turn(session, message, "".join(parts))
+
+    return StreamingResponse(
+        chat_event_stream(chunks(), done_extra=_session_fields(session)),
+        media_type="text/event-stream", headers=SSE_HEADERS,
+    )
 
 @app.post("/api/analyze")
 async def api_analyze(req: AnalysisRequest):
     history_dicts = [m.dict() for m in req.history]
-    result = analyze_position(req.topic, history_dicts)
+    result = await analyze_position(req.topic, history_dicts)
     return result
 
 def get_chat_instruction(topic, viewpoint, content, turn_count):
@@ -236,45 +368,85 @@ class SimpleChatRequest(BaseModel):
     topic: Optional[str] = "自由テーマ"
     viewpoint: Optional[str] = "未定" # 賛成・反対など
     content: Optional[str] = "特になし" # ★追加: 見ている意見の本文
+    sessionId: Optional[str] = None # あれば history / topic などは送らなくてよい
+    newSession: bool = False # true ならセッションを作って sessionId を返す
+
+def _simple_chat_session(req: SimpleChatRequest) -> ChatSession:
+    # 会話履歴の変換
+    gemini_history = []
+    for h in req.history:
+        role = "user" if h['sender'] == 'user' else "model"
+        if h['sender'] == 'bot': role = "model"
+        gemini_history.append({"role": role, "parts": [h['text']]})
+    context = {"topic": req.topic, "viewpoint": req.viewpoint, "content": req.content}
+    return _resolve_chat_session("simple", req.sessionId, req.newSession, context, gemini_history)
+
+def _start_simple_chat(session: ChatSession):
+    """ターン数に応じた指示と会話履歴から Gemini のチャットセッションを作る"""
+    # ターン数の計算
+    current_turn = session.turn_count + 1
+    
+    # ★修正: リクエストから受け取ったテーマ情報を渡す
+    # ユーザーがまだ何も発言していない(turn=1)等の場合でも、
+    # 「見ている意見(req.content)」を文脈としてセットします。
+    system_instruction = get_chat_instruction(
+        topic=session.context["topic"],
+        viewpoint=session.context["viewpoint"],
+        content=session.context["content"],
+        turn_count=current_turn
+    )
+
+    model = gemini_model(
+        "gemini-2.5-flash-lite",
+        system_instruction=system_instruction
+    )
+    
+    # 古いターンは要約にまとめ、直近のターンだけをそのまま送る
+    return model.start_chat(history=chat_compactor.prompt_history(session))
+
+def _finish_simple_turn(session: ChatSession, message: str, reply: str) -> None:
+    if END_MARKER in reply:
+        # 会話が締めくくられたのでセッションは不要
+        chat_sessions.discard(session.session_id)
+    else:
+        chat_sessions.record_turn(session, message, reply)
 
 # 2. エンドポイントの修正
 @app.post("/simple-chat")
 async def simple_chat_endpoint(req: SimpleChatRequest):
+    session = _simple_chat_session(req)
     try:
-        # ターン数の計算
-        current_turn = (len(req.history) // 2) + 1
-        
-        # ★修正: リクエストから受け取ったテーマ情報を渡す
-        # ユーザーがまだ何も発言していない(turn=1)等の場合でも、
-        # 「見ている意見(req.content)」を文脈としてセットします。
-        system_instruction = get_chat_instruction(
-            topic=req.topic,
-            viewpoint=req.viewpoint,
-            content=req.content, 
-            turn_count=current_turn
-        )
+        async with session.lock:
+            chat = _start_simple_chat(session)
+            # Gemini呼び出しはゲートウェイ経由（イベントループを止めない）
+            response = await run_llm(chat.send_message, req.message)
+            _finish_simple_turn(session, req.message, response.text)
 
-        model = genai.GenerativeModel(
-            model_name="gemini-2.5-flash-lite",
-            system_instruction=system_instruction
-        )
-        
-        # 会話履歴の変換
-        gemini_history = []
-        for h in req.history:
-            role = "user" if h['sender'] == 'user' else "model"
-            if h['sender'] == 'bot': role = "model"
-            gemini_history.append({"role": role, "parts": [h['text']]})
-            
-        chat = model.start_chat(history=gemini_history)
-        response = chat.send_message(req.message)
-        
-        return {"reply": response.text}
+        return {"reply": response.text, **_session_fields(session)}
 
     except Exception as e:
         print(f"Chat Error: {e}")
-        return {"reply": "エラーが発生しました。"}
-        
+        return {"reply": "エラーが発生しました。", **_session_fields(session)}
+
+# ストリーミング版 (Server-Sent Events)
+@app.post("/simple-chat/stream")
+async def simple_chat_stream_endpoint(req: SimpleChatRequest):
+    session = _simple_chat_session(req)
+
+    async def chunks():
+        async with session.lock:
+            chat = _start_simple_chat(session)
+            parts = []
+            async for text in stream_llm(lambda: iter_chunk_texts(chat.send_message(req.message, stream=True))):
+                parts.append(text)
+                yield text
+            _finish_simple_turn(session, req.message, "".join(parts))
+
+    return StreamingResponse(
+        chat_event_stream(chunks(), done_extra=_session_fields(session)),
+        media_type="text/event-stream", headers=SSE_HEADERS,
+    )
+
 @app.post("/api/users/register")
 def api_register_user(req: UserRegisterRequest):
     print(f"Registering user: {req.username}")
@@ -310,10 +482,18 @@ async def api_vote(req: VoteRequest, x_user_id: str = Header(None, alias="X-User
     # ユーザーIDがない場合は仮のIDを使う（エラー回避）
     user_id = x_user_id or "default_user"
     
-    result = await news_service.update_stance_score(
-        user_id=user_id,        theme_id=req.themeId,        opinion_id=req.opinionId,
-        vote_type=req.voteType
-    )
+    try:
+        result = await news_service.update_stance_score(
+            user_id=user_id,        theme_id=req.themeId,        opinion_id=req.opinionId,
+            vote_type=req.voteType
+        )
+    except VoteQueueFull as e:
+        # 投票が殺到して書き込みが追いつかないときはバックプレッシャーをかける
+        raise HTTPException(
+            status_code=503,
+            detail="投票が混み合っています。少し待ってから再度お試しください。",
+            headers={"Retry-After": str(e.retry_after)},
+        )
     return result
 
 @app.get("/api/stance/{theme_id}")
@@ -321,4 +501,12 @@ async def api_get_stance(theme_id: str, x_user_id: str = Header(None, alias="X-U
     user_id = x_user_id or "default_user"
     
     result = await news_service.get_user_stance(user_id, theme_id)
-    return result
\ No newline at end of file
+    return result
+
+@app.get("/api/stance/{theme_id}/distribution")
+async def api_get_stance_distribution(theme_id: str, x_user_id: str = Header(None, alias="X-User-ID")):
+    # 全員の中で自分がどこにいるか（ヒストグラム＋パーセンタイル）。ユーザー数に関係なく一定時間で返す
+    user_id = x_user_id or "default_user"
+
+    result = await news_service.get_stance_distribution(user_id, theme_id)
+    return result
@@ -7,6 +7,7 @@ from fastapi import APIRouter, HTTPException, Header
 from pydantic import BaseModel
 from typing import List, Optional
 from app.services.news_service import news_service
+from app.services.stance_store import VoteQueueFull
 
 router = APIRouter()
 
@@ -131,6 +132,12 @@ async def vote(request: VoteRequest, user_id: str = Header(alias="X-User-ID")):
         return {
             "newScore": result.get("newScore", 0.0)
         }
+    except VoteQueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail="投票が混み合っています。少し待ってから再度お試しください。",
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,61 +1,126 @@
+import asyncio
+import json
+
 from fastapi import APIRouter, HTTPException
-from app.schemas.seed import SeedThemeRequest
+from fastapi.responses import StreamingResponse
+from app.config import STANCE_REPLAY_API_MAX_VOTES
+from app.schemas.seed import SeedThemeRequest, SeedBatchRequest, StanceReplayRequest
 from app.services.openai_data_collect_service import collect_topic_cards, stable_id
+from app.services.resilience import CircuitOpenError
 from app.services.themes_builder import build_theme_rows
-from app.services.theme_store_service import theme_exists, upsert_theme_and_opinions, insert_opinions_only, delete_opinions_for_theme
+from app.services.theme_store_service import theme_exists, insert_opinions_only, delete_opinions_for_theme
+from app.services.seed_service import seed_theme_once, ThemeAlreadyExists, SeedInProgress
+from app.services.seed_pipeline import run_seed_batch
+from app.services.stance_formula import get_formula
 
 router = APIRouter()
 
+def _circuit_open(e: CircuitOpenError) -> HTTPException:
+    # the provider is failing; tell the caller when to come back instead of queueing more calls
+    return HTTPException(
+        status_code=503,
+        detail=f"{e.provider} is unavailable; retry later.",
+        headers={"Retry-After": str(max(1, int(e.retry_after)))},
+    )
+
 @router.post("/seed-preview")
-def seed_preview(req: SeedThemeRequest):
+async def seed_preview(req: SeedThemeRequest):
     """
     Runs AI collection ONCE and returns the raw items.
     Does NOT write to Supabase.
     """
 
-    collected = collect_topic_cards(
-        topic=req.topic,
-        max_items=req.max_items,
-        theme_statement=req.theme_statement,
-        min_sources=4, 
-        max_per_url=2
-    )
+    try:
+        collected = await collect_topic_cards(
+            topic=req.topic,
+            max_items=req.max_items,
+            theme_statement=req.theme_statement,
+            min_sources=4, 
+            max_per_url=2
+        )
+    except CircuitOpenError as e:
+        raise _circuit_open(e)
     return collected.model_dump()
 
 @router.post("/seed-theme")
-def seed_theme(req: SeedThemeRequest):
+async def seed_theme(req: SeedThemeRequest):
     """
     One-time seed.
     If the theme already exists, return 409 (no regeneration).
+    Concurrent requests for the same topic share a single collection run.
     """
 
-    theme_id = stable_id("theme", req.topic)
-
-    if theme_exists(theme_id):
+    try:
+        return await seed_theme_once(req.topic, req.max_items, req.theme_statement)
+    except ThemeAlreadyExists:
         raise HTTPException(
             status_code=409,
             detail="Theme already exists; regeneration disabled."
         )
+    except SeedInProgress:
+        raise HTTPException(
+            status_code=409,
+            detail="Theme is already being seeded by another worker; retry later."
+        )
+    except CircuitOpenError as e:
+        raise _circuit_open(e)
 
-    collected = collect_topic_cards(
-        topic=req.topic,
-        max_items=req.max_items,
-        theme_statement=req.theme_statement,
-    )
-    rows = build_theme_rows(req.topic, collected)
-    upsert_theme_and_opinions(rows["theme"], rows["opinions"])
+@router.post("/seed-batch")
+async def seed_batch(req: SeedBatchRequest):
+    """
+    Seed many topics in one pipelined job.
+    Streams one JSON object per line (NDJSON) as each topic progresses,
+    ending with a throughput summary.
+    """
+
+    async def lines():
+        async for event in run_seed_batch(
+            req.topics,
+            max_items=req.max_items,
+            theme_statement=req.theme_statement,
+            parallelism=req.parallelism,
+        ):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
 
-    return {"ok": True, "themeId": rows["theme"]["id"], "opinionsCount": len(rows["opinions"])}
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.post("/stances/replay")
+async def stances_replay(req: StanceReplayRequest):
+    """
+    Dry run: recompute every stance from the user_votes log with the given
+    formula and report how far it is from the stored stances.
+    Nothing is written; apply with `python -m app.jobs.stance_replay --apply`.
+    Logs longer than STANCE_REPLAY_API_MAX_VOTES are refused (413): the
+    whole log is held in memory, so those belong in the CLI.
+    """
+    # heavy deps are only needed here, not at app startup
+    from app.services.stance_replay import ReplayTooLarge, run_replay
+
+    params = {} if req.rate is None else {"rate": req.rate}
+    try:
+        formula = get_formula(req.formula, **params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return await asyncio.to_thread(run_replay, formula, max_votes=STANCE_REPLAY_API_MAX_VOTES)
+    except ReplayTooLarge as e:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{e}; run `python -m app.jobs.stance_replay` instead.",
+        )
 
 # DELETE AFTER TESTING
 @router.post("/seed-opinions")
-def seed_opinions(req: SeedThemeRequest):
+async def seed_opinions(req: SeedThemeRequest):
     theme_id = stable_id("theme", req.topic)
 
-    if not theme_exists(theme_id):
+    if not await asyncio.to_thread(theme_exists, theme_id):
         raise HTTPException(status_code=404, detail="Theme does not exist yet. Run seed-theme first.")
 
-    collected = collect_topic_cards(req.topic, req.max_items, req.theme_statement, min_sources=4, max_per_url=2)
+    try:
+        collected = await collect_topic_cards(req.topic, req.max_items, req.theme_statement, min_sources=4, max_per_url=2)
+    except CircuitOpenError as e:
+        raise _circuit_open(e)
     rows = build_theme_rows(req.topic, collected)
 
     # Force opinions to attach to the existing theme_id
@@ -78,8 +143,8 @@ def seed_opinions(req: SeedThemeRequest):
                 seen.add(i)
         print("duplicate ids:", dupes[:10])
 
-    deleted = delete_opinions_for_theme(theme_id)
-    insert_opinions_only(rows["opinions"])
+    deleted = await asyncio.to_thread(delete_opinions_for_theme, theme_id)
+    await asyncio.to_thread(insert_opinions_only, rows["opinions"])
 
     return {
         "ok": True,
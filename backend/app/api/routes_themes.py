@@ -1,9 +1,32 @@
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import JSONResponse
+from app.api.http_cache import themes_snapshot_response
 from app.schemas.themes import ThemesResponse
-from app.services.theme_store_service import list_themes_with_opinions
+from app.services.theme_store_service import get_themes_snapshot, list_themes_page
 
 router = APIRouter()
 
 @router.get("/", response_model=ThemesResponse)
-def get_themes():
-    return list_themes_with_opinions()
\ No newline at end of file
+def get_themes(
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    max_opinions: Optional[int] = Query(None, ge=0, le=100),
+):
+    """
+    Without query parameters: the full catalog (cached, ETag/304).
+    With limit / cursor / fields / max_opinions: one page ordered by created_at,
+    e.g. ?limit=20&fields=id,title,color&cursor=<nextCursor>.
+    """
+    if limit is not None or cursor or fields or max_opinions is not None:
+        try:
+            page = list_themes_page(limit=limit or 20, cursor=cursor, fields=fields, max_opinions=max_opinions)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # projected pages do not match ThemesResponse, so skip response_model validation
+        return JSONResponse(page)
+    return themes_snapshot_response(get_themes_snapshot(), if_none_match, accept_encoding)
\ No newline at end of file
@@ -4,10 +4,146 @@ from dotenv import load_dotenv
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
 
 TOPIC_CARDS_MODEL = os.getenv("TOPIC_CARDS_MODEL", "gpt-4o-mini")
 
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
 
-CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:5173").split(",")
\ No newline at end of file
+# In-process fakes instead of the real providers (offline / CI performance runs):
+# "gemini,openai,supabase" or "all". Faked providers need no keys, so placeholders are filled in
+FAKE_PROVIDERS = {
+    name.strip()
+    for name in os.getenv("FAKE_PROVIDERS", "").replace("all", "gemini,openai,supabase").split(",")
+    if name.strip()
+}
+if "openai" in FAKE_PROVIDERS:
+    OPENAI_API_KEY = OPENAI_API_KEY or "fake"
+if "gemini" in FAKE_PROVIDERS:
+    GOOGLE_API_KEY = GOOGLE_API_KEY or "fake"
+if "supabase" in FAKE_PROVIDERS:
+    SUPABASE_URL, SUPABASE_KEY = SUPABASE_URL or "fake://supabase", SUPABASE_KEY or "fake"
+# Fake latency per provider in ms: "fixed:5", "uniform:100:400" or "lognormal:<median>:<sigma>"
+FAKE_LATENCY = {
+    "gemini": "lognormal:400:0.4",
+    "openai": "lognormal:3000:0.5",
+    "supabase": "lognormal:15:0.3",
+    **{
+        name.strip(): spec.strip()
+        for name, spec in (pair.split("=", 1) for pair in os.getenv("FAKE_LATENCY", "").split(",") if "=" in pair)
+    },
+}
+# Fraction of fake calls failing with a 503, e.g. "openai=0.05"
+FAKE_ERROR_RATES = {
+    name.strip(): float(rate)
+    for name, rate in (pair.split("=", 1) for pair in os.getenv("FAKE_ERROR_RATES", "").split(",") if "=" in pair)
+}
+# Seed for fake latencies / errors; themes (6 opinions each) preloaded into the fake Supabase
+FAKE_SEED = int(os.getenv("FAKE_SEED", "0"))
+FAKE_SUPABASE_THEMES = int(os.getenv("FAKE_SUPABASE_THEMES", "0"))
+
+CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:5173").split(",")
+
+# LLM gateway: max concurrent Gemini/OpenAI calls per worker, per-call timeout (0 = none)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+
+# Retries of LLM calls (topic card collection): attempts, exponential backoff with jitter
+LLM_RETRY_MAX_ATTEMPTS = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "3"))
+LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.5"))
+LLM_RETRY_MAX_DELAY_SECONDS = float(os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", "8"))
+# Per-provider circuit breaker: consecutive failures before failing fast, seconds before probing again
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
+CIRCUIT_BREAKER_RESET_SECONDS = float(os.getenv("CIRCUIT_BREAKER_RESET_SECONDS", "30"))
+# One topic card collection attempt (web search + structured output)
+TOPIC_CARDS_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("TOPIC_CARDS_ATTEMPT_TIMEOUT_SECONDS", "120"))
+# Topic card selection objective ("coverage" = stance + domain, "mmr" = also penalise similar text)
+DIVERSITY_OBJECTIVE = os.getenv("DIVERSITY_OBJECTIVE", "coverage").strip().lower()
+DIVERSITY_SIMILARITY_WEIGHT = float(os.getenv("DIVERSITY_SIMILARITY_WEIGHT", "4"))
+# Near-duplicate opinions / topic cards (MinHash + LSH over character n-grams): estimated Jaccard
+# similarity at which two texts on the same side of the stance count as the same (opposite claims
+# in shared wording reach ~0.4-0.55, light paraphrases ~0.55-0.8), n-gram length, hashes per signature
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.6"))
+NEAR_DUP_NGRAM = int(os.getenv("NEAR_DUP_NGRAM", "3"))
+NEAR_DUP_NUM_PERM = int(os.getenv("NEAR_DUP_NUM_PERM", "128"))
+
+# /api/opinions generation cache (keyed by normalized topic)
+OPINIONS_CACHE_TTL_SECONDS = float(os.getenv("OPINIONS_CACHE_TTL_SECONDS", "600"))
+OPINIONS_CACHE_MAX_ENTRIES = int(os.getenv("OPINIONS_CACHE_MAX_ENTRIES", "256"))
+# Opinion generation providers, first = primary. Hedging is opt-in: list a second one
+# (e.g. "gemini,openai") and it is sent a hedged request when the primary has no valid
+# answer after OPINIONS_HEDGE_DELAY_SECONDS
+OPINIONS_PROVIDERS = [p.strip() for p in os.getenv("OPINIONS_PROVIDERS", "gemini").split(",") if p.strip()]
+OPINIONS_HEDGE_DELAY_SECONDS = float(os.getenv("OPINIONS_HEDGE_DELAY_SECONDS", "4"))
+OPINIONS_GEMINI_MODEL = os.getenv("OPINIONS_GEMINI_MODEL", "gemini-2.5-flash-lite")
+OPINIONS_OPENAI_MODEL = os.getenv("OPINIONS_OPENAI_MODEL", "gpt-4o-mini")
+
+# /admin/seed-theme: cross-process lease lifetime (should outlive one collection run)
+SEED_LEASE_TTL_SECONDS = float(os.getenv("SEED_LEASE_TTL_SECONDS", "300"))
+
+# Per-provider request limits (calls/minute), e.g. "openai=30,gemini=120"
+PROVIDER_RATE_LIMITS = {
+    name.strip(): float(rate)
+    for name, rate in (
+        pair.split("=", 1) for pair in os.getenv("PROVIDER_RATE_LIMITS", "openai=30").split(",") if "=" in pair
+    )
+}
+
+# Batch seeding: concurrent LLM collections / concurrent DB writers
+SEED_BATCH_PARALLELISM = int(os.getenv("SEED_BATCH_PARALLELISM", "3"))
+SEED_BATCH_DB_WRITERS = int(os.getenv("SEED_BATCH_DB_WRITERS", "1"))
+
+# GET /api/themes read model: rebuild at least this often to see other workers' writes
+THEMES_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("THEMES_SNAPSHOT_MAX_AGE_SECONDS", "30"))
+
+# Write-behind persistence of stances / votes (rows per batch, seconds between flushes)
+STANCE_FLUSH_MAX_BATCH = int(os.getenv("STANCE_FLUSH_MAX_BATCH", "200"))
+STANCE_FLUSH_INTERVAL_SECONDS = float(os.getenv("STANCE_FLUSH_INTERVAL_SECONDS", "2"))
+# Votes waiting to be written; beyond this /api/vote answers 503 + Retry-After
+VOTE_QUEUE_MAX_DEPTH = int(os.getenv("VOTE_QUEUE_MAX_DEPTH", "10000"))
+# (user, theme) stances waiting to be written; beyond this /api/vote answers 503 as well
+STANCE_MAX_PENDING = int(os.getenv("STANCE_MAX_PENDING", "50000"))
+# Failed flushes of the same batch before it is written row by row; rows the database
+# rejects are then dropped into a dead-letter list (kept in memory, newest this many)
+STANCE_FLUSH_MAX_RETRIES = int(os.getenv("STANCE_FLUSH_MAX_RETRIES", "5"))
+STANCE_DEAD_LETTER_MAX = int(os.getenv("STANCE_DEAD_LETTER_MAX", "1000"))
+
+# Number of lock stripes serialising /api/vote per user
+USER_LOCK_STRIPES = int(os.getenv("USER_LOCK_STRIPES", "256"))
+
+# Opinion id -> score index used by /api/vote (rows per page on load, seconds between refreshes)
+OPINION_INDEX_PAGE_SIZE = int(os.getenv("OPINION_INDEX_PAGE_SIZE", "1000"))
+OPINION_INDEX_REFRESH_SECONDS = float(os.getenv("OPINION_INDEX_REFRESH_SECONDS", "60"))
+
+# Stance update formula for /api/vote and the replay job ("linear" / "attraction")
+STANCE_FORMULA = os.getenv("STANCE_FORMULA", "linear")
+STANCE_INFLUENCE_RATE = float(os.getenv("STANCE_INFLUENCE_RATE", "0.5"))
+
+# Largest vote log POST /admin/stances/replay loads into the API process (bigger logs: app.jobs.stance_replay)
+STANCE_REPLAY_API_MAX_VOTES = int(os.getenv("STANCE_REPLAY_API_MAX_VOTES", "200000"))
+
+# Per-theme stance distribution for /api/stance/{theme_id}/distribution
+STANCE_HIST_BINS = int(os.getenv("STANCE_HIST_BINS", "20"))
+STANCE_SKETCH_RESOLUTION = float(os.getenv("STANCE_SKETCH_RESOLUTION", "0.1"))
+STANCE_DISTRIBUTION_REFRESH_SECONDS = float(os.getenv("STANCE_DISTRIBUTION_REFRESH_SECONDS", "300"))
+
+# Shared outbound HTTP clients (OpenAI / Supabase): pool size, keep-alive, timeouts
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "64"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "32"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "60"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "120"))
+# GenerativeModel objects kept per (model, system instruction, config)
+GEMINI_MODEL_CACHE_SIZE = int(os.getenv("GEMINI_MODEL_CACHE_SIZE", "128"))
+
+# Server-side chat sessions (/simple-chat, /api/chat): idle lifetime, count and total history size caps
+CHAT_SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", "1800"))
+CHAT_SESSION_MAX_SESSIONS = int(os.getenv("CHAT_SESSION_MAX_SESSIONS", "10000"))
+CHAT_SESSION_MAX_BYTES = int(os.getenv("CHAT_SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Chat history token budget: recent turns kept verbatim, older ones folded into a summary in the background
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000"))
+CHAT_HISTORY_HARD_LIMIT_TOKENS = int(os.getenv("CHAT_HISTORY_HARD_LIMIT_TOKENS", "6000"))
+CHAT_KEEP_RECENT_TURNS = int(os.getenv("CHAT_KEEP_RECENT_TURNS", "4"))
+CHAT_SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", "gemini-2.5-flash-lite")
@@ -0,0 +1,217 @@
+# ============================================
+# 外部サービスのクライアント（OpenAI / Gemini / Supabase）
+# プロセスで1つずつ作り、lifespan で開いて終了時に閉じる
+# ============================================
+
+from __future__ import annotations
+
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from app.config import (
+    FAKE_PROVIDERS,
+    GEMINI_MODEL_CACHE_SIZE,
+    GOOGLE_API_KEY,
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_POOL_MAX_CONNECTIONS,
+    HTTP_POOL_MAX_KEEPALIVE,
+    HTTP_READ_TIMEOUT_SECONDS,
+    OPENAI_API_KEY,
+    SUPABASE_KEY,
+    SUPABASE_URL,
+)
+from app.core.supabase_client import setup_help
+from app.services import supabase_service
+from app.utils.logger import logger
+
+if TYPE_CHECKING:
+    import httpx
+
+# SDK（openai / google.generativeai / supabase / httpx）は初回利用時にインポートする。
+# インポートだけで数百ms かかるので、モジュールの読み込み（= コールドスタート）を軽くしておく
+
+_lock = threading.Lock()
+_openai_http: Optional[httpx.Client] = None
+_supabase_http: Optional[httpx.Client] = None
+_openai: Any = None
+_gemini_configured = False
+_gemini_models: "OrderedDict[tuple, Any]" = OrderedDict()
+
+_stats = {
+    "openai_clients_created": 0,
+    "gemini_models_created": 0,
+    "gemini_model_cache_hits": 0,
+}
+
+
+def _new_http_client(**kwargs: Any) -> httpx.Client:
+    import httpx
+
+    # keep-alive プールを共有して、リクエストごとの TCP/TLS ハンドシェイクを避ける
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+        **kwargs,
+    )
+
+
+def openai_client() -> Any:
+    """共有の OpenAI クライアント（スレッドセーフ。LLMゲートウェイの各スレッドから使う）"""
+    global _openai, _openai_http
+    if _openai is None:
+        with _lock:
+            if _openai is None and "openai" in FAKE_PROVIDERS:
+                from app.services.fake_llm import FakeOpenAI
+
+                _openai = FakeOpenAI()
+                _stats["openai_clients_created"] += 1
+            if _openai is None:
+                from openai import OpenAI
+
+                if not OPENAI_API_KEY:
+                    raise RuntimeError("OPENAI_API_KEY is not set")
+                _openai_http = _new_http_client(follow_redirects=True)
+                # 再試行は resilience.call_with_retry だけで行う（SDK 既定の max_retries=2 だと
+                # 1回の試行が最大3回の HTTP 呼び出しになり、サーキットブレーカーにも失敗が遅れて届く）
+                _openai = OpenAI(api_key=OPENAI_API_KEY, http_client=_openai_http, max_retries=0)
+                _stats["openai_clients_created"] += 1
+    return _openai
+
+
+def _configure_gemini() -> None:
+    global _gemini_configured
+    if not _gemini_configured:
+        import google.generativeai as genai
+
+        if GOOGLE_API_KEY:
+            genai.configure(api_key=GOOGLE_API_KEY)
+        _gemini_configured = True
+
+
+@lru_cache(maxsize=1)
+def _no_retry_model_class() -> type:
+    import google.generativeai as genai
+
+    class NoRetryGenerativeModel(genai.GenerativeModel):
+        """
+        generate_content（start_chat の send_message もこれを通る）で SDK の再試行を切ったモデル。
+        SDK は 503 を最大600秒まで内部で再試行するので、OpenAI と同じく
+        再試行は resilience.call_with_retry だけにする
+        """
+
+        def generate_content(self, contents: Any, *, request_options: Any = None, **kwargs: Any) -> Any:
+            request_options = {"retry": None, **dict(request_options or {})}
+            return super().generate_content(contents, request_options=request_options, **kwargs)
+
+    return NoRetryGenerativeModel
+
+
+def gemini_model(
+    model_name: str,
+    system_instruction: Optional[str] = None,
+    generation_config: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """
+    GenerativeModel を (モデル名, system_instruction, generation_config) ごとにキャッシュして返す。
+    モデルは状態を持たない（会話は start_chat 側）ので使い回してよい。
+    """
+    key = (model_name, system_instruction, json.dumps(generation_config, sort_keys=True) if generation_config else None)
+    with _lock:
+        model = _gemini_models.get(key)
+        if model is not None:
+            _gemini_models.move_to_end(key)
+            _stats["gemini_model_cache_hits"] += 1
+            return model
+
+    if "gemini" in FAKE_PROVIDERS:
+        from app.services.fake_llm import FakeGeminiModel
+
+        model = FakeGeminiModel(model_name, system_instruction, generation_config)
+    else:
+        import google.generativeai as genai
+
+        _configure_gemini()
+        kwargs: Dict[str, Any] = {}
+        if system_instruction is not None:
+            kwargs["system_instruction"] = system_instruction
+        if generation_config is not None:
+            kwargs["generation_config"] = generation_config
+        model = _no_retry_model_class()(model_name, **kwargs)
+
+    with _lock:
+        _gemini_models[key] = model
+        _gemini_models.move_to_end(key)
+        while len(_gemini_models) > GEMINI_MODEL_CACHE_SIZE:
+            _gemini_models.popitem(last=False)
+        _stats["gemini_models_created"] += 1
+    return model
+
+
+def init_clients() -> None:
+    """
+    lifespan の起動時に呼ぶ。Supabase は共有の HTTP プールを使って接続する。
+    OpenAI / Gemini は最初の呼び出しで作る（使わないワーカーでは SDK も読み込まない）
+    """
+    global _supabase_http
+    if "supabase" in FAKE_PROVIDERS:
+        # in-memory store; no HTTP pool needed
+        supabase_service.init_supabase()
+        return
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        logger.warning(setup_help())
+        return
+    if _supabase_http is None:
+        _supabase_http = _new_http_client(follow_redirects=True, http2=_http2_available())
+    supabase_service.init_supabase(http_client=_supabase_http)
+
+
+def close_clients() -> None:
+    global _openai, _openai_http, _supabase_http
+    with _lock:
+        if _openai_http is not None:
+            _openai_http.close()
+        _openai, _openai_http = None, None
+        _gemini_models.clear()
+    supabase_service.reset_supabase()
+    if _supabase_http is not None:
+        _supabase_http.close()
+        _supabase_http = None
+
+
+def _http2_available() -> bool:
+    # postgrest-py の既定と同じく HTTP/2 を使う（h2 が入っていなければ HTTP/1.1）
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _pool_connections(client: Optional[httpx.Client]) -> Optional[int]:
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    conns = getattr(pool, "connections", None)
+    return None if conns is None else len(conns)
+
+
+def client_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = {
+        **_stats,
+        "gemini_models_cached": len(_gemini_models),
+        "openai_pool_connections": _pool_connections(_openai_http),
+        "supabase_pool_connections": _pool_connections(_supabase_http),
+        "pool_max_connections": HTTP_POOL_MAX_CONNECTIONS,
+        "pool_max_keepalive": HTTP_POOL_MAX_KEEPALIVE,
+    }
+    if FAKE_PROVIDERS:
+        from app.services.fake_llm import fake_stats
+
+        stats["fakes"] = fake_stats()
+    return stats
@@ -0,0 +1,33 @@
+# ============================================
+# アプリケーションのライフサイクル
+# 起動時の接続・バックグラウンドタスクの開始と、終了時の後始末
+# ============================================
+
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+
+from app.core.clients import close_clients, init_clients
+from app.services.llm_gateway import shutdown_gateway
+from app.services.opinion_score_index import opinion_score_index
+from app.services.stance_distribution import stance_distributions
+from app.services.stance_store import stance_write_behind
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Supabase / OpenAI / Gemini のクライアントを共有の接続プール付きで用意する
+    init_clients()
+    # 意見スコアの一括読み込みはバックグラウンドで行い、起動は待たせない
+    opinion_score_index.start()
+    stance_distributions.start()
+    stance_write_behind.start()
+    try:
+        yield
+    finally:
+        await opinion_score_index.stop()
+        await stance_distributions.stop()
+        # 未書き込みの立場スコア・投票をDBへ反映してから終了する
+        await stance_write_behind.stop()
+        shutdown_gateway()
+        close_clients()
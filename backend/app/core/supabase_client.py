@@ -3,62 +3,54 @@
 # データベース接続を管理
 # ============================================
 
-from supabase import create_client, Client
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
 from app.config import SUPABASE_URL, SUPABASE_KEY
-import sys
+from app.services import supabase_service
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+# インポート時には何もしない（クライアント作成・環境変数チェックは初回利用時）
+_SETUP_HELP = """Supabase が設定されていません（SUPABASE_URL / SUPABASE_KEY）
 
-# 環境変数のバリデーション
-if not SUPABASE_URL or SUPABASE_URL == "":
-    print("=" * 80)
-    print("エラー: SUPABASE_URLが設定されていません")
-    print("=" * 80)
-    print()
-    print("以下の手順でSupabaseを設定してください:")
-    print()
-    print("1. https://supabase.com/ でアカウントを作成")
-    print("2. 新しいプロジェクトを作成")
-    print("3. SQL Editorで database/schema.sql を実行")
-    print("4. Settings > API から以下を取得:")
-    print("   - Project URL (SUPABASE_URL)")
-    print("   - anon/public key (SUPABASE_KEY)")
-    print()
-    print("5. backend/.env ファイルに以下のように設定:")
-    print("   SUPABASE_URL=https://xxxxx.supabase.co")
-    print("   SUPABASE_KEY=your_anon_key_here")
-    print()
-    print("=" * 80)
-    sys.exit(1)
+以下の手順でSupabaseを設定してください:
 
-if not SUPABASE_KEY or SUPABASE_KEY == "":
-    print("=" * 80)
-    print("エラー: SUPABASE_KEYが設定されていません")
-    print("=" * 80)
-    print()
-    print("backend/.env ファイルにSupabaseのanon keyを設定してください")
-    print("Settings > API から anon/public key を取得できます")
-    print()
-    print("=" * 80)
-    sys.exit(1)
+1. https://supabase.com/ でアカウントを作成
+2. 新しいプロジェクトを作成
+3. SQL Editorで database/schema.sql を実行
+4. Settings > API から以下を取得:
+   - Project URL (SUPABASE_URL)
+   - anon/public key (SUPABASE_KEY)
 
-# Supabaseクライアントのシングルトンインスタンス
-try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    print(f"✓ Supabaseに接続しました: {SUPABASE_URL}")
-except Exception as e:
-    print("=" * 80)
-    print("エラー: Supabaseクライアントの初期化に失敗しました")
-    print("=" * 80)
-    print(f"詳細: {str(e)}")
-    print()
-    print("SUPABASE_URLとSUPABASE_KEYが正しいか確認してください")
-    print("=" * 80)
-    sys.exit(1)
+5. backend/.env ファイルに以下のように設定:
+   SUPABASE_URL=https://xxxxx.supabase.co
+   SUPABASE_KEY=your_anon_key_here"""
 
+
+def setup_help() -> str:
+    """環境変数が足りないときに表示する設定手順（未設定の変数名つき）"""
+    missing = [name for name, value in (("SUPABASE_URL", SUPABASE_URL), ("SUPABASE_KEY", SUPABASE_KEY)) if not value]
+    return f"未設定: {', '.join(missing)}\n{_SETUP_HELP}" if missing else ""
+
+
+# クライアント本体は app.services.supabase_service の1つだけを使う
+# （通常は lifespan で共有の HTTP プール付きで作られる）
 def get_supabase() -> Client:
     """
     Supabaseクライアントを取得する
     
     Returns:
         Client: Supabaseクライアント
+
+    Raises:
+        RuntimeError: SUPABASE_URL / SUPABASE_KEY が設定されていない
     """
-    return supabase
+    if not supabase_service.enabled():
+        # lifespan を通らない使い方（スクリプト等）ではここで作る
+        supabase_service.init_supabase()
+    if not supabase_service.enabled():
+        raise RuntimeError(setup_help() or "Supabase is not configured.")
+    return supabase_service.client()
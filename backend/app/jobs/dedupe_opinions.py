@@ -0,0 +1,48 @@
+"""
+opinions テーブルから言い換え・転載による重複（near-duplicate）を探して消すCLI
+
+    cd backend
+    python -m app.jobs.dedupe_opinions                    # 見つかった重複を表示するだけ（書き込まない）
+    python -m app.jobs.dedupe_opinions --threshold 0.5    # 類似度のしきい値を変えて試す
+    python -m app.jobs.dedupe_opinions --across-themes    # 別テーマ（言い回し違いで再シードしたテーマ）どうしも比べる
+    python -m app.jobs.dedupe_opinions --apply            # 重複を削除する
+
+同じ内容とみなした意見のうち、いちばん古いものを残す。比べるのはスタンスが同じ側（賛成どうし・反対どうし・中立どうし）の意見だけ。
+消す意見への投票（user_votes）は残す意見に付け替え、同じユーザーが両方に投票していた場合は1票にまとめる
+（残す意見への投票を優先、なければいちばん古い投票）。残す意見のスコアはまとめた意見のスコアの平均にする。
+--apply は投票を止めた状態（メンテナンス中）で実行し、その後APIワーカーを再起動すること。
+テーマのスナップショット、意見スコアのインデックス（消した意見が残る）、ユーザーごとの投票履歴は
+各ワーカーのメモリにあり、このジョブからは更新できないため。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+
+from app.config import NEAR_DUP_THRESHOLD
+from app.core.clients import init_clients
+from app.services.opinion_dedupe import run_dedupe
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Find (and remove) near-duplicate opinions")
+    ap.add_argument("--threshold", type=float, default=NEAR_DUP_THRESHOLD, help="推定 Jaccard 類似度のしきい値")
+    ap.add_argument("--across-themes", action="store_true", help="別テーマの意見どうしも比べる")
+    ap.add_argument("--apply", action="store_true", help="重複を削除する（投票は残す意見に付け替え）")
+    ap.add_argument("--examples", type=int, default=10, help="表示する重複の例の数")
+    ap.add_argument("--page-size", type=int, default=10000)
+    args = ap.parse_args()
+
+    init_clients()
+    summary = run_dedupe(
+        threshold=args.threshold,
+        across_themes=args.across_themes,
+        apply=args.apply,
+        page_size=args.page_size,
+        examples=args.examples,
+    )
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
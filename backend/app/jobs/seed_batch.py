@@ -0,0 +1,57 @@
+"""
+複数トピックをまとめてシードするCLI（/admin/seed-batch と同じパイプライン）
+
+    cd backend
+    python -m app.jobs.seed_batch 熊の駆除 高市政権 トランプ政権 --parallelism 3
+    python -m app.jobs.seed_batch --file topics.txt
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+
+from app.config import SEED_BATCH_DB_WRITERS, SEED_BATCH_PARALLELISM
+from app.core.clients import init_clients
+from app.services.seed_pipeline import run_seed_batch
+
+
+async def _main(args: argparse.Namespace) -> int:
+    topics = list(args.topics)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            topics += [line.strip() for line in f if line.strip()]
+    if not topics:
+        print("no topics given", file=sys.stderr)
+        return 2
+
+    summary = {}
+    async for event in run_seed_batch(
+        topics,
+        max_items=args.max_items,
+        theme_statement=args.theme_statement,
+        parallelism=args.parallelism,
+        db_writers=args.db_writers,
+    ):
+        print(json.dumps(event, ensure_ascii=False), flush=True)
+        summary = event
+    return 1 if summary.get("failed") else 0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Seed many topics in one pipelined job")
+    ap.add_argument("topics", nargs="*")
+    ap.add_argument("--file", help="1行1トピックのテキストファイル")
+    ap.add_argument("--max-items", type=int, default=12)
+    ap.add_argument("--theme-statement", default=None)
+    ap.add_argument("--parallelism", type=int, default=SEED_BATCH_PARALLELISM)
+    ap.add_argument("--db-writers", type=int, default=SEED_BATCH_DB_WRITERS)
+    args = ap.parse_args()
+
+    init_clients()
+    sys.exit(asyncio.run(_main(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+user_votes のログから全ユーザーの立場スコアを計算し直すCLI
+
+    cd backend
+    python -m app.jobs.stance_replay                                  # 差分だけ表示（書き込まない）
+    python -m app.jobs.stance_replay --formula attraction --rate 0.3  # 別の式・係数で試す
+    python -m app.jobs.stance_replay --apply                          # user_stances に書き戻す
+
+--apply は投票を止めた状態（メンテナンス中）で実行し、その後ワーカーを再起動すること。
+動いているワーカーのメモリ上の立場スコアと未書き込み分は、古い式のまま残るため。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+
+from app.config import STANCE_FORMULA
+from app.core.clients import init_clients
+from app.services.stance_formula import FORMULAS, get_formula
+from app.services.stance_replay import run_replay
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Rebuild every stance from the vote log")
+    ap.add_argument("--formula", choices=sorted(FORMULAS), default=STANCE_FORMULA)
+    ap.add_argument("--rate", type=float, default=None, help="影響率（省略時は STANCE_INFLUENCE_RATE）")
+    ap.add_argument("--apply", action="store_true", help="計算結果を user_stances に書き戻す")
+    ap.add_argument("--page-size", type=int, default=10000)
+    args = ap.parse_args()
+
+    init_clients()
+    formula = get_formula(args.formula, **({} if args.rate is None else {"rate": args.rate}))
+    summary = run_replay(formula, apply=args.apply, page_size=args.page_size)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,9 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.api import api_router
 # from app.config import CORS_ORIGINS
-from app.services.supabase_service import init_supabase
+from app.core.lifespan import lifespan
 
-app = FastAPI(title="Kaleidoscope Backend")
+app = FastAPI(title="Kaleidoscope Backend", lifespan=lifespan)
 
 # CORS設定
 # 許可するオリジンのリスト
@@ -25,8 +25,6 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
-init_supabase()
-
 app.include_router(api_router, prefix="/api")
 
 @app.get("/")
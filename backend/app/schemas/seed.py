@@ -1,7 +1,20 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Annotated, List, Optional
+
+# one topic: seed-theme, and each entry of seed-batch
+Topic = Annotated[str, Field(min_length=1, max_length=60)]
 
 class SeedThemeRequest(BaseModel):
-    topic: str = Field(min_length=1, max_length=60)
+    topic: Topic
+    max_items: int = Field(default=12, ge=6, le=16)
+    theme_statement: Optional[str] = None
+
+class SeedBatchRequest(BaseModel):
+    topics: List[Topic] = Field(min_length=1, max_length=50)
     max_items: int = Field(default=12, ge=6, le=16)
-    theme_statement: Optional[str] = None
\ No newline at end of file
+    theme_statement: Optional[str] = None
+    parallelism: int = Field(default=3, ge=1, le=8)
+
+class StanceReplayRequest(BaseModel):
+    formula: str = "linear"
+    rate: Optional[float] = Field(default=None, gt=0, le=1)
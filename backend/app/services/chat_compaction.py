@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.config import (
+    CHAT_HISTORY_HARD_LIMIT_TOKENS,
+    CHAT_HISTORY_TOKEN_BUDGET,
+    CHAT_KEEP_RECENT_TURNS,
+    CHAT_SUMMARY_MODEL,
+)
+from app.services.chat_session_store import ChatSession, ChatSessionStore, chat_sessions
+from app.services.llm_gateway import run_llm
+from app.utils.logger import logger
+
+SUMMARY_INSTRUCTION = """
+あなたは会話の記録係です。渡された「これまでの要約」と「続きの会話」を1つの要約にまとめ直してください。
+
+- ユーザーの立場と、その理由・具体的な体験
+- 会話に出た論点・提案と、それへのユーザーの反応
+- AI がすでにした質問（同じ質問を繰り返さないため）
+
+日本語で、箇条書き・400字以内。要約だけを出力してください。
+"""
+
+Summarizer = Callable[[str, List[Dict[str, Any]]], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough Gemini token count without a network round trip: about 4 ASCII
+    characters per token and one token per Japanese character. Works from
+    the UTF-8 length, so no per-character Python loop.
+    """
+    chars = len(text)
+    extra = len(text.encode("utf-8")) - chars  # 2 per 3-byte (CJK) character
+    wide = min(chars, extra // 2)
+    return (chars - wide + 3) // 4 + wide
+
+
+def history_tokens(history: List[Dict[str, Any]]) -> int:
+    return sum(estimate_tokens(p) for m in history for p in m["parts"])
+
+
+def _summary_messages(summary: str) -> List[Dict[str, Any]]:
+    return [
+        {"role": "user", "parts": [f"（ここまでの会話の要約）\n{summary}"]},
+        {"role": "model", "parts": ["はい、ここまでの内容を踏まえて続けます。"]},
+    ]
+
+
+async def _summarize_with_gemini(summary: str, messages: List[Dict[str, Any]]) -> str:
+    from app.core.clients import gemini_model
+
+    lines = [f"{'ユーザー' if m['role'] == 'user' else 'AI'}: {' '.join(m['parts'])}" for m in messages]
+    prompt = f"これまでの要約:\n{summary or '（なし）'}\n\n続きの会話:\n" + "\n".join(lines)
+    model = gemini_model(CHAT_SUMMARY_MODEL, system_instruction=SUMMARY_INSTRUCTION)
+    response = await run_llm(model.generate_content, prompt)
+    return response.text.strip()
+
+
+class ChatCompactor:
+    """
+    Token budget for chat history sent to the model.
+
+    The last `keep_turns` exchanges always go verbatim. Once the verbatim
+    history passes `token_budget`, everything older is folded into the
+    session's rolling summary by a background task; the turn that noticed
+    it is not delayed and still sends the longer history. When the fold
+    lands, the folded messages are removed from the session, so memory
+    stays bounded as well.
+
+    While a fold is pending (or for stateless requests, which have no
+    session to keep a summary in) history beyond `hard_limit_tokens` is
+    cut from the oldest end.
+    """
+
+    def __init__(
+        self,
+        store: ChatSessionStore,
+        token_budget: int,
+        keep_turns: int,
+        hard_limit_tokens: int,
+        summarize: Optional[Summarizer] = None,
+    ):
+        self.store = store
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.hard_limit_tokens = max(hard_limit_tokens, token_budget)
+        self.summarize = summarize or _summarize_with_gemini
+        self._tasks: set = set()
+        self.folds = 0
+        self.failed_folds = 0
+        self.folded_messages = 0
+        self.trimmed_messages = 0
+        self.last_fold_seconds = 0.0
+
+    def prompt_history(self, session: ChatSession) -> List[Dict[str, Any]]:
+        """History to send with this turn's message (summary first, if any)."""
+        history = session.history
+        tokens = history_tokens(history)
+        keep = 2 * self.keep_turns
+        if tokens > self.token_budget and len(history) > keep and self.store.is_stored(session):
+            # fold up to a user turn, so the kept history still opens with one
+            count = len(history) - keep
+            while count > 0 and history[count]["role"] != "user":
+                count -= 1
+            if count:
+                self._schedule_fold(session, count)
+
+        if tokens > self.hard_limit_tokens:
+            start = 0
+            while tokens > self.hard_limit_tokens and len(history) - start > keep:
+                tokens -= history_tokens([history[start]])
+                start += 1
+            # the history sent must open with a user turn; a failed or cut-off
+            # turn can leave a user message without its reply, so count roles
+            # rather than assuming user/model pairs
+            while start < len(history) and history[start]["role"] != "user":
+                start += 1
+            self.trimmed_messages += start
+            history = history[start:]
+        return (_summary_messages(session.summary) if session.summary else []) + history
+
+    def _schedule_fold(self, session: ChatSession, count: int) -> None:
+        if session.compacting:
+            return
+        session.compacting = True
+        task = asyncio.create_task(self._fold(session, count))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fold(self, session: ChatSession, count: int) -> None:
+        t0 = time.monotonic()
+        try:
+            summary = await self.summarize(session.summary, session.history[:count])
+        except Exception as e:
+            self.failed_folds += 1
+            logger.error(f"chat history compaction failed: {e}")
+            return
+        finally:
+            session.compacting = False
+        # turns only append, so the first `count` messages are still the ones summarised
+        session.summary = summary
+        self.store.replace_history(session, session.history[count:])
+        self.folds += 1
+        self.folded_messages += count
+        self.last_fold_seconds = time.monotonic() - t0
+
+    async def drain(self) -> None:
+        """Wait for pending folds (shutdown, benchmarks)."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "token_budget": self.token_budget,
+            "keep_turns": self.keep_turns,
+            "hard_limit_tokens": self.hard_limit_tokens,
+            "pending_folds": len(self._tasks),
+            "folds": self.folds,
+            "failed_folds": self.failed_folds,
+            "folded_messages": self.folded_messages,
+            "trimmed_messages": self.trimmed_messages,
+            "last_fold_seconds": round(self.last_fold_seconds, 3),
+        }
+
+
+chat_compactor = ChatCompactor(
+    chat_sessions,
+    token_budget=CHAT_HISTORY_TOKEN_BUDGET,
+    keep_turns=CHAT_KEEP_RECENT_TURNS,
+    hard_limit_tokens=CHAT_HISTORY_HARD_LIMIT_TOKENS,
+)
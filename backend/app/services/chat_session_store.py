@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.config import (
+    CHAT_SESSION_MAX_BYTES,
+    CHAT_SESSION_MAX_SESSIONS,
+    CHAT_SESSION_TTL_SECONDS,
+)
+
+
+def _message_bytes(text: str) -> int:
+    # the str itself plus the {"role", "parts": [...]} wrapper around it
+    return sys.getsizeof(text) + 300
+
+
+@dataclass(eq=False)
+class ChatSession:
+    """
+    One conversation kept on the server.
+
+    `history` is in Gemini's format ({"role": "user"|"model", "parts": [text]})
+    so it can be handed to `start_chat` as is; `context` holds what the
+    stateless requests used to resend every turn (topic, viewpoint, ...).
+    """
+
+    session_id: str
+    kind: str
+    context: Dict[str, Any]
+    history: List[Dict[str, Any]] = field(default_factory=list)
+    turn_count: int = 0  # completed user/model exchanges
+    summary: str = ""  # older turns folded by ChatCompactor (no longer in `history`)
+    compacting: bool = False
+    nbytes: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    # one turn at a time per conversation (a double-submit must not interleave history)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+
+class ChatSessionStore:
+    """
+    In-process chat sessions keyed by id, with TTL (since last use), LRU
+    eviction by count, and a cap on the total size of stored history.
+
+    Sessions live in one worker's memory. A request that lands on another
+    worker, or comes after expiry/eviction, gets `None` from `get` and the
+    endpoint asks the client to resend the full history.
+    """
+
+    def __init__(self, ttl_seconds: float, max_sessions: int, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._bytes = 0
+        self.created = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _drop(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.nbytes
+
+    def _expire(self, now: float) -> None:
+        # LRU order is last-use order, so expired sessions are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self.ttl_seconds:
+                break
+            self._drop(session_id)
+            self.expired += 1
+
+    def _enforce_caps(self, keep: ChatSession) -> None:
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            session_id = next(iter(self._sessions))
+            if session_id == keep.session_id:
+                # the session being written is the only one left (or the oldest); never evict it mid-turn
+                if len(self._sessions) == 1:
+                    break
+                self._sessions.move_to_end(session_id)
+                continue
+            self._drop(session_id)
+            self.evicted += 1
+
+    def create(
+        self,
+        kind: str,
+        context: Dict[str, Any],
+        history: Optional[List[Dict[str, Any]]] = None,
+        store: bool = True,
+    ) -> ChatSession:
+        """
+        New session, optionally seeded with a client-sent history.
+
+        With store=False the session is not kept (a stateless request):
+        `record_turn` on it is a no-op and `is_stored` is False.
+        """
+        session = ChatSession(session_id=uuid.uuid4().hex, kind=kind, context=dict(context))
+        for message in history or []:
+            self._append(session, message)
+        session.turn_count = len(session.history) // 2
+        if not store:
+            return session
+        self._expire(session.last_used)
+        self._sessions[session.session_id] = session
+        self._bytes += session.nbytes
+        self.created += 1
+        self._enforce_caps(session)
+        return session
+
+    def get(self, session_id: str, kind: str) -> Optional[ChatSession]:
+        now = time.monotonic()
+        self._expire(now)
+        session = self._sessions.get(session_id)
+        if session is None or session.kind != kind:
+            self.misses += 1
+            return None
+        session.last_used = now
+        self._sessions.move_to_end(session_id)
+        self.hits += 1
+        return session
+
+    def is_stored(self, session: ChatSession) -> bool:
+        return self._sessions.get(session.session_id) is session
+
+    def _append(self, session: ChatSession, message: Dict[str, Any]) -> None:
+        size = sum(_message_bytes(p) for p in message["parts"])
+        session.history.append(message)
+        session.nbytes += size
+        if session.session_id in self._sessions:
+            self._bytes += size
+
+    def record_turn(self, session: ChatSession, user_text: str, reply_text: str) -> None:
+        """Append one completed exchange. Call only after the model answered."""
+        if session.session_id not in self._sessions:
+            # evicted or dropped while the model was answering; nothing to keep
+            return
+        self._append(session, {"role": "user", "parts": [user_text]})
+        self._append(session, {"role": "model", "parts": [reply_text]})
+        session.turn_count += 1
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session.session_id)
+        self._enforce_caps(session)
+
+    def replace_history(self, session: ChatSession, history: List[Dict[str, Any]]) -> None:
+        """Swap in a rewritten history (e.g. after compaction), keeping the byte count right."""
+        if self.is_stored(session):
+            self._bytes -= session.nbytes
+        session.history, session.nbytes = [], 0
+        for message in history:
+            self._append(session, message)
+
+    def discard(self, session_id: str) -> None:
+        self._drop(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "created": self.created,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+
+chat_sessions = ChatSessionStore(
+    ttl_seconds=CHAT_SESSION_TTL_SECONDS,
+    max_sessions=CHAT_SESSION_MAX_SESSIONS,
+    max_bytes=CHAT_SESSION_MAX_BYTES,
+)
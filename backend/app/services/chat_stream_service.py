@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, Optional
+
+# get_chat_instruction asks the model to emit this when the conversation is over
+END_MARKER = "[[END]]"
+
+
+def sse_event(event: str, data: Any) -> str:
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def iter_chunk_texts(chunks: Iterable[Any]) -> Iterator[str]:
+    """Yield the text of each Gemini stream chunk, skipping chunks without text parts."""
+    for chunk in chunks:
+        try:
+            text = chunk.text
+        except ValueError:
+            # blocked / empty candidate chunks raise on .text
+            continue
+        if text:
+            yield text
+
+
+class EndMarkerFilter:
+    """
+    Removes END_MARKER from a token stream.
+
+    The marker can be split across chunks ("[[EN" + "D]]"), so any tail that
+    could still turn into the marker is held back until the next chunk.
+    """
+
+    def __init__(self, marker: str = END_MARKER):
+        self.marker = marker
+        self.ended = False
+        self._pending = ""
+
+    def feed(self, text: str) -> str:
+        buf = self._pending + text
+        if self.marker in buf:
+            self.ended = True
+            buf = buf.replace(self.marker, "")
+
+        keep = 0
+        for n in range(min(len(self.marker) - 1, len(buf)), 0, -1):
+            if self.marker.startswith(buf[-n:]):
+                keep = n
+                break
+
+        self._pending = buf[len(buf) - keep:] if keep else ""
+        return buf[:len(buf) - keep] if keep else buf
+
+    def flush(self) -> str:
+        out, self._pending = self._pending, ""
+        return out
+
+
+async def chat_event_stream(chunks: AsyncIterator[str], done_extra: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """
+    Turn a stream of reply text into SSE events:
+
+    - `token`: {"text": ...} for every piece of visible text
+    - `done`:  {"reply": full text without the marker, "ended": bool, **done_extra}
+    - `error`: {"message": ...} if the model call fails mid-stream
+    """
+    marker = EndMarkerFilter()
+    parts = []
+    try:
+        async for text in chunks:
+            visible = marker.feed(text)
+            if visible:
+                parts.append(visible)
+                yield sse_event("token", {"text": visible})
+    except Exception as e:
+        print(f"Chat stream error: {e}")
+        yield sse_event("error", {"message": "エラーが発生しました。"})
+        return
+
+    tail = marker.flush()
+    if tail:
+        parts.append(tail)
+        yield sse_event("token", {"text": tail})
+
+    reply = "".join(parts).strip()
+    yield sse_event("done", {"reply": reply, "ended": marker.ended, **(done_extra or {})})
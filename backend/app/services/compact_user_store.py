@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional
+
+
+class IdInterner:
+    """Maps string ids to dense small ints (0, 1, 2, ...) and back."""
+
+    def __init__(self) -> None:
+        self._index: Dict[str, int] = {}
+        self._ids: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def get(self, key: str) -> Optional[int]:
+        return self._index.get(key)
+
+    def intern(self, key: str) -> int:
+        i = self._index.get(key)
+        if i is None:
+            # the index and the reverse list share this one string object;
+            # callers' copies of the same id can be freed
+            i = len(self._ids)
+            self._index[key] = i
+            self._ids.append(key)
+        return i
+
+    def lookup(self, i: int) -> str:
+        return self._ids[i]
+
+    def clear(self) -> None:
+        self._index.clear()
+        self._ids.clear()
+
+
+class CompactUserStore:
+    """
+    Per-user vote history and stance scores for /api/vote.
+
+    User, opinion and theme ids are interned once, so each user costs a few
+    typed arrays instead of a set of UUID strings plus a dict of floats:
+
+    - voted opinions: sorted array('I') of opinion numbers (bisect lookup)
+    - stances: array('I') of theme numbers, sorted, with a parallel
+      array('d') of scores
+
+    Users that have never voted / never moved hold None instead of empty
+    arrays. Not thread-safe; callers serialise per user (news_service's
+    user_locks) and everything runs on the event loop.
+
+    `users` may be an interner shared with other per-user structures
+    (stance_distributions), so user numbers can be ahead of this store's
+    arrays; clear() leaves a shared interner alone.
+    """
+
+    def __init__(self, users: Optional[IdInterner] = None) -> None:
+        self._owns_users = users is None
+        self.users = IdInterner() if users is None else users
+        self.opinions = IdInterner()
+        self.themes = IdInterner()
+        self._voted: List[Optional[array]] = []
+        self._stance_themes: List[Optional[array]] = []
+        self._stance_scores: List[Optional[array]] = []
+        self._loaded = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def _user(self, user_id: str) -> int:
+        u = self.users.intern(user_id)
+        while u >= len(self._voted):
+            self._voted.append(None)
+            self._stance_themes.append(None)
+            self._stance_scores.append(None)
+            self._loaded.append(0)
+        return u
+
+    def _known(self, user_id: str) -> Optional[int]:
+        u = self.users.get(user_id)
+        return u if u is not None and u < len(self._voted) else None
+
+    # --- loaded flag (state read from the DB once per process) ---
+
+    def is_loaded(self, user_id: str) -> bool:
+        u = self._known(user_id)
+        return u is not None and bool(self._loaded[u])
+
+    def mark_loaded(self, user_id: str) -> None:
+        self._loaded[self._user(user_id)] = 1
+
+    # --- vote history ---
+
+    def has_voted(self, user_id: str, opinion_id: str) -> bool:
+        u = self._known(user_id)
+        o = self.opinions.get(opinion_id)
+        if u is None or o is None:
+            return False
+        voted = self._voted[u]
+        if voted is None:
+            return False
+        i = bisect_left(voted, o)
+        return i < len(voted) and voted[i] == o
+
+    def add_vote(self, user_id: str, opinion_id: str) -> bool:
+        """Record a vote; False if the user had already voted on the opinion."""
+        u = self._user(user_id)
+        o = self.opinions.intern(opinion_id)
+        voted = self._voted[u]
+        if voted is None:
+            self._voted[u] = array("I", (o,))
+            return True
+        i = bisect_left(voted, o)
+        if i < len(voted) and voted[i] == o:
+            return False
+        voted.insert(i, o)
+        return True
+
+    def voted_opinions(self, user_id: str) -> List[str]:
+        u = self._known(user_id)
+        if u is None or self._voted[u] is None:
+            return []
+        return [self.opinions.lookup(o) for o in self._voted[u]]
+
+    # --- stances ---
+
+    def get_stance(self, user_id: str, theme_id: str, default: float = 0.0) -> float:
+        u = self._known(user_id)
+        t = self.themes.get(theme_id)
+        if u is None or t is None:
+            return default
+        themes = self._stance_themes[u]
+        if themes is None:
+            return default
+        i = bisect_left(themes, t)
+        if i < len(themes) and themes[i] == t:
+            return self._stance_scores[u][i]
+        return default
+
+    def set_stance(self, user_id: str, theme_id: str, score: float, overwrite: bool = True) -> None:
+        u = self._user(user_id)
+        t = self.themes.intern(theme_id)
+        themes = self._stance_themes[u]
+        if themes is None:
+            self._stance_themes[u] = array("I", (t,))
+            self._stance_scores[u] = array("d", (score,))
+            return
+        i = bisect_left(themes, t)
+        if i < len(themes) and themes[i] == t:
+            if overwrite:
+                self._stance_scores[u][i] = score
+            return
+        themes.insert(i, t)
+        self._stance_scores[u].insert(i, score)
+
+    def stances(self, user_id: str) -> Dict[str, float]:
+        u = self._known(user_id)
+        if u is None or self._stance_themes[u] is None:
+            return {}
+        return {
+            self.themes.lookup(t): s
+            for t, s in zip(self._stance_themes[u], self._stance_scores[u])
+        }
+
+    def merge_loaded(self, user_id: str, stances: Dict[str, float], voted: Iterable[str]) -> None:
+        """Apply state read from the DB; values already in memory win."""
+        for theme_id, score in stances.items():
+            self.set_stance(user_id, theme_id, score, overwrite=False)
+        u = self._user(user_id)
+        merged = {self.opinions.intern(o) for o in voted}
+        if merged:
+            if self._voted[u] is not None:
+                merged.update(self._voted[u])
+            self._voted[u] = array("I", sorted(merged))
+        self._loaded[u] = 1
+
+    def clear(self) -> None:
+        if self._owns_users:
+            self.users.clear()
+        self.opinions.clear()
+        self.themes.clear()
+        self._voted.clear()
+        self._stance_themes.clear()
+        self._stance_scores.clear()
+        self._loaded = bytearray()
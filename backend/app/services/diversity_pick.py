@@ -1,16 +1,19 @@
 from __future__ import annotations
-from typing import List, Tuple
-from urllib.parse import urlparse
-import re
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+import heapq
+from operator import neg
+
+from app.config import DIVERSITY_OBJECTIVE, DIVERSITY_SIMILARITY_WEIGHT
+from app.services.near_duplicates import find_near_duplicates, stance_side
 
 def _domain(url: str) -> str:
-    d = urlparse(url).netloc.lower()
+    d = urlsplit(url).netloc.lower()
     return d[4:] if d.startswith("www.") else d
 
 def _norm(s: str) -> str:
-    s = s.strip()
-    s = re.sub(r"\s+", " ", s)
-    return s
+    # same as collapsing \s+ runs after strip(), without the regex
+    return " ".join(s.split())
 
 def _stance_bucket(score: int) -> str:
     if score >= 60:
@@ -21,57 +24,251 @@ def _stance_bucket(score: int) -> str:
         return "neutral"
     return "other"
 
-def pick_diverse_items(items: List, target_n: int = 6) -> Tuple[List, dict]:
+
+class Candidate:
+    """One deduped item with the features objectives score on."""
+
+    __slots__ = ("index", "item", "domain", "bucket", "text", "_shingles")
+
+    def __init__(self, index: int, item: Any, domain: str, bucket: str, text: str):
+        self.index = index
+        self.item = item
+        self.domain = domain
+        self.bucket = bucket
+        self.text = text
+        self._shingles: Optional[FrozenSet[str]] = None
+
+    @property
+    def shingles(self) -> FrozenSet[str]:
+        # character bigrams: no tokenizer needed for Japanese
+        if self._shingles is None:
+            t = self.text.replace(" ", "")
+            self._shingles = frozenset(t[i:i + 2] for i in range(len(t) - 1)) or frozenset([t])
+        return self._shingles
+
+
+class SelectionState:
+    """
+    What has been picked so far. `*_since` record the number of picks at which a
+    stance bucket / domain was first taken; `memo` lets objectives keep incremental
+    work per candidate.
+    """
+
+    def __init__(self) -> None:
+        self.picked: List[Candidate] = []
+        self.used_domains: Dict[str, int] = {}
+        self.bucket_counts: Dict[str, int] = {"pro": 0, "con": 0, "neutral": 0, "other": 0}
+        self.bucket_since: Dict[str, int] = {}
+        self.memo: Dict[int, Any] = {}
+
+    def add(self, c: Candidate) -> None:
+        self.picked.append(c)
+        self.used_domains.setdefault(c.domain, len(self.picked))
+        self.bucket_since.setdefault(c.bucket, len(self.picked))
+        self.bucket_counts[c.bucket] = self.bucket_counts.get(c.bucket, 0) + 1
+
+
+Gain = Union[float, Tuple[float, ...]]
+
+
+class Objective:
+    """
+    Marginal gain of adding a candidate to the current selection: a number, or a
+    tuple compared lexicographically. A candidate's gain must never go up as the
+    selection grows: the selector keeps stale gains in a heap and only re-scores
+    the top (lazy greedy).
+    """
+
+    def gain(self, c: Candidate, state: SelectionState) -> Gain:
+        raise NotImplementedError
+
+    def group(self, c: Candidate) -> Any:
+        """Candidates in the same group always have the same gain (None = no grouping)."""
+        return None
+
+
+class CoverageObjective(Objective):
+    """Stance and domain coverage (the original pick_diverse_items scoring)."""
+
+    def __init__(self, new_bucket: float = 4, new_domain: float = 3, other_penalty: float = 1):
+        self.new_bucket = new_bucket
+        self.new_domain = new_domain
+        self.other_penalty = other_penalty
+
+    def group(self, c: Candidate) -> Any:
+        return (c.domain, c.bucket)
+
+    def score(self, c: Candidate, state: SelectionState) -> float:
+        s = 0
+        if c.bucket not in state.bucket_since:
+            s += self.new_bucket  # fill missing stance first
+        if c.domain not in state.used_domains:
+            s += self.new_domain  # new domain
+        if c.bucket == "other":
+            s -= self.other_penalty  # slight penalty
+        return s
+
+    def gain(self, c: Candidate, state: SelectionState) -> Gain:
+        # Ties are broken the way the old loop (stable re-sort of the remaining
+        # list after every pick) did: by the score history, most recent first,
+        # so the candidate whose score dropped last comes first.
+        s = self.score(c, state)
+        tb = state.bucket_since.get(c.bucket)
+        td = state.used_domains.get(c.domain)
+        if tb is None and td is None:
+            return (s, -1, s, -1, s)
+        drops: Dict[int, float] = {}
+        if tb is not None:
+            drops[tb] = self.new_bucket
+        if td is not None:
+            drops[td] = drops.get(td, 0) + self.new_domain
+        key = [s]
+        level = s
+        for t in sorted(drops, reverse=True):
+            level += drops[t]
+            key += [t, level]
+        key += [-1, level] * (2 - len(drops))
+        return tuple(key)
+
+
+class MMRObjective(Objective):
+    """
+    Maximal marginal relevance: relevance + coverage - weight * (max Jaccard
+    similarity of the candidate's text to anything already picked).
+    """
+
+    def __init__(
+        self,
+        similarity_weight: float = 4.0,
+        coverage: Optional[CoverageObjective] = None,
+        relevance: Optional[Callable[[Any], float]] = None,
+    ):
+        self.similarity_weight = similarity_weight
+        self.coverage = coverage or CoverageObjective()
+        self.relevance = relevance
+
+    def gain(self, c: Candidate, state: SelectionState) -> Gain:
+        # only compare against picks made since this candidate was last scored
+        seen, max_sim = state.memo.get(c.index, (0, 0.0))
+        if seen < len(state.picked):
+            a = c.shingles
+            for p in state.picked[seen:]:
+                b = p.shingles
+                inter = len(a & b)
+                if inter:
+                    max_sim = max(max_sim, inter / (len(a) + len(b) - inter))
+            state.memo[c.index] = (len(state.picked), max_sim)
+        g = self.coverage.score(c, state) - self.similarity_weight * max_sim
+        if self.relevance is not None:
+            g += self.relevance(c.item)
+        return g
+
+
+OBJECTIVES: Dict[str, Callable[[], Objective]] = {
+    "coverage": CoverageObjective,
+    "mmr": lambda: MMRObjective(similarity_weight=DIVERSITY_SIMILARITY_WEIGHT),
+}
+
+
+def get_objective(name: str) -> Objective:
+    try:
+        factory = OBJECTIVES[name]
+    except KeyError:
+        raise ValueError(f"unknown diversity objective: {name!r} (choose from {', '.join(OBJECTIVES)})")
+    return factory()
+
+
+# objectives keep no per-run state (that lives in SelectionState), so one instance is shared
+default_objective = get_objective(DIVERSITY_OBJECTIVE)
+
+
+def _heap_key(g: Gain) -> Tuple[float, ...]:
+    # heapq is a min-heap
+    if isinstance(g, tuple):
+        return tuple(map(neg, g))
+    return (-g,)
+
+
+def select(candidates: List[Candidate], target_n: int, objective: Objective) -> SelectionState:
+    """
+    Greedy selection with lazy re-scoring, O(n log n): heap entries hold the gain
+    as of some earlier pick; a popped entry is re-scored and taken only if it still
+    beats the best stale bound, otherwise pushed back. Ties go to the earlier candidate.
+    When the objective groups candidates, only the first remaining one of each group
+    is in the heap.
+    """
+    state = SelectionState()
+    queues: List[List[Candidate]] = []
+    by_group: Dict[Any, List[Candidate]] = {}
+    for c in candidates:
+        g = objective.group(c)
+        if g is None:
+            queues.append([c])
+        elif g in by_group:
+            by_group[g].append(c)
+        else:
+            by_group[g] = [c]
+            queues.append(by_group[g])
+    # entry: (key, index of the queue head, picks when scored, queue, position in queue)
+    heap = [(_heap_key(objective.gain(q[0], state)), q[0].index, 0, q, 0) for q in queues]
+    heapq.heapify(heap)
+    while heap and len(state.picked) < target_n:
+        key, i, stamp, q, pos = heapq.heappop(heap)
+        if stamp != len(state.picked):
+            key = _heap_key(objective.gain(q[pos], state))
+            if heap and (key, i) > heap[0][:2]:
+                heapq.heappush(heap, (key, i, len(state.picked), q, pos))
+                continue
+        state.add(q[pos])
+        if pos + 1 < len(q):
+            # the old key is still an upper bound; re-scored when it reaches the top
+            heapq.heappush(heap, (key, q[pos + 1].index, -1, q, pos + 1))
+    return state
+
+
+def pick_diverse_items(
+    items: List,
+    target_n: int = 6,
+    objective: Optional[Objective] = None,
+    near_duplicates: bool = True,
+) -> Tuple[List, dict]:
     """
     Generic (topic-agnostic) selection:
     - prefers different stance buckets (pro/con/neutral)
     - prefers different domains
-    - dedupes identical title+summary
+    - dedupes identical title+summary (and paraphrased ones on the same
+      side of the stance unless near_duplicates=False)
+    `objective` replaces the scoring (default: DIVERSITY_OBJECTIVE, see OBJECTIVES).
     """
-    # 1) dedupe identical content
+    # 1) dedupe identical / near-identical content + annotate
     seen = set()
-    uniq = []
+    candidates: List[Candidate] = []
     for it in items:
-        key = (_norm(getattr(it, "topic_name", "")), _norm(getattr(it, "summary", "")))
+        title = _norm(getattr(it, "topic_name", ""))
+        summary = _norm(getattr(it, "summary", ""))
+        key = (title, summary)
         if key in seen:
             continue
         seen.add(key)
-        uniq.append(it)
-
-    # 2) annotate
-    annotated = []
-    for it in uniq:
         url = str(getattr(it, "url"))
         score = int(getattr(it, "agreement_score"))
-        annotated.append((it, _domain(url), _stance_bucket(score)))
-
-    # 3) greedy selection
-    picked = []
-    used_domains = set()
-    bucket_counts = {"pro": 0, "con": 0, "neutral": 0, "other": 0}
-
-    def cand_score(dom: str, b: str) -> int:
-        s = 0
-        if bucket_counts.get(b, 0) == 0:
-            s += 4  # fill missing stance first
-        if dom not in used_domains:
-            s += 3  # new domain
-        if b == "other":
-            s -= 1  # slight penalty
-        return s
+        candidates.append(Candidate(len(candidates), it, _domain(url), _stance_bucket(score), f"{title} {summary}"))
+    if near_duplicates and len(candidates) > 1:
+        dup_of = find_near_duplicates(
+            [c.text for c in candidates],
+            groups=[stance_side(int(c.item.agreement_score)) for c in candidates],
+        )
+        candidates = [c for c, dup in zip(candidates, dup_of) if dup is None]
+        for i, c in enumerate(candidates):
+            c.index = i
 
-    remaining = annotated[:]
-    while remaining and len(picked) < target_n:
-        remaining.sort(key=lambda x: cand_score(x[1], x[2]), reverse=True)
-        it, dom, b = remaining.pop(0)
-        picked.append(it)
-        used_domains.add(dom)
-        bucket_counts[b] = bucket_counts.get(b, 0) + 1
+    # 2) greedy selection
+    state = select(candidates, target_n, objective or default_objective)
 
     meta = {
-        "unique_domains": len(used_domains),
-        "bucket_counts": bucket_counts,
-        "kept": len(picked),
+        "unique_domains": len(state.used_domains),
+        "bucket_counts": state.bucket_counts,
+        "kept": len(state.picked),
         "candidates": len(items),
     }
-    return picked, meta
+    return [c.item for c in state.picked], meta
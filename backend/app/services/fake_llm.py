@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.config import FAKE_ERROR_RATES, FAKE_LATENCY, FAKE_SEED
+
+# In-process stand-ins for Gemini and OpenAI (FAKE_PROVIDERS). Payloads are
+# derived from a hash of the prompt, so the same request always gets the same
+# answer; latency and injected errors come from a seeded RNG.
+
+_VIEWPOINTS = ["賛成派", "慎重派", "中立", "反対派", "現場の声", "専門家"]
+_SOURCES = ["日本経済新聞", "朝日新聞", "NHK", "X (旧Twitter) の投稿", "地方紙のコラム", "専門誌"]
+_ANGLES = ["財源", "安全", "地域経済", "制度設計", "国際比較", "生活への影響", "環境", "世論"]
+_DOMAINS = ["nikkei.com", "asahi.com", "nhk.or.jp", "yomiuri.co.jp", "mainichi.jp", "sankei.com", "jiji.com", "kyodonews.jp"]
+_SCORES = [80, 55, 20, 0, -25, -60, -85, 40]
+# one sentence per card, so the cards are not near-duplicates of each other
+_SUMMARIES = [
+    "{angle}の負担を誰が担うのかをめぐり、自治体と国の見解が割れている。",
+    "専門家は{angle}の面で想定外のコストが生じる可能性を指摘した。",
+    "住民説明会では{angle}への不安を訴える声が相次いだ。",
+    "海外の事例と比べ、日本の{angle}対策は後手に回っているとの見方がある。",
+    "{angle}を重視する立場から、段階的な導入を求める意見書が提出された。",
+    "世論調査では{angle}を理由に賛成すると答えた人が半数を超えた。",
+    "業界団体は{angle}に配慮した制度づくりを政府に要望している。",
+    "{angle}の改善につながるとして、地元経済界は計画を歓迎している。",
+]
+_REPLY = (
+    "なるほど、その視点は大事ですね。私の立場からすると、{angle}の面が一番気になっています。"
+    "ただ、反対の立場の人たちが心配していることにも一理あると思います。あなたはどう考えますか？"
+)
+
+
+class FakeProviderError(Exception):
+    """Injected provider failure; looks like a 503 to resilience.classify."""
+
+    status_code = 503
+
+
+class LatencyModel:
+    """Delay in seconds drawn from "fixed:<ms>", "uniform:<lo>:<hi>" or "lognormal:<median>:<sigma>"."""
+
+    def __init__(self, spec: str):
+        kind, *params = spec.split(":")
+        values = [float(p) for p in params]
+        if kind == "fixed" and len(values) == 1:
+            self._sample = lambda rng: values[0]
+        elif kind == "uniform" and len(values) == 2:
+            self._sample = lambda rng: rng.uniform(values[0], values[1])
+        elif kind == "lognormal" and len(values) == 2:
+            mu = math.log(max(values[0], 1e-6))
+            self._sample = lambda rng: rng.lognormvariate(mu, values[1])
+        else:
+            raise ValueError(f"bad fake latency spec: {spec!r}")
+        self.spec = spec
+
+    def sample(self, rng: random.Random) -> float:
+        return self._sample(rng) / 1000.0
+
+
+class FakeBehavior:
+    """Latency and error injection for one fake provider (thread-safe)."""
+
+    def __init__(self, name: str, latency: str, error_rate: float, seed: int):
+        self.name = name
+        self.latency = LatencyModel(latency)
+        self.error_rate = error_rate
+        self._rng = random.Random(f"{seed}:{name}")
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def draw(self) -> tuple:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency.sample(self._rng)
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return delay, fail
+
+    def call(self) -> None:
+        delay, fail = self.draw()
+        time.sleep(delay)
+        if fail:
+            raise FakeProviderError(f"fake {self.name}: 503 Service Unavailable")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"latency": self.latency.spec, "error_rate": self.error_rate, "calls": self.calls, "errors": self.errors}
+
+
+_behaviors: Dict[str, FakeBehavior] = {}
+_behaviors_lock = threading.Lock()
+
+
+def behavior(name: str) -> FakeBehavior:
+    with _behaviors_lock:
+        if name not in _behaviors:
+            _behaviors[name] = FakeBehavior(
+                name, FAKE_LATENCY.get(name, "fixed:0"), FAKE_ERROR_RATES.get(name, 0.0), FAKE_SEED
+            )
+        return _behaviors[name]
+
+
+def fake_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: b.stats() for name, b in _behaviors.items()}
+
+
+# --- payloads ---
+
+def _prompt_rng(*parts: Any) -> random.Random:
+    digest = hashlib.sha1("\x00".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return random.Random(digest)
+
+
+def fake_opinions(prompt: str, n: int = 5) -> List[Dict[str, Any]]:
+    """generate_opinions 形式（viewpoint / content / source_name / position_score）"""
+    rng = _prompt_rng("opinions", prompt)
+    angles = rng.sample(_ANGLES, n)
+    return [
+        {
+            "viewpoint": _VIEWPOINTS[i % len(_VIEWPOINTS)],
+            "content": f"{angle}の観点から見ると、この問題は慎重に考える必要がある（{rng.randint(1, 999)}）。",
+            "source_name": rng.choice(_SOURCES),
+            "position_score": _SCORES[i] + rng.randint(-5, 5),
+        }
+        for i, angle in enumerate(angles)
+    ]
+
+
+def fake_topic_cards(prompt: str, n: int = 6) -> Dict[str, Any]:
+    """TOPIC_CARDS_JSON_SCHEMA に沿った items（ドメインはすべて別、スコアは賛否・中立を含む）"""
+    rng = _prompt_rng("topic_cards", prompt)
+    domains = rng.sample(_DOMAINS, n)
+    angles = rng.sample(_ANGLES, n)
+    summaries = rng.sample(_SUMMARIES, n)
+    return {
+        "items": [
+            {
+                "topic_name": f"{angle}への影響"[:15],
+                "summary": summaries[i].format(angle=angle)[:100],
+                "url": f"https://www.{domain}/articles/{rng.randint(10**6, 10**7)}",
+                "agreement_score": max(-100, min(100, _SCORES[i % len(_SCORES)] + rng.randint(-5, 5))),
+            }
+            for i, (domain, angle) in enumerate(zip(domains, angles))
+        ]
+    }
+
+
+def fake_reply(prompt: str) -> str:
+    rng = _prompt_rng("reply", prompt)
+    return _REPLY.format(angle=rng.choice(_ANGLES))
+
+
+# --- Gemini ---
+
+class _Part:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def _stream(b: FakeBehavior, text: str, chunks: int = 8) -> Iterator[_Part]:
+    # time to first token ~30% of the sampled latency, the rest spread over the chunks
+    delay, fail = b.draw()
+    time.sleep(delay * 0.3)
+    if fail:
+        raise FakeProviderError(f"fake {b.name}: 503 Service Unavailable")
+    step = max(1, math.ceil(len(text) / chunks))
+    for i in range(0, len(text), step):
+        if i:
+            time.sleep(delay * 0.7 / chunks)
+        yield _Part(text[i:i + step])
+
+
+class FakeGeminiChat:
+    def __init__(self, model: "FakeGeminiModel", history: Optional[List[Dict[str, Any]]]):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content: Any, stream: bool = False, **kwargs: Any) -> Any:
+        text = fake_reply(f"{self.model.system_instruction}\n{len(self.history)}\n{content}")
+        self.history += [
+            {"role": "user", "parts": [str(content)]},
+            {"role": "model", "parts": [text]},
+        ]
+        return self.model._respond(text, stream)
+
+
+class FakeGeminiModel:
+    """Drop-in for genai.GenerativeModel as used through app.core.clients.gemini_model."""
+
+    def __init__(self, model_name: str, system_instruction: Optional[str] = None, generation_config: Optional[Dict[str, Any]] = None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction or ""
+        self.generation_config = generation_config or {}
+
+    def _respond(self, text: str, stream: bool) -> Any:
+        b = behavior("gemini")
+        if stream:
+            return _stream(b, text)
+        b.call()
+        return _Part(text)
+
+    def generate_content(self, contents: Any, stream: bool = False, **kwargs: Any) -> Any:
+        prompt = str(contents)
+        if self.generation_config.get("response_mime_type") == "application/json":
+            # the only JSON prompt sent to Gemini is opinion generation
+            text = json.dumps(fake_opinions(prompt), ensure_ascii=False)
+        else:
+            text = fake_reply(f"{self.system_instruction}\n{prompt}")
+        return self._respond(text, stream)
+
+    def start_chat(self, history: Optional[List[Dict[str, Any]]] = None) -> FakeGeminiChat:
+        return FakeGeminiChat(self, history)
+
+
+# --- OpenAI ---
+
+class _OpenAIResponse:
+    def __init__(self, output_text: str):
+        self.output_text = output_text
+
+
+class _FakeResponses:
+    def create(self, model: str, input: Any, text: Optional[Dict[str, Any]] = None, **kwargs: Any) -> _OpenAIResponse:
+        behavior("openai").call()
+        prompt = input if isinstance(input, str) else json.dumps(input, ensure_ascii=False)
+        fmt = (text or {}).get("format") or {}
+        if fmt.get("type") == "json_schema":
+            # topic cards are the only structured-output request
+            schema_items = fmt.get("schema", {}).get("properties", {}).get("items", {})
+            n = min(6, schema_items.get("maxItems", 6))
+            return _OpenAIResponse(json.dumps(fake_topic_cards(prompt, n), ensure_ascii=False))
+        if "position_score" in prompt:
+            return _OpenAIResponse(json.dumps(fake_opinions(prompt), ensure_ascii=False))
+        return _OpenAIResponse(fake_reply(prompt))
+
+
+class FakeOpenAI:
+    """Drop-in for openai.OpenAI (the `responses.create` subset this app uses)."""
+
+    def __init__(self) -> None:
+        self.responses = _FakeResponses()
@@ -0,0 +1,427 @@
+from __future__ import annotations
+
+import random
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.services.fake_llm import behavior
+
+# In-memory stand-in for the supabase-py client (FAKE_PROVIDERS=supabase).
+# Covers the PostgREST subset this app uses: select / insert / upsert /
+# update / delete, eq / neq / gt / gte / lt / lte / is_ / in_ / or_,
+# order / limit / range, and one-to-many embeds such as
+# select("id,opinions(id,title)") with foreign_table= order / limit.
+# Keys, defaults, unique constraints and foreign keys (checked on write,
+# ON DELETE CASCADE on delete) follow database/schema.sql.
+
+_UNIQUE_VIOLATION = "23505"
+_FOREIGN_KEY_VIOLATION = "23503"
+
+
+class FakeAPIError(Exception):
+    """Shaped like postgrest.exceptions.APIError (`code`, `message`)."""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class _TableSpec:
+    def __init__(self, key: Sequence[str], unique: Sequence[Sequence[str]] = (), uuid_id: bool = False, timestamps: Sequence[str] = ("created_at",)):
+        self.key = tuple(key)
+        self.unique = [tuple(u) for u in unique]
+        self.uuid_id = uuid_id
+        self.timestamps = tuple(timestamps)
+
+
+_TABLES: Dict[str, _TableSpec] = {
+    "users": _TableSpec(["id"], unique=[["nickname"]], uuid_id=True, timestamps=("created_at", "updated_at")),
+    "themes": _TableSpec(["id"], timestamps=("created_at", "updated_at")),
+    "opinions": _TableSpec(["id"], timestamps=("created_at", "updated_at")),
+    "user_stances": _TableSpec(["id"], unique=[["user_id", "theme_id"]], uuid_id=True, timestamps=("created_at", "updated_at")),
+    "user_votes": _TableSpec(["id"], uuid_id=True),
+    "seed_leases": _TableSpec(["name"]),
+}
+
+
+# (parent, child) -> (parent column, child column): the REFERENCES of
+# database/schema.sql, also used for embedded selects
+_FOREIGN_KEYS: Dict[Tuple[str, str], Tuple[str, str]] = {
+    ("themes", "opinions"): ("id", "theme_id"),
+    ("users", "user_stances"): ("id", "user_id"),
+    ("users", "user_votes"): ("id", "user_id"),
+    ("themes", "user_stances"): ("id", "theme_id"),
+    ("opinions", "user_votes"): ("id", "opinion_id"),
+}
+
+
+def _spec(table: str) -> _TableSpec:
+    return _TABLES.get(table) or _TableSpec(["id"])
+
+
+class _Response:
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+# --- filters ---
+
+def _coerce(value: Any, like: Any) -> Any:
+    # PostgREST filter values arrive as strings; compare them as the column's type
+    if isinstance(value, str) and isinstance(like, (int, float)) and not isinstance(like, bool):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _compare(op: str, cell: Any, value: Any) -> bool:
+    if op == "is":
+        return cell is None if str(value).lower() == "null" else cell == value
+    if op == "in":
+        return cell in [_coerce(v, cell) for v in value]
+    if cell is None:
+        # NULL never matches a comparison
+        return op == "neq" and value is not None
+    value = _coerce(value, cell)
+    if isinstance(cell, (int, float)) != isinstance(value, (int, float)):
+        cell, value = str(cell), str(value)
+    return {
+        "eq": cell == value,
+        "neq": cell != value,
+        "gt": cell > value,
+        "gte": cell >= value,
+        "lt": cell < value,
+        "lte": cell <= value,
+    }[op]
+
+
+def _split_top(expr: str) -> List[str]:
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(expr):
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append(expr[start:i])
+            start = i + 1
+    parts.append(expr[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+_COND = re.compile(r'^([\w.]+?)\.(eq|neq|gt|gte|lt|lte|is)\.(.*)$', re.DOTALL)
+
+
+def _parse_logic(expr: str) -> Callable[[Dict[str, Any]], bool]:
+    """Parse a PostgREST logic tree such as `a.gt."x",and(a.eq."x",b.gt."y")` (the items are OR-ed)."""
+
+    def node(item: str) -> Callable[[Dict[str, Any]], bool]:
+        for joiner, combine in (("and(", all), ("or(", any)):
+            if item.startswith(joiner) and item.endswith(")"):
+                children = [node(c) for c in _split_top(item[len(joiner):-1])]
+                return lambda row, c=children, f=combine: f(ch(row) for ch in c)
+        m = _COND.match(item)
+        if not m:
+            raise FakeAPIError("PGRST100", f"unsupported filter: {item}")
+        col, op, raw = m.groups()
+        value = raw[1:-1] if len(raw) >= 2 and raw[0] == raw[-1] == '"' else raw
+        return lambda row: _compare(op, row.get(col), value)
+
+    children = [node(c) for c in _split_top(expr)]
+    return lambda row: any(ch(row) for ch in children)
+
+
+def _sorted(rows: List[Dict[str, Any]], orders: List[Tuple[str, bool]]) -> List[Dict[str, Any]]:
+    # Postgres sorts NULLs last in ascending order (first when descending)
+    rows = list(rows)
+    for col, desc in reversed(orders):
+        rows.sort(key=lambda r: (r.get(col) is None, r.get(col) if r.get(col) is not None else 0), reverse=desc)
+    return rows
+
+
+# --- query builder ---
+
+class _Query:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table = table
+        self.action = "select"
+        self.columns: Optional[List[str]] = None
+        self.payload: Any = None
+        self.on_conflict: Optional[Tuple[str, ...]] = None
+        self.filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.orders: List[Tuple[str, bool]] = []
+        self.offset = 0
+        self.limit_n: Optional[int] = None
+        self.want_count = False
+        # embedded child table -> (columns or None for *, orders, limit)
+        self.embeds: Dict[str, Tuple[Optional[List[str]], List[Tuple[str, bool]], Optional[int]]] = {}
+
+    # actions
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "_Query":
+        plain = []
+        for col in _split_top(columns):
+            if col.endswith(")") and "(" in col:
+                child, inner = col[:-1].split("(", 1)
+                cols = None if inner.strip() == "*" else [c.strip() for c in inner.split(",") if c.strip()]
+                self.embeds[child.strip()] = (cols, [], None)
+            else:
+                plain.append(col)
+        self.columns = None if "*" in plain else plain
+        self.want_count = count is not None
+        return self
+
+    def insert(self, rows: Any, **kwargs: Any) -> "_Query":
+        self.action, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows: Any, on_conflict: str = "", **kwargs: Any) -> "_Query":
+        self.action, self.payload = "upsert", rows
+        self.on_conflict = tuple(c.strip() for c in on_conflict.split(",") if c.strip()) or None
+        return self
+
+    def update(self, values: Dict[str, Any], **kwargs: Any) -> "_Query":
+        self.action, self.payload = "update", values
+        return self
+
+    def delete(self, **kwargs: Any) -> "_Query":
+        self.action = "delete"
+        return self
+
+    # filters
+    def _where(self, col: str, op: str, value: Any) -> "_Query":
+        self.filters.append(lambda row: _compare(op, row.get(col), value))
+        return self
+
+    def eq(self, col: str, value: Any) -> "_Query":
+        return self._where(col, "eq", value)
+
+    def neq(self, col: str, value: Any) -> "_Query":
+        return self._where(col, "neq", value)
+
+    def gt(self, col: str, value: Any) -> "_Query":
+        return self._where(col, "gt", value)
+
+    def gte(self, col: str, value: Any) -> "_Query":
+        return self._where(col, "gte", value)
+
+    def lt(self, col: str, value: Any) -> "_Query":
+        return self._where(col, "lt", value)
+
+    def lte(self, col: str, value: Any) -> "_Query":
+        return self._where(col, "lte", value)
+
+    def is_(self, col: str, value: Any) -> "_Query":
+        return self._where(col, "is", value)
+
+    def in_(self, col: str, values: Sequence[Any]) -> "_Query":
+        return self._where(col, "in", list(values))
+
+    def or_(self, expr: str, **kwargs: Any) -> "_Query":
+        self.filters.append(_parse_logic(expr))
+        return self
+
+    # shaping
+    def order(self, col: str, desc: bool = False, foreign_table: Optional[str] = None, **kwargs: Any) -> "_Query":
+        if foreign_table is not None:
+            self.embeds[foreign_table][1].append((col, desc))
+        else:
+            self.orders.append((col, desc))
+        return self
+
+    def limit(self, n: int, foreign_table: Optional[str] = None, **kwargs: Any) -> "_Query":
+        if foreign_table is not None:
+            cols, orders, _ = self.embeds[foreign_table]
+            self.embeds[foreign_table] = (cols, orders, n)
+        else:
+            self.limit_n = n
+        return self
+
+    def range(self, start: int, end: int, **kwargs: Any) -> "_Query":
+        self.offset, self.limit_n = start, end - start + 1
+        return self
+
+    def execute(self) -> _Response:
+        behavior("supabase").call()
+        return self.db._execute(self)
+
+
+class FakeSupabase:
+    """Drop-in for supabase.Client: `client.table(name)...execute()` against in-memory rows."""
+
+    def __init__(self) -> None:
+        self._tables: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    from_ = table
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(r) for r in self._tables.get(table, [])]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {name: len(rows) for name, rows in self._tables.items()}
+
+    def _matches(self, q: _Query, row: Dict[str, Any]) -> bool:
+        return all(f(row) for f in q.filters)
+
+    def _project(self, q: _Query, row: Dict[str, Any]) -> Dict[str, Any]:
+        out = dict(row) if q.columns is None else {c: row.get(c) for c in q.columns}
+        for child, (cols, orders, limit) in q.embeds.items():
+            if (q.table, child) not in _FOREIGN_KEYS:
+                raise FakeAPIError("PGRST200", f"no relationship between {q.table} and {child}")
+            parent_col, child_col = _FOREIGN_KEYS[(q.table, child)]
+            kids = _sorted([r for r in self._tables.get(child, []) if r.get(child_col) == row.get(parent_col)], orders)
+            out[child] = [dict(r) if cols is None else {c: r.get(c) for c in cols} for r in kids[:limit]]
+        return out
+
+    def _with_defaults(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        spec = _spec(table)
+        out = dict(row)
+        if spec.uuid_id and out.get("id") is None:
+            out["id"] = str(uuid.uuid4())
+        now = datetime.now(timezone.utc).isoformat()
+        for col in spec.timestamps:
+            out.setdefault(col, now)
+        return out
+
+    def _conflict(self, rows: List[Dict[str, Any]], row: Dict[str, Any], cols: Sequence[str], skip: Any = None) -> Optional[Dict[str, Any]]:
+        if any(row.get(c) is None for c in cols):
+            return None
+        for other in rows:
+            if other is not skip and all(other.get(c) == row.get(c) for c in cols):
+                return other
+        return None
+
+    def _check_unique(self, table: str, rows: List[Dict[str, Any]], row: Dict[str, Any], skip: Any = None) -> None:
+        spec = _spec(table)
+        for cols in [spec.key, *spec.unique]:
+            if self._conflict(rows, row, cols, skip) is not None:
+                raise FakeAPIError(
+                    _UNIQUE_VIOLATION, f'duplicate key value violates unique constraint "{table}_{"_".join(cols)}_key"'
+                )
+
+    def _check_references(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        for (parent, child), (parent_col, child_col) in _FOREIGN_KEYS.items():
+            if child != table:
+                continue
+            values = {r.get(child_col) for r in rows} - {None}  # NULL references nothing
+            if not values:
+                continue
+            missing = values - {r.get(parent_col) for r in self._tables.get(parent, [])}
+            if missing:
+                raise FakeAPIError(
+                    _FOREIGN_KEY_VIOLATION,
+                    f'insert or update on table "{table}" violates foreign key constraint "{table}_{child_col}_fkey" '
+                    f"(Key ({child_col})=({sorted(missing, key=str)[0]}) is not present in table \"{parent}\")",
+                )
+
+    def _cascade(self, table: str, removed: List[Dict[str, Any]]) -> None:
+        for (parent, child), (parent_col, child_col) in _FOREIGN_KEYS.items():
+            if parent != table or child not in self._tables:
+                continue
+            gone = {r.get(parent_col) for r in removed}
+            rows = self._tables[child]
+            dropped = [r for r in rows if r.get(child_col) in gone]
+            if dropped:
+                rows[:] = [r for r in rows if r.get(child_col) not in gone]
+                self._cascade(child, dropped)
+
+    def _execute(self, q: _Query) -> _Response:
+        with self._lock:
+            rows = self._tables.setdefault(q.table, [])
+            if q.action == "select":
+                hits = _sorted([r for r in rows if self._matches(q, r)], q.orders)
+                total = len(hits)
+                end = None if q.limit_n is None else q.offset + q.limit_n
+                data = [self._project(q, r) for r in hits[q.offset:end]]
+                return _Response(data, total if q.want_count else None)
+
+            if q.action == "insert":
+                payload = q.payload if isinstance(q.payload, list) else [q.payload]
+                new_rows = [self._with_defaults(q.table, r) for r in payload]
+                staged = list(rows)
+                for row in new_rows:
+                    # the statement is atomic: check everything before touching the table
+                    self._check_unique(q.table, staged, row)
+                    staged.append(row)
+                self._check_references(q.table, new_rows)
+                rows.extend(new_rows)
+                return _Response([dict(r) for r in new_rows])
+
+            if q.action == "upsert":
+                payload = q.payload if isinstance(q.payload, list) else [q.payload]
+                cols = q.on_conflict or _spec(q.table).key
+                staged = [dict(r) for r in rows]
+                out = []
+                for raw in payload:
+                    existing = self._conflict(staged, raw, cols)
+                    if existing is not None:
+                        merged = {**existing, **raw}
+                        self._check_unique(q.table, staged, merged, skip=existing)
+                        existing.update(raw)
+                        out.append(dict(existing))
+                    else:
+                        row = self._with_defaults(q.table, raw)
+                        self._check_unique(q.table, staged, row)
+                        staged.append(row)
+                        out.append(dict(row))
+                self._check_references(q.table, out)
+                rows[:] = staged
+                return _Response(out)
+
+            if q.action == "update":
+                hits = [row for row in rows if self._matches(q, row)]
+                for row in hits:
+                    self._check_unique(q.table, rows, {**row, **q.payload}, skip=row)
+                if hits:
+                    self._check_references(q.table, [q.payload])
+                for row in hits:
+                    row.update(q.payload)
+                return _Response([dict(r) for r in hits])
+
+            if q.action == "delete":
+                kept, removed = [], []
+                for row in rows:
+                    (removed if self._matches(q, row) else kept).append(row)
+                rows[:] = kept
+                self._cascade(q.table, removed)
+                return _Response([dict(r) for r in removed])
+
+        raise FakeAPIError("PGRST000", f"unsupported action {q.action}")
+
+
+def preload_themes(db: FakeSupabase, n_themes: int, opinions_per_theme: int = 6) -> None:
+    """Fill the fake DB with synthetic themes / opinions so /api/themes has something to serve."""
+    themes, opinions = [], []
+    for t in range(n_themes):
+        theme_id = f"theme_fake_{t:05d}"
+        themes.append({"id": theme_id, "title": f"テーマ{t}", "color": "#FFCDD2"})
+        rng = random.Random(t)
+        for o in range(opinions_per_theme):
+            score = float(rng.randint(-100, 100))
+            opinions.append({
+                "id": f"op_fake_{t:05d}_{o}",
+                "theme_id": theme_id,
+                "title": f"論点{o}",
+                "body": f"テーマ{t}についての意見{o}。" * 3,
+                "score": score,
+                "color": "#FFCDD2" if score > 20 else "#BBDEFB" if score < -20 else "#F5F5F5",
+                "source_url": f"https://example.com/{t}/{o}",
+            })
+    if themes:
+        db._execute(_Query(db, "themes").insert(themes))
+        db._execute(_Query(db, "opinions").insert(opinions))
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+from app.services.single_flight import SingleFlight
+
+T = TypeVar("T")
+
+
+class GenerationCache:
+    """
+    TTL + LRU cache in front of an expensive async generation, with
+    single-flight coalescing of concurrent misses for the same key.
+
+    Failed generations are not cached; every caller waiting on that run
+    receives the same exception.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_create(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        found, value = self._lookup(key)
+        if found:
+            self.hits += 1
+            return value
+
+        async def fill() -> T:
+            result = await fn()
+            self._store(key, result)
+            return result
+
+        result, shared = await self._flight.do(key, fill)
+        if shared:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+        return result
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "in_flight": self._flight.stats()["in_flight"],
+        }
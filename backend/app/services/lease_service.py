@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from app.services.supabase_service import enabled, client, error_code
+from app.utils.logger import logger
+
+LEASES_TABLE = "seed_leases"
+
+# Postgres unique_violation: someone else holds the lease row
+_UNIQUE_VIOLATION = "23505"
+
+
+def is_unique_violation(e: BaseException) -> bool:
+    """True if a Supabase/PostgREST error is a unique-key conflict (the row already exists)."""
+    return error_code(e) == _UNIQUE_VIOLATION
+
+
+def _owner_token() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lease(name: str, ttl_seconds: float) -> Optional[str]:
+    """
+    Try to take a cross-process lease backed by a row in `seed_leases`.
+
+    Returns an owner token on success, or None if another process holds an
+    unexpired lease. Expired rows (crashed workers) are cleared first.
+    Without Supabase there is nothing shared to coordinate, so the lease is
+    always granted locally.
+    """
+    token = _owner_token()
+    if not enabled():
+        return token
+
+    sb = client()
+    now = datetime.now(timezone.utc)
+    sb.table(LEASES_TABLE).delete().eq("name", name).lt("expires_at", now.isoformat()).execute()
+
+    try:
+        sb.table(LEASES_TABLE).insert({
+            "name": name,
+            "owner": token,
+            "expires_at": (now + timedelta(seconds=ttl_seconds)).isoformat(),
+        }).execute()
+    except Exception as e:
+        if is_unique_violation(e):
+            return None
+        raise
+
+    return token
+
+
+def release_lease(name: str, token: str) -> None:
+    if not enabled():
+        return
+    try:
+        client().table(LEASES_TABLE).delete().eq("name", name).eq("owner", token).execute()
+    except Exception as e:
+        # the row expires on its own; a failed release only delays the next run
+        logger.warning(f"lease release failed for {name}: {e}")
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional, TypeVar
+
+from app.config import LLM_MAX_CONCURRENCY, LLM_TIMEOUT_SECONDS
+
+T = TypeVar("T")
+
+# The LLM SDKs we use (google.generativeai, openai) are called through their
+# blocking clients. Every call is pushed onto this bounded pool so the event
+# loop keeps serving cheap requests (/api/themes, /api/vote) while a
+# generation is in flight.
+_executor: Optional[ThreadPoolExecutor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+_stats = {
+    "in_flight": 0,
+    "waiting": 0,
+    "completed": 0,
+    "failed": 0,
+    "timed_out": 0,
+    "cancelled": 0,
+}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=LLM_MAX_CONCURRENCY,
+            thread_name_prefix="llm-gateway",
+        )
+    return _executor
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    # Semaphores are bound to the loop that first waits on them; tests and
+    # scripts that run several loops get a fresh one per loop.
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+def _hold_slot(task: "Future[Any]", sem: asyncio.Semaphore, loop: asyncio.AbstractEventLoop) -> None:
+    # The slot (and the in_flight count) belongs to the worker thread, not to
+    # the awaiting coroutine: a timed-out or abandoned call keeps running in
+    # its thread, so the slot is only given back once the thread returns.
+    # Otherwise every timeout would let one more call queue up in the pool.
+    def release() -> None:
+        _stats["in_flight"] -= 1
+        sem.release()
+
+    def on_done(_: "Future[Any]") -> None:
+        try:
+            loop.call_soon_threadsafe(release)
+        except RuntimeError:
+            # loop already closed; its semaphore is gone with it
+            pass
+
+    task.add_done_callback(on_done)
+
+
+async def _acquire(sem: asyncio.Semaphore) -> None:
+    _stats["waiting"] += 1
+    try:
+        await sem.acquire()
+    finally:
+        _stats["waiting"] -= 1
+    _stats["in_flight"] += 1
+
+
+def _submit(fn: Callable[[], Any], sem: asyncio.Semaphore, loop: asyncio.AbstractEventLoop) -> "Future[Any]":
+    try:
+        task = _get_executor().submit(fn)
+    except BaseException:
+        _stats["in_flight"] -= 1
+        sem.release()
+        raise
+    _hold_slot(task, sem, loop)
+    return task
+
+
+async def run_llm(fn: Callable[..., T], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> T:
+    """
+    Run a blocking LLM SDK call without blocking the event loop.
+
+    At most LLM_MAX_CONCURRENCY calls run at once; the rest wait here
+    (not in the thread pool queue) so they can be cancelled cheaply. A call
+    that times out stops being awaited but keeps its slot until its thread
+    has actually finished.
+    """
+    sem = _get_semaphore()
+    timeout = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    await _acquire(sem)
+
+    loop = asyncio.get_running_loop()
+    fut = asyncio.wrap_future(_submit(functools.partial(fn, *args, **kwargs), sem, loop), loop=loop)
+    try:
+        if timeout and timeout > 0:
+            result = await asyncio.wait_for(fut, timeout=timeout)
+        else:
+            result = await fut
+        _stats["completed"] += 1
+        return result
+    except asyncio.TimeoutError:
+        _stats["timed_out"] += 1
+        raise
+    except Exception:
+        _stats["failed"] += 1
+        raise
+
+
+async def stream_llm(
+    fn: Callable[..., Iterable[T]], *args: Any, timeout: Optional[float] = None, **kwargs: Any,
+) -> AsyncIterator[T]:
+    """
+    Streaming counterpart of run_llm: `fn` returns a blocking iterator
+    (e.g. Gemini's send_message(..., stream=True)); items are handed to the
+    event loop as soon as the SDK yields them.
+
+    `timeout` (default LLM_TIMEOUT_SECONDS) is an idle deadline: waiting
+    longer than that for the first or any next chunk raises TimeoutError.
+    When the consumer stops iterating (client disconnect, counted as
+    cancelled) or the stream times out, the producer thread stops at the
+    next chunk; the call holds its concurrency slot until then.
+    """
+    sem = _get_semaphore()
+    timeout = LLM_TIMEOUT_SECONDS if timeout is None else timeout
+    await _acquire(sem)
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def put(entry) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, entry)
+        except RuntimeError:
+            # loop already closed; nobody is listening any more
+            stop.set()
+
+    def produce() -> None:
+        try:
+            for item in fn(*args, **kwargs):
+                if stop.is_set():
+                    return
+                put((item, None))
+            put((done, None))
+        except BaseException as e:
+            put((done, e))
+
+    _submit(produce, sem, loop)
+    # anything that leaves the loop without an outcome is the consumer walking away
+    outcome = "cancelled"
+    try:
+        while True:
+            try:
+                if timeout and timeout > 0:
+                    item, err = await asyncio.wait_for(queue.get(), timeout=timeout)
+                else:
+                    item, err = await queue.get()
+            except asyncio.TimeoutError:
+                outcome = "timed_out"
+                raise
+            if item is done:
+                if err is not None:
+                    outcome = "failed"
+                    raise err
+                outcome = "completed"
+                break
+            yield item
+    finally:
+        stop.set()
+        _stats[outcome] += 1
+
+
+def gateway_stats() -> Dict[str, int]:
+    return {"max_concurrency": LLM_MAX_CONCURRENCY, **_stats}
+
+
+def shutdown_gateway() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
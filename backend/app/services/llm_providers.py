@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, TypeVar
+
+from app.config import (
+    GOOGLE_API_KEY,
+    OPENAI_API_KEY,
+    OPINIONS_GEMINI_MODEL,
+    OPINIONS_HEDGE_DELAY_SECONDS,
+    OPINIONS_OPENAI_MODEL,
+    OPINIONS_PROVIDERS,
+)
+from app.services.llm_gateway import run_llm
+from app.services.resilience import RetryPolicy, call_with_retry
+from app.utils.logger import logger
+
+T = TypeVar("T")
+
+
+class LLMProvider:
+    """A text-completion backend. `complete` is blocking; callers run it on the LLM gateway."""
+
+    name = "base"
+
+    def available(self) -> bool:
+        return True
+
+    def complete(self, prompt: str, json_output: bool = False) -> str:
+        raise NotImplementedError
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def available(self) -> bool:
+        return bool(GOOGLE_API_KEY)
+
+    def complete(self, prompt: str, json_output: bool = False) -> str:
+        from app.core.clients import gemini_model
+
+        config = {"response_mime_type": "application/json"} if json_output else None
+        return gemini_model(self.model_name, generation_config=config).generate_content(prompt).text
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def available(self) -> bool:
+        return bool(OPENAI_API_KEY)
+
+    def complete(self, prompt: str, json_output: bool = False) -> str:
+        from app.core.clients import openai_client
+
+        # the opinion prompts ask for a bare JSON list, which json_object mode would reject
+        return openai_client().responses.create(model=self.model, input=prompt).output_text
+
+
+PROVIDERS: Dict[str, LLMProvider] = {
+    "gemini": GeminiProvider(OPINIONS_GEMINI_MODEL),
+    "openai": OpenAIProvider(OPINIONS_OPENAI_MODEL),
+}
+
+
+@dataclass
+class HedgeResult:
+    value: Any
+    provider: str
+    latency: float
+    hedged: bool  # a second request was sent while the first was still running
+
+
+class _Attempt:
+    """One provider call; finish time is recorded in the worker thread, even after we stop waiting."""
+
+    def __init__(self, provider: LLMProvider, loop: asyncio.AbstractEventLoop):
+        self.provider = provider
+        self.loop = loop
+        self.started = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.text: Optional[str] = None
+        self.error: Optional[BaseException] = None
+        self.done = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def call(self, prompt: str, json_output: bool) -> str:
+        try:
+            self.text = self.provider.complete(prompt, json_output)
+            return self.text
+        except Exception as e:
+            self.error = e
+            raise
+        finally:
+            self.finished_at = time.monotonic()
+            self.loop.call_soon_threadsafe(self.done.set)
+
+
+class Hedger:
+    """
+    Hedged requests across providers: start the first provider, and if it
+    has not produced a valid answer after `hedge_delay` seconds (or fails
+    earlier, or its circuit is open) start the next one. The first answer
+    that passes `validate` wins; the others are cancelled.
+
+    Every attempt is one call_with_retry attempt, so it goes through the
+    provider's circuit breaker and rate limit like any other call: a hedge
+    cannot push a provider over PROVIDER_RATE_LIMITS, and an open circuit
+    fails the attempt at once (the next provider is started right away).
+
+    A blocking SDK call cannot be interrupted, so "cancelled" means we stop
+    waiting and free the gateway slot; the thread still records when the
+    call actually ended, which is how the latency saved by a hedge win is
+    measured (loser's real finish minus the win).
+    """
+
+    # hedging is the retry: one attempt per provider
+    _policy = RetryPolicy(max_attempts=1, base_delay=0.0, max_delay=0.0)
+
+    def __init__(self, providers: Dict[str, LLMProvider], order: Sequence[str], hedge_delay: float):
+        self.providers = providers
+        self.order = [name for name in order if name in providers]
+        self.hedge_delay = hedge_delay
+        self._watchers: set = set()
+        self.calls = 0
+        self.hedges = 0
+        self.failures = 0
+        self.wins: Dict[str, int] = {name: 0 for name in self.order}
+        self.hedge_wins = 0
+        self.saved_seconds_total = 0.0
+        self.saved_samples: Deque[float] = deque(maxlen=512)
+        self.losers_failed = 0
+
+    def _candidates(self) -> List[LLMProvider]:
+        return [self.providers[n] for n in self.order if self.providers[n].available()]
+
+    async def run(
+        self,
+        prompt: str,
+        validate: Callable[[str], T],
+        json_output: bool = False,
+    ) -> HedgeResult:
+        candidates = self._candidates()
+        if not candidates:
+            raise RuntimeError("no LLM provider is configured")
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        t0 = time.monotonic()
+        pending: List[_Attempt] = []
+        queue = list(candidates)
+        last_err: Optional[BaseException] = None
+
+        hedged = False
+
+        def launch() -> bool:
+            nonlocal hedged
+            if not queue:
+                return False
+            # only a request sent while another is still running is a hedge;
+            # moving on after a failure is a plain fallback
+            hedged = hedged or bool(pending)
+            attempt = _Attempt(queue.pop(0), loop)
+            attempt.task = asyncio.ensure_future(call_with_retry(
+                lambda: run_llm(attempt.call, prompt, json_output), attempt.provider.name, self._policy,
+            ))
+            pending.append(attempt)
+            return True
+
+        launch()
+        try:
+            while pending or queue:
+                if not pending and not launch():
+                    break
+                wait_for = self.hedge_delay if queue else None
+                done, _ = await asyncio.wait([a.task for a in pending], timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # the running attempts are slow: hedge with the next provider
+                    launch()
+                    continue
+                for attempt in [a for a in pending if a.task in done]:
+                    pending.remove(attempt)
+                    try:
+                        value = validate(attempt.task.result())
+                    except Exception as e:
+                        # breaker outcomes (including a rejected answer: the
+                        # provider is healthy) were recorded by call_with_retry
+                        last_err = e
+                        logger.warning(f"{attempt.provider.name} answer rejected: {e}")
+                        continue
+                    self._finish(attempt, pending, hedged, validate)
+                    return HedgeResult(value, attempt.provider.name, time.monotonic() - t0, hedged)
+                # every finished attempt failed; go on now rather than after the delay
+                if not pending:
+                    launch()
+        finally:
+            # cancelled attempts count as neutral for the breaker (call_with_retry)
+            for attempt in pending:
+                attempt.task.cancel()
+
+        self.failures += 1
+        if hedged:
+            self.hedges += 1
+        raise RuntimeError(f"all providers failed: {last_err}") from last_err
+
+    def _finish(self, winner: _Attempt, losers: List[_Attempt], hedged: bool, validate: Callable) -> None:
+        self.wins[winner.provider.name] = self.wins.get(winner.provider.name, 0) + 1
+        if hedged:
+            self.hedges += 1
+        won_at = time.monotonic()
+        for loser in losers:
+            if loser.started < winner.started:
+                self.hedge_wins += 1
+                watcher = asyncio.ensure_future(self._measure_saved(loser, won_at, validate))
+                self._watchers.add(watcher)
+                watcher.add_done_callback(self._watchers.discard)
+
+    async def _measure_saved(self, loser: _Attempt, won_at: float, validate: Callable) -> None:
+        await loser.done.wait()
+        try:
+            if loser.error is not None:
+                raise loser.error
+            validate(loser.text)
+        except Exception:
+            # without the hedge this request would have failed outright
+            self.losers_failed += 1
+            return
+        saved = max(0.0, loser.finished_at - won_at)
+        self.saved_seconds_total += saved
+        self.saved_samples.append(saved)
+
+    def stats(self) -> Dict[str, Any]:
+        samples = sorted(self.saved_samples)
+        return {
+            "order": self.order,
+            "hedge_delay_seconds": self.hedge_delay,
+            "calls": self.calls,
+            "hedged": self.hedges,
+            "failures": self.failures,
+            "wins": dict(self.wins),
+            "hedge_wins": self.hedge_wins,
+            "hedge_losers_failed": self.losers_failed,
+            "latency_saved_seconds_total": round(self.saved_seconds_total, 2),
+            "latency_saved_p50_ms": round(samples[len(samples) // 2] * 1000, 1) if samples else None,
+        }
+
+
+opinion_hedger = Hedger(PROVIDERS, OPINIONS_PROVIDERS, OPINIONS_HEDGE_DELAY_SECONDS)
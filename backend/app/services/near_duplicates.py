@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import functools
+import re
+import unicodedata
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from app.config import NEAR_DUP_NGRAM, NEAR_DUP_NUM_PERM, NEAR_DUP_THRESHOLD
+
+# Near-duplicate detection for short Japanese texts. MinHash signatures are
+# taken over character n-grams, so no tokenizer is needed; an LSH index only
+# compares texts that share one band of their signature, so a lookup costs
+# about the same whether ten or a million texts are indexed.
+
+_NON_WORD = re.compile(r"[\W_]+")
+_GRAM_BASE = 0x100000001B3  # FNV-64 prime; code points are < 2**21
+
+
+def stance_side(score: Optional[float]) -> int:
+    """
+    1 / -1 / 0 for agreeing / opposing / neutral (within ±10, or no score).
+    Opinions on different sides are never duplicates, however alike their
+    wording ("...に必要だ" / "...に不要だ"): pass this as the `groups` of
+    find_near_duplicates.
+    """
+    if score is None or -10 <= score <= 10:
+        return 0
+    return 1 if score > 0 else -1
+
+
+def normalize(text: str) -> str:
+    """NFKC, lower case, punctuation and whitespace removed (、。「」 and spacing never make texts differ)."""
+    return _NON_WORD.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+@functools.lru_cache(maxsize=None)
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    (bands, rows per band) for `num_perm` hashes. Two texts with Jaccard
+    similarity s share a band with probability 1 - (1 - s**rows)**bands; pick
+    the split where that curve misses the fewest pairs above `threshold`
+    (weighted 2:1 over extra candidates below it, which are only re-checked).
+    """
+    steps = 200
+
+    def area(lo: float, hi: float, f: Callable[[float], float]) -> float:
+        width = (hi - lo) / steps
+        return sum(f(lo + (i + 0.5) * width) for i in range(steps)) * width
+
+    best, best_cost = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            p = lambda s: 1 - (1 - s ** rows) ** bands  # noqa: E731
+            cost = area(0.0, threshold, p) + 2 * area(threshold, 1.0, lambda s: 1 - p(s))
+            if cost < best_cost:
+                best, best_cost = (bands, rows), cost
+    return best
+
+
+class MinHasher:
+    """MinHash signatures (`num_perm` uint32 values per text) for many texts at once, vectorised with NumPy."""
+
+    def __init__(self, num_perm: int = NEAR_DUP_NUM_PERM, ngram: int = NEAR_DUP_NGRAM, seed: int = 1):
+        # only needed once something is deduplicated, not at app startup
+        import numpy as np
+
+        self._np = np
+        self.num_perm = num_perm
+        self.ngram = ngram
+        rng = np.random.default_rng(seed)
+        # multiply-shift hashing on 64-bit words: h(x) = (a*x + b) >> 32 with odd a
+        self._a = (rng.integers(0, 2**64, num_perm, dtype=np.uint64, endpoint=False) | np.uint64(1))[:, None]
+        self._b = rng.integers(0, 2**64, num_perm, dtype=np.uint64, endpoint=False)[:, None]
+
+    def signatures(self, texts: Sequence[str], chunk: int = 500) -> Any:
+        """(len(texts), num_perm) uint32 array."""
+        np = self._np
+        out = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for lo in range(0, len(texts), chunk):
+            out[lo:lo + chunk] = self._signatures(texts[lo:lo + chunk])
+        return out
+
+    def _signatures(self, texts: Sequence[str]) -> Any:
+        np = self._np
+        n = self.ngram
+        # texts shorter than one n-gram are padded so every text has at least one
+        docs = [normalize(t).ljust(n, "\0") for t in texts]
+        lengths = np.fromiter(map(len, docs), dtype=np.int64, count=len(docs))
+        cps = np.frombuffer("".join(docs).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+
+        # polynomial hash of every n-character window of the concatenation ...
+        width = len(cps) - n + 1
+        grams = cps[:width].copy()
+        base = np.uint64(_GRAM_BASE)
+        for j in range(1, n):
+            grams = grams * base + cps[j:j + width]
+        # ... minus the windows that run from one text into the next
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        keep = np.ones(width, dtype=bool)
+        for j in range(1, n):
+            keep[starts[1:] - j] = False
+        grams = grams[keep]
+
+        hashed = (self._a * grams + self._b) >> np.uint64(32)
+        offsets = np.concatenate(([0], np.cumsum(lengths - n + 1)[:-1]))
+        return np.minimum.reduceat(hashed, offsets, axis=1).T
+
+
+@functools.lru_cache(maxsize=None)
+def get_hasher(num_perm: int = NEAR_DUP_NUM_PERM, ngram: int = NEAR_DUP_NGRAM) -> MinHasher:
+    # signatures are only comparable when made by the same hash functions
+    return MinHasher(num_perm, ngram)
+
+
+@functools.lru_cache(maxsize=None)
+def _band_mix(bands: int, rows: int) -> Any:
+    # one integer per band: the band's hash values mixed with random odd multipliers (a different
+    # set per band, so equal values in different bands do not share a bucket). Collisions only add
+    # candidates, which are checked against the threshold anyway
+    import numpy as np
+
+    rng = np.random.default_rng(bands * rows)
+    return rng.integers(0, 2**64, (bands, rows), dtype=np.uint64, endpoint=False) | np.uint64(1)
+
+
+class NearDuplicateIndex:
+    """
+    LSH index over MinHash signatures. A query looks only at texts sharing at
+    least one band with it and keeps those whose estimated Jaccard similarity
+    (share of equal signature values) reaches the threshold.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD, hasher: Optional[MinHasher] = None):
+        self.hasher = hasher or get_hasher()
+        self.threshold = threshold
+        self.bands, self.rows = lsh_params(threshold, self.hasher.num_perm)
+        self._mix = _band_mix(self.bands, self.rows)
+        self._buckets: Dict[int, List[int]] = {}
+        self._keys: List[Hashable] = []
+        # signatures as rows of one array (grown by doubling) so a query checks all its candidates at once
+        np = self.hasher._np
+        self._matrix = np.empty((16, self.hasher.num_perm), dtype=np.uint32)
+        self.compared = 0  # candidate signatures checked (the work LSH saves is all the others)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def band_keys(self, signatures: Any) -> List[List[int]]:
+        """Bucket keys of each signature in a (n, num_perm) array, one per band; pass them to add / find."""
+        np = self.hasher._np
+        used = signatures[:, :self.bands * self.rows].astype(np.uint64).reshape(len(signatures), self.bands, self.rows)
+        return (used * self._mix).sum(axis=2, dtype=np.uint64).tolist()
+
+    def add(self, key: Hashable, signature: Any, band_keys: Optional[List[int]] = None) -> None:
+        row = len(self._keys)
+        if row == len(self._matrix):
+            self._matrix = self.hasher._np.concatenate([self._matrix, self._matrix])
+        self._matrix[row] = signature
+        self._keys.append(key)
+        if band_keys is None:
+            band_keys = self.band_keys(signature[None])[0]
+        buckets = self._buckets
+        for band in band_keys:
+            bucket = buckets.get(band)
+            if bucket is None:
+                buckets[band] = [row]
+            else:
+                bucket.append(row)
+
+    def _candidates(self, band_keys: List[int]) -> List[List[int]]:
+        get = self._buckets.get
+        return [b for b in map(get, band_keys) if b]
+
+    def query(self, signature: Any, band_keys: Optional[List[int]] = None) -> List[Tuple[Hashable, float]]:
+        """(key, estimated similarity) of indexed texts at or above the threshold, most similar first."""
+        np = self.hasher._np
+        if band_keys is None:
+            band_keys = self.band_keys(signature[None])[0]
+        rows: Dict[int, None] = {}
+        for bucket in self._candidates(band_keys):
+            rows.update(dict.fromkeys(bucket))
+        if not rows:
+            return []
+        self.compared += len(rows)
+        candidates = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        sims = (self._matrix[candidates] == signature).sum(axis=1) / len(signature)
+        order = np.argsort(-sims, kind="stable")
+        return [(self._keys[candidates[i]], float(sims[i])) for i in order if sims[i] >= self.threshold]
+
+    def find(self, signature: Any, band_keys: Optional[List[int]] = None) -> Optional[Tuple[Hashable, float]]:
+        """
+        Some indexed text at or above the threshold (the most similar one of the
+        first band that has any), or None. Cheaper than query() when buckets are big.
+        """
+        if band_keys is None:
+            band_keys = self.band_keys(signature[None])[0]
+        buckets = self._candidates(band_keys)
+        if not buckets:
+            return None
+        checked: set = set()
+        for bucket in buckets:
+            rows = [r for r in bucket if r not in checked] if checked else bucket
+            if not rows:
+                continue
+            checked.update(rows)
+            self.compared += len(rows)
+            equal = (self._matrix[rows] == signature).sum(axis=1)
+            best = int(equal.argmax())
+            sim = float(equal[best]) / len(signature)
+            if sim >= self.threshold:
+                return self._keys[rows[best]], sim
+        return None
+
+
+def find_near_duplicates(
+    texts: Sequence[str],
+    groups: Optional[Sequence[Hashable]] = None,
+    threshold: float = NEAR_DUP_THRESHOLD,
+    chunk: int = 5000,
+) -> List[Optional[Tuple[int, float]]]:
+    """
+    For each text in order: (position of the earlier kept text it duplicates,
+    estimated similarity), or None if it is kept. Texts are only compared with
+    kept ones, so in a chain A~B~C where A and C differ, A and C are kept.
+    With `groups`, only texts of the same group are compared.
+    """
+    hasher = get_hasher()
+    indexes: Dict[Hashable, NearDuplicateIndex] = {}
+    out: List[Optional[Tuple[int, float]]] = []
+    # signatures chunk by chunk: only the kept ones stay in memory (in the indexes)
+    for lo in range(0, len(texts), chunk):
+        sigs = hasher.signatures(texts[lo:lo + chunk])
+        keys: Optional[List[List[int]]] = None
+        for i, sig in enumerate(sigs, start=lo):
+            group = groups[i] if groups is not None else None
+            index = indexes.get(group)
+            if index is None:
+                index = indexes[group] = NearDuplicateIndex(threshold, hasher)
+            if keys is None:
+                # the band split depends only on threshold / num_perm, so any index can key the whole chunk
+                keys = index.band_keys(sigs)
+            band_keys = keys[i - lo]
+            hit = index.find(sig, band_keys)
+            if hit is not None:
+                out.append(hit)
+            else:
+                index.add(i, sig, band_keys)
+                out.append(None)
+    return out
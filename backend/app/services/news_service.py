@@ -1,71 +1,97 @@
 # backend/app/services/news_service.py
 
-# ユーザーの立ち位置データ
-user_stances_db = {}
-
-# 意見のスコアを覚えておく場所
-opinion_scores_cache = {} 
-
-# ★追加: 投票履歴を管理する辞書 (user_id: {opinion_id1, opinion_id2, ...})
-user_vote_history = {}
+import asyncio
+
+from app.config import USER_LOCK_STRIPES
+from app.services.compact_user_store import CompactUserStore
+from app.services.opinion_score_index import opinion_score_index
+from app.services.stance_distribution import stance_distributions
+from app.services.stance_formula import clamp_stance, stance_formula
+from app.services.stance_store import load_user_state, stance_write_behind
+from app.services.striped_lock import StripedLock
+from app.utils.logger import logger
+
+# ユーザーの立ち位置データ・投票履歴・DBから読み込み済みかどうか
+# （ID を整数に置き換えて配列で持つので、ユーザー数が増えてもメモリを食わない）
+# ユーザーIDの整数化は stance_distributions と共有する（ID文字列をプロセスで1つだけ持つ）
+user_store = CompactUserStore(users=stance_distributions.users)
+
+# ユーザー単位のロック（ストライプ）
+# 読み込み → 重複チェック → スコア更新 を同じユーザーについて直列化する。
+# 別ユーザー同士はほぼ別ストライプになるので、待ちが発生するのは同じユーザーの連打だけ
+user_locks = StripedLock(USER_LOCK_STRIPES)
 
 class NewsService:
     # AIが作った意見のスコアを登録するメソッド
-    def register_opinion(self, opinion_id: str, score: float):
-        opinion_scores_cache[opinion_id] = score
+    def register_opinion(self, opinion_id: str, score: float, theme_id: str = None):
+        opinion_score_index.put(opinion_id, score, theme_id)
+
+    async def _ensure_user_loaded(self, user_id: str):
+        """
+        再起動後の初回アクセス時に、そのユーザーの立場と投票履歴だけを DB から読み込む
+        （メモリ上の値がある場合はそちらを優先）
+        """
+        if user_store.is_loaded(user_id):
+            return
+        try:
+            stances, voted = await asyncio.to_thread(load_user_state, user_id)
+        except Exception as e:
+            # DBが落ちていても投票自体は受け付ける（次回アクセス時に再読み込み）
+            logger.error(f"ユーザー状態の読み込みに失敗: {user_id}: {e}")
+            return
+        user_store.merge_loaded(user_id, stances, voted)
 
     async def get_user_stance(self, user_id: str, theme_id: str):
         """ユーザーの現在のスタンスを取得"""
-        user_data = user_stances_db.get(user_id, {})
-        score = user_data.get(theme_id, 0.0)
+        if not user_store.is_loaded(user_id):
+            async with user_locks.get(user_id):
+                await self._ensure_user_loaded(user_id)
+        score = user_store.get_stance(user_id, theme_id, 0.0)
         return {"user_id": user_id, "theme_id": theme_id, "stance_score": score}
 
+    async def get_stance_distribution(self, user_id: str, theme_id: str):
+        """テーマ全体の立場の分布と、その中での自分の位置（パーセンタイル）"""
+        if not user_store.is_loaded(user_id):
+            async with user_locks.get(user_id):
+                await self._ensure_user_loaded(user_id)
+        # まだ投票していないテーマなら自分の位置は出さない
+        score = user_store.get_stance(user_id, theme_id, None)
+        return stance_distributions.summary(theme_id, score)
+
     async def update_stance_score(self, user_id: str, theme_id: str, opinion_id: str, vote_type: str):
+        async with user_locks.get(user_id):
+            await self._ensure_user_loaded(user_id)
+            return self._apply_vote(user_id, theme_id, opinion_id, vote_type)
+
+    def _apply_vote(self, user_id: str, theme_id: str, opinion_id: str, vote_type: str):
+        """user_locks を保持した状態で呼ぶこと（途中で await しない）"""
+        # 書き込みキューが満杯なら、状態を変える前に断る（VoteQueueFull → 503）
+        stance_write_behind.ensure_capacity(user_id)
+
         # --- ★重複投票チェック ---
-        # 履歴が存在し、かつ今回のopinion_idが含まれているか確認
-        if user_id in user_vote_history and opinion_id in user_vote_history[user_id]:
+        # 今回の投票を履歴に追加（すでに含まれていれば投票済み）
+        if not user_store.add_vote(user_id, opinion_id):
             raise Exception("すでにこの意見に投票済みです")
-        
-        # 履歴がない場合は新規作成
-        if user_id not in user_vote_history:
-            user_vote_history[user_id] = set()
-        
-        # 今回の投票を履歴に追加
-        user_vote_history[user_id].add(opinion_id)
 
         # --- 既存のスコア計算・保存処理 ---
         opinion_score = self._get_opinion_score(opinion_id)
         
-        # ユーザーの現在地取得
-        user_data = user_stances_db.get(user_id, {})
-        current_score = user_data.get(theme_id, 0.0)
-
-        # 影響率
-        INFLUENCE_RATE = 0.5
-        move_amount = 0.0
-
-        if vote_type == 'agree':
-            # 【賛成】差を縮める（引力）
-            move_amount = opinion_score * INFLUENCE_RATE
-        elif vote_type == 'oppose':
-            # 【反対】差を広げる（反発力）
-            move_amount = -1 * (opinion_score * INFLUENCE_RATE)
+        # ユーザーの現在地取得（まだ立場がなければ None）
+        previous_score = user_store.get_stance(user_id, theme_id, None)
+        current_score = 0.0 if previous_score is None else previous_score
 
-        # 微調整: 動きが小さすぎるときの最低保証
-        # (※賛成時のみの処理として記述されていますが、必要に応じて反対時も考慮するとより良くなります)
-        if vote_type == 'agree':
-            if 0 < move_amount < 1: move_amount = 1
-            if -1 < move_amount < 0: move_amount = -1
-
-        new_score = current_score + move_amount
-
-        # 範囲制限 (-100 ~ 100)
-        # new_score = max(-100.0, min(100.0, new_score))
+        # 計算式は stance_formula に切り出し（再計算ジョブ stance_replay と同じ式を使う）
+        # -100〜100 に収めるのはここ（メモリ・分布・DB が同じ値を持つように）
+        new_score = clamp_stance(stance_formula.apply(current_score, opinion_score, vote_type))
+        move_amount = new_score - current_score
 
         # 保存
-        if user_id not in user_stances_db:
-            user_stances_db[user_id] = {}
-        user_stances_db[user_id][theme_id] = new_score
+        user_store.set_stance(user_id, theme_id, new_score)
+        # テーマごとの分布（ヒストグラム・パーセンタイル）も差分で更新
+        stance_distributions.record(theme_id, user_id, new_score)
+
+        # DBへはまとめて書き込む（write-behind）
+        stance_write_behind.record(user_id, theme_id, opinion_id, vote_type, new_score)
 
         print(f"Update: {current_score:.1f} -> {new_score:.1f} (Target:{opinion_score}, Move:{move_amount:.1f})")
 
@@ -76,7 +102,9 @@ class NewsService:
 
     # クラス内のプライベートメソッド
     def _get_opinion_score(self, opinion_id):
-        return opinion_scores_cache.get(opinion_id, 0.0)
+        # DBの opinions から起動時に読み込み済みのインデックスを引く（投票ごとのDBアクセスはしない）
+        score = opinion_score_index.get(opinion_id)
+        return 0.0 if score is None else score
 
 # ★★★ クラスの外側でインスタンス化 ★★★
 news_service = NewsService()
\ No newline at end of file
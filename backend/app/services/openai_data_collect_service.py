@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import json
-import time
 import hashlib
 from typing import Optional, List, Tuple
 from urllib.parse import urlparse
@@ -9,11 +8,12 @@ from collections import Counter
 from dataclasses import dataclass
 import re
 
-from pydantic import BaseModel, Field, HttpUrl, ValidationError
-from openai import OpenAI
-
-from app.config import OPENAI_API_KEY, TOPIC_CARDS_MODEL
+from pydantic import BaseModel, Field, HttpUrl
+from app.config import OPENAI_API_KEY, TOPIC_CARDS_ATTEMPT_TIMEOUT_SECONDS, TOPIC_CARDS_MODEL
+from app.core.clients import openai_client
 from app.services.diversity_pick import pick_diverse_items
+from app.services.llm_gateway import run_llm
+from app.services.resilience import InvalidOutput, call_with_retry
 
 class CollectedItem(BaseModel):
     topic_name: str = Field(max_length=15)
@@ -190,65 +190,70 @@ def _build_prompt(
 
 
 
-def collect_topic_cards(topic: str, max_items: int = 8, theme_statement: Optional[str] = None, min_sources: int = 4, max_per_url: int = 2) -> CollectedItems:
-    if not OPENAI_API_KEY:
-        raise RuntimeError("OPENAI_API_KEY is not set")
-    
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    prompt = _build_prompt(topic, max_items, theme_statement, min_sources=min_sources, max_per_url=max_per_url)
+def _request_topic_cards(client, prompt: str) -> CollectedItems:
+    """One attempt: call the model and validate its output (blocking; run through the LLM gateway)."""
+    resp = client.responses.create(
+        model=TOPIC_CARDS_MODEL,
+        input=prompt,
+        tools=[{"type": "web_search"}],
+        text={
+            "format": {
+                "type": "json_schema",
+                "name": "topic_cards",
+                "schema": TOPIC_CARDS_JSON_SCHEMA,
+                "strict": True,
+            }
+        },
+    )
+    data = json.loads(resp.output_text)
 
-    last_err: Exception | None = None
-    for attempt in range(1, 4):
-        try:
-            resp = client.responses.create(
-                model=TOPIC_CARDS_MODEL,
-                input=prompt,
-                tools=[{"type": "web_search"}],
-                text={
-                    "format": {
-                        "type": "json_schema",
-                        "name": "topic_cards",
-                        "schema": TOPIC_CARDS_JSON_SCHEMA,
-                        "strict": True,
-                    }
-                },
-            )
-            data = json.loads(resp.output_text)
-            
-            parsed = CollectedItems(**data)
+    parsed = CollectedItems(**data)
 
-            # filtered, domain_count, kept_count = _postprocess_items(
-            #     parsed,
-            #     min_sources=min_sources,
-            #     max_per_url=max_per_url,
-            # )
+    # filtered, domain_count, kept_count = _postprocess_items(
+    #     parsed,
+    #     min_sources=min_sources,
+    #     max_per_url=max_per_url,
+    # )
 
-            picked, meta = pick_diverse_items(parsed.items, target_n=6)
+    picked, meta = pick_diverse_items(parsed.items, target_n=6)
 
-            print("[diversity_pick]", meta)
+    print("[diversity_pick]", meta)
 
-            if len(picked) < 4:
-                # extremely rare; treat as failure
-                raise RuntimeError("Not enough diverse items after selection")
+    if len(picked) < 4:
+        # extremely rare; treat as failure
+        raise InvalidOutput("Not enough diverse items after selection")
 
-            return CollectedItems(items=picked)
+    return CollectedItems(items=picked)
 
-            # Quality gate: if not enough unique domains, trigger warning
-            # if domain_count < min_sources:
-            #     print(f"[WARN] Not enough unique sources: {domain_count} < {min_sources} (kept={kept_count})")
-            #     return filtered
+    # Quality gate: if not enough unique domains, trigger warning
+    # if domain_count < min_sources:
+    #     print(f"[WARN] Not enough unique sources: {domain_count} < {min_sources} (kept={kept_count})")
+    #     return filtered
 
-            # # Also ensure we kept enough items (optional)
-            # if len(filtered.items) < 3:
-            #     raise RuntimeError(f"Too few items after filtering: {len(filtered.items)}")
+    # # Also ensure we kept enough items (optional)
+    # if len(filtered.items) < 3:
+    #     raise RuntimeError(f"Too few items after filtering: {len(filtered.items)}")
 
-            # return filtered
+    # return filtered
 
-        except (json.JSONDecodeError, ValidationError) as e:
-            last_err = e
-        except Exception as e:
-            last_err = e
 
-        time.sleep(0.6 * attempt)
+async def collect_topic_cards(topic: str, max_items: int = 8, theme_statement: Optional[str] = None, min_sources: int = 4, max_per_url: int = 2) -> CollectedItems:
+    """
+    Collect topic cards with OpenAI (web search).
+
+    Attempts run on the LLM gateway; provider errors (timeouts, 429, 5xx)
+    are retried with jittered backoff under the "openai" circuit breaker,
+    invalid output is retried at once, and while the circuit is open this
+    raises CircuitOpenError without calling OpenAI.
+    """
+    if not OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY is not set")
+    
+    # shared client: keep-alive connections are reused across collections
+    client = openai_client()
+    prompt = _build_prompt(topic, max_items, theme_statement, min_sources=min_sources, max_per_url=max_per_url)
+
+    async def attempt() -> CollectedItems:
+        return await run_llm(_request_topic_cards, client, prompt, timeout=TOPIC_CARDS_ATTEMPT_TIMEOUT_SECONDS)
 
-    raise RuntimeError(f"AI collection failed after retries: {last_err}")
\ No newline at end of file
+    return await call_with_retry(attempt, provider="openai")
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import NEAR_DUP_THRESHOLD
+from app.services.near_duplicates import find_near_duplicates, stance_side
+from app.services.supabase_service import enabled, client
+from app.services.themes_builder import opinion_color_from_score
+from app.utils.logger import logger
+
+
+def find_duplicate_opinions(
+    rows: List[Dict[str, Any]],
+    threshold: float = NEAR_DUP_THRESHOLD,
+    across_themes: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Near-duplicate opinions among `rows` ({id, theme_id, title, body, score, created_at}).
+
+    Rows are visited oldest first, so the opinion that has been shown longest
+    (and collected the votes) is the one kept. Only opinions on the same side
+    of the stance are compared, and by default only within a theme;
+    across_themes also catches the same opinion under a theme seeded again
+    with a differently worded topic.
+    Returns one {id, theme_id, duplicate_of, similarity} per opinion to remove.
+    """
+    ordered = sorted(rows, key=lambda r: (r.get("created_at") or "", r["id"]))
+    if across_themes:
+        batches = [ordered]
+    else:
+        # one small index per theme, dropped once the theme is done
+        by_theme: Dict[str, List[Dict[str, Any]]] = {}
+        for r in ordered:
+            by_theme.setdefault(r["theme_id"], []).append(r)
+        batches = [b for b in by_theme.values() if len(b) > 1]
+
+    out: List[Dict[str, Any]] = []
+    for batch in batches:
+        hits = find_near_duplicates(
+            [f"{r['title']}\n{r['body']}" for r in batch],
+            groups=[stance_side(r.get("score")) for r in batch],
+            threshold=threshold,
+        )
+        for r, hit in zip(batch, hits):
+            if hit is not None:
+                out.append({
+                    "id": r["id"],
+                    "theme_id": r["theme_id"],
+                    "duplicate_of": batch[hit[0]]["id"],
+                    "similarity": round(hit[1], 3),
+                })
+    return out
+
+
+def _merged_votes(votes: List[Dict[str, Any]], kept: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    One vote per user for a merged group: the vote already on the kept
+    opinion wins, otherwise the earliest. Returns (votes to re-point, vote ids to delete).
+    """
+    by_user: Dict[str, List[Dict[str, Any]]] = {}
+    for v in votes:
+        by_user.setdefault(v["user_id"], []).append(v)
+    moved: List[Dict[str, Any]] = []
+    extra: List[str] = []
+    for user_votes in by_user.values():
+        user_votes.sort(key=lambda v: (v["opinion_id"] != kept, v.get("created_at") or "", v["id"]))
+        first, rest = user_votes[0], user_votes[1:]
+        if first["opinion_id"] != kept:
+            moved.append({**first, "opinion_id": kept})
+        extra.extend(v["id"] for v in rest)
+    return moved, extra
+
+
+def remove_duplicate_opinions(
+    duplicates: List[Dict[str, Any]],
+    scores: Optional[Dict[str, Optional[float]]] = None,
+    batch_size: int = 500,
+) -> Dict[str, int]:
+    """
+    Delete the duplicates. Their votes are moved to the opinion that is kept
+    first (user_votes.opinion_id is ON DELETE CASCADE, so they would be lost);
+    a user who voted on several opinions of a group keeps one vote.
+    With `scores` (opinion id -> score) the kept opinion takes the mean score
+    of its group. Stored stances are left as they are.
+    """
+    sb = client()
+    groups: Dict[str, List[str]] = {}
+    for d in duplicates:
+        groups.setdefault(d["duplicate_of"], []).append(d["id"])
+
+    moved = collapsed = rescored = deleted = 0
+    now = datetime.now(timezone.utc).isoformat()
+    kept_ids = list(groups)
+    i = 0
+    while i < len(kept_ids):
+        # whole groups per round trip, so each user's votes on a group are seen together
+        chunk: List[str] = []
+        n = 0
+        while i < len(kept_ids) and (not chunk or n + 1 + len(groups[kept_ids[i]]) <= batch_size):
+            chunk.append(kept_ids[i])
+            n += 1 + len(groups[kept_ids[i]])
+            i += 1
+        dup_ids = [d for k in chunk for d in groups[k]]
+
+        votes = (
+            sb.table("user_votes").select("id,user_id,opinion_id,vote_type,created_at")
+            .in_("opinion_id", chunk + dup_ids).execute().data or []
+        )
+        by_group: Dict[str, List[Dict[str, Any]]] = {}
+        kept_for = {d: k for k in chunk for d in groups[k]}
+        for v in votes:
+            by_group.setdefault(kept_for.get(v["opinion_id"], v["opinion_id"]), []).append(v)
+        to_move: List[Dict[str, Any]] = []
+        to_delete: List[str] = []
+        for kept, group_votes in by_group.items():
+            m, extra = _merged_votes(group_votes, kept)
+            to_move.extend(m)
+            to_delete.extend(extra)
+        if to_delete:
+            sb.table("user_votes").delete().in_("id", to_delete).execute()
+            collapsed += len(to_delete)
+        if to_move:
+            sb.table("user_votes").upsert(to_move).execute()
+            moved += len(to_move)
+
+        if scores:
+            for kept in chunk:
+                known = [scores[o] for o in [kept, *groups[kept]] if scores.get(o) is not None]
+                if not known:
+                    continue
+                score = int(round(sum(known) / len(known)))
+                if score == scores.get(kept):
+                    continue
+                # updated_at so the running workers' score index picks it up on its next refresh
+                sb.table("opinions").update({
+                    "score": score,
+                    "color": opinion_color_from_score(score),
+                    "updated_at": now,
+                }).eq("id", kept).execute()
+                rescored += 1
+
+        res = sb.table("opinions").delete().in_("id", dup_ids).execute()
+        deleted += len(res.data or [])
+    return {"votesMoved": moved, "votesCollapsed": collapsed, "scoresUpdated": rescored, "deleted": deleted}
+
+
+def run_dedupe(
+    threshold: float = NEAR_DUP_THRESHOLD,
+    across_themes: bool = False,
+    apply: bool = False,
+    page_size: int = 10000,
+    examples: int = 10,
+) -> Dict[str, Any]:
+    """Find near-duplicate opinions in the whole table; with apply=True remove them."""
+    if not enabled():
+        raise RuntimeError("Supabase not enabled. Set SUPABASE_URL and SUPABASE_KEY.")
+    # keyset paging helper shared with the stance replay job
+    from app.services.stance_replay import _fetch_all
+
+    t0 = time.perf_counter()
+    rows = _fetch_all("opinions", "id,theme_id,title,body,score,created_at", ("theme_id", "id"), page_size)
+    load_seconds = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    duplicates = find_duplicate_opinions(rows, threshold, across_themes)
+    detect_seconds = time.perf_counter() - t0
+    logger.info(f"opinion dedupe: {len(duplicates)} near-duplicates in {len(rows)} opinions ({detect_seconds:.1f}s)")
+
+    by_id = {r["id"]: r for r in rows}
+    summary: Dict[str, Any] = {
+        "threshold": threshold,
+        "acrossThemes": across_themes,
+        "opinions": len(rows),
+        "themes": len({r["theme_id"] for r in rows}),
+        "duplicates": len(duplicates),
+        "themesAffected": len({d["theme_id"] for d in duplicates}),
+        "loadSeconds": round(load_seconds, 2),
+        "detectSeconds": round(detect_seconds, 2),
+        "examples": [
+            {
+                **d,
+                "title": by_id[d["id"]]["title"],
+                "body": by_id[d["id"]]["body"],
+                "keptBody": by_id[d["duplicate_of"]]["body"],
+            }
+            for d in duplicates[:examples]
+        ],
+    }
+    if apply:
+        summary.update(remove_duplicate_opinions(duplicates, {r["id"]: r.get("score") for r in rows}))
+        # the API workers keep the themes snapshot, the opinion score index and
+        # each user's vote history in process memory; this job cannot reach them
+        summary["note"] = "APIワーカーを再起動して、テーマのスナップショットと意見スコアのインデックス、投票履歴を読み直すこと"
+    return summary
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+
+from app.config import OPINION_INDEX_PAGE_SIZE, OPINION_INDEX_REFRESH_SECONDS
+from app.services.supabase_service import enabled, client
+from app.utils.logger import logger
+
+
+class OpinionScoreIndex:
+    """
+    In-memory opinion id -> position score, so a vote never queries the DB.
+
+    - bulk-loaded from the opinions table at startup (paged by updated_at, id)
+    - refreshed every `refresh_interval` seconds with rows whose updated_at
+      is at or after the newest one seen (re-reading equal timestamps is
+      harmless; skipping them is not)
+    - written through by theme_store_service when it upserts / deletes
+      opinions, and by /api/opinions for opinions it generates
+    """
+
+    def __init__(self, page_size: int, refresh_interval: float):
+        self.page_size = max(1, page_size)
+        self.refresh_interval = refresh_interval
+        self._scores: Dict[str, float] = {}
+        self._by_theme: Dict[str, Set[str]] = {}
+        self._watermark: Optional[str] = None
+        # writers run on request threads (to_thread) as well as the loop
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.loaded_rows = 0
+        self.refreshed_rows = 0
+        self.failed_refreshes = 0
+        self.last_refresh_at = 0.0
+
+    def get(self, opinion_id: str) -> Optional[float]:
+        score = self._scores.get(opinion_id)
+        if score is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return score
+
+    def put(self, opinion_id: str, score: float, theme_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._put(opinion_id, score, theme_id)
+
+    def put_rows(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Apply opinion rows ({id, score, theme_id?}); returns the count."""
+        n = 0
+        with self._lock:
+            for row in rows:
+                if row.get("id") is None or row.get("score") is None:
+                    continue
+                self._put(row["id"], row["score"], row.get("theme_id"))
+                n += 1
+        return n
+
+    def _put(self, opinion_id: str, score: float, theme_id: Optional[str]) -> None:
+        self._scores[opinion_id] = float(score)
+        if theme_id is not None:
+            self._by_theme.setdefault(theme_id, set()).add(opinion_id)
+
+    def remove_theme(self, theme_id: str) -> int:
+        with self._lock:
+            ids = self._by_theme.pop(theme_id, set())
+            for opinion_id in ids:
+                self._scores.pop(opinion_id, None)
+        return len(ids)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scores.clear()
+            self._by_theme.clear()
+            self._watermark = None
+            self.loaded = False
+
+    def _fetch(self, since: Optional[str]) -> int:
+        # keyset paging on (updated_at, id), same scheme as list_themes_page
+        sb = client()
+        n = 0
+        after: Optional[tuple] = None
+        while True:
+            q = sb.table("opinions").select("id,theme_id,score,updated_at")
+            if after is not None:
+                updated_at, last_id = after
+                q = q.or_(f'updated_at.gt."{updated_at}",and(updated_at.eq."{updated_at}",id.gt."{last_id}")')
+            elif since is not None:
+                q = q.gte("updated_at", since)
+            rows = q.order("updated_at").order("id").limit(self.page_size).execute().data or []
+            n += self.put_rows(rows)
+            # only rows read back from the DB move the watermark; write-through
+            # rows carry this process's clock, which may run ahead of others'
+            newest = rows[-1].get("updated_at") if rows else None
+            if newest and (self._watermark is None or newest > self._watermark):
+                self._watermark = newest
+            if len(rows) < self.page_size:
+                return n
+            after = (rows[-1]["updated_at"], rows[-1]["id"])
+
+    def load_all(self) -> int:
+        if not enabled():
+            return 0
+        t0 = time.monotonic()
+        n = self._fetch(None)
+        self.loaded = True
+        self.loaded_rows = n
+        self.last_refresh_at = time.time()
+        logger.info(f"opinion score index: loaded {n} opinions in {time.monotonic() - t0:.2f}s")
+        return n
+
+    def refresh(self) -> int:
+        if not enabled():
+            return 0
+        if not self.loaded:
+            return self.load_all()
+        n = self._fetch(self._watermark)
+        self.refreshed_rows += n
+        self.last_refresh_at = time.time()
+        return n
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                # votes keep using what is already indexed
+                self.failed_refreshes += 1
+                logger.error(f"opinion score index refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._scores),
+            "themes": len(self._by_theme),
+            "loaded": self.loaded,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loaded_rows": self.loaded_rows,
+            "refreshed_rows": self.refreshed_rows,
+            "failed_refreshes": self.failed_refreshes,
+            "watermark": self._watermark,
+            "last_refresh_age_seconds": round(time.time() - self.last_refresh_at, 1) if self.last_refresh_at else None,
+        }
+
+
+opinion_score_index = OpinionScoreIndex(
+    page_size=OPINION_INDEX_PAGE_SIZE,
+    refresh_interval=OPINION_INDEX_REFRESH_SECONDS,
+)
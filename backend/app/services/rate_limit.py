@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+from app.config import PROVIDER_RATE_LIMITS
+
+
+class AsyncRateLimiter:
+    """Token bucket: `rate_per_minute` calls, bursting up to `burst`."""
+
+    def __init__(self, rate_per_minute: float, burst: Optional[int] = None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, int(rate_per_minute // 10) or 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited_seconds = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1.0:
+                wait = (1.0 - self._tokens) / self.rate_per_second
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+                self._refill()
+            self._tokens -= 1.0
+
+
+_limiters: Dict[str, Optional[AsyncRateLimiter]] = {}
+
+
+def provider_limiter(provider: str) -> Optional[AsyncRateLimiter]:
+    """Shared limiter for a provider (e.g. "openai"); None when no limit is configured."""
+    if provider not in _limiters:
+        rate = PROVIDER_RATE_LIMITS.get(provider)
+        _limiters[provider] = AsyncRateLimiter(rate) if rate else None
+    return _limiters[provider]
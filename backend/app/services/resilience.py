@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.config import (
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    CIRCUIT_BREAKER_RESET_SECONDS,
+    LLM_RETRY_BASE_DELAY_SECONDS,
+    LLM_RETRY_MAX_ATTEMPTS,
+    LLM_RETRY_MAX_DELAY_SECONDS,
+)
+from app.services.rate_limit import provider_limiter
+from app.utils.logger import logger
+
+T = TypeVar("T")
+
+# error classes returned by classify()
+RETRYABLE = "retryable"  # provider-side trouble: timeouts, connection errors, 408/409/429/5xx
+INVALID_OUTPUT = "invalid_output"  # the provider answered but the output failed our checks
+FATAL = "fatal"  # our request is wrong (auth, 4xx): retrying will not help
+
+
+class InvalidOutput(Exception):
+    """The model answered, but the answer is unusable (schema, too few items, ...)."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit is open."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} circuit is open; retry in {retry_after:.0f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def classify(exc: BaseException) -> str:
+    # pydantic's ValidationError is a ValueError; so is JSONDecodeError
+    if isinstance(exc, (InvalidOutput, json.JSONDecodeError, ValueError)):
+        return INVALID_OUTPUT
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return RETRYABLE
+    code = _status_code(exc)
+    if code is not None:
+        return RETRYABLE if code in (408, 409, 429) or code >= 500 else FATAL
+    # SDK transport errors (openai.APIConnectionError / APITimeoutError,
+    # httpx.TransportError) carry no status code
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    if names & {"APIConnectionError", "APITimeoutError", "TransportError", "TimeoutException"}:
+        return RETRYABLE
+    return FATAL
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: sleep U(0, min(max_delay, base * 2**(n-1)))."""
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, exc: Optional[BaseException] = None) -> float:
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        wait = random.uniform(0, cap)
+        hint = _retry_after(exc) if exc is not None else None
+        if hint is not None:
+            wait = max(wait, min(hint, self.max_delay))
+        return wait
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive provider failures;
+    open -> half_open after `reset_timeout` seconds, letting one probe call
+    through; the probe closes the circuit on success or reopens it.
+
+    Only RETRYABLE errors count as failures. Used from the event loop only.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.opened = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+
+    def before_call(self) -> None:
+        if self.state == "open":
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, remaining)
+            self.state = "half_open"
+            logger.info(f"circuit {self.name}: half-open, probing")
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.reset_timeout)
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self.successes += 1
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        if self.state != "closed":
+            logger.info(f"circuit {self.name}: closed")
+            self.state = "closed"
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opened += 1
+                logger.warning(f"circuit {self.name}: open after {self.consecutive_failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def record_neutral(self) -> None:
+        """The call ended without telling us anything about provider health (e.g. 4xx)."""
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        retry_in = self.opened_at + self.reset_timeout - time.monotonic() if self.state == "open" else 0.0
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_in_seconds": round(max(0.0, retry_in), 1),
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def provider_breaker(provider: str) -> CircuitBreaker:
+    """Shared circuit breaker for a provider (e.g. "openai")."""
+    if provider not in _breakers:
+        _breakers[provider] = CircuitBreaker(provider, CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_RESET_SECONDS)
+    return _breakers[provider]
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: b.stats() for name, b in _breakers.items()}
+
+
+default_retry_policy = RetryPolicy(LLM_RETRY_MAX_ATTEMPTS, LLM_RETRY_BASE_DELAY_SECONDS, LLM_RETRY_MAX_DELAY_SECONDS)
+
+
+async def call_with_retry(
+    attempt_fn: Callable[[], Awaitable[T]],
+    provider: str,
+    policy: Optional[RetryPolicy] = None,
+) -> T:
+    """
+    Run `attempt_fn` until it succeeds, under the provider's circuit breaker
+    and rate limit (every attempt, retries included, takes a limiter token).
+
+    - RETRYABLE errors: count against the breaker, back off with jitter, retry
+    - INVALID_OUTPUT: the provider is healthy; retry at once (another sample may pass)
+    - FATAL, or an open circuit: raise immediately
+    """
+    policy = policy or default_retry_policy
+    breaker = provider_breaker(provider)
+    limiter = provider_limiter(provider)
+    last_err: Optional[BaseException] = None
+    for attempt in range(1, policy.max_attempts + 1):
+        breaker.before_call()
+        if limiter is not None:
+            try:
+                await limiter.acquire()
+            except BaseException:
+                breaker.record_neutral()
+                raise
+        try:
+            result = await attempt_fn()
+        except asyncio.CancelledError:
+            breaker.record_neutral()
+            raise
+        except Exception as e:
+            kind = classify(e)
+            last_err = e
+            if kind == RETRYABLE:
+                breaker.record_failure()
+                if breaker.state == "open":
+                    # this failure tripped it; don't sleep just to be rejected
+                    raise CircuitOpenError(provider, breaker.reset_timeout) from e
+            elif kind == INVALID_OUTPUT:
+                breaker.record_success()
+            else:
+                breaker.record_neutral()
+                raise
+            if attempt == policy.max_attempts:
+                break
+            logger.warning(f"{provider} attempt {attempt} failed ({kind}): {e}")
+            if kind == RETRYABLE:
+                await asyncio.sleep(policy.delay(attempt, e))
+            continue
+        breaker.record_success()
+        return result
+    raise RuntimeError(f"{provider} call failed after {policy.max_attempts} attempts: {last_err}") from last_err
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from app.config import SEED_BATCH_DB_WRITERS, SEED_BATCH_PARALLELISM, SEED_LEASE_TTL_SECONDS
+from app.services.openai_data_collect_service import collect_topic_cards, stable_id
+from app.services.seed_service import SeedInProgress, ThemeAlreadyExists, run_seed_once
+from app.services.theme_store_service import upsert_theme_and_opinions
+from app.services.themes_builder import build_theme_rows
+
+_DONE = object()
+
+
+async def run_seed_batch(
+    topics: List[str],
+    max_items: int = 12,
+    theme_statement: Optional[str] = None,
+    parallelism: int = SEED_BATCH_PARALLELISM,
+    db_writers: int = SEED_BATCH_DB_WRITERS,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Seed many topics as a two-stage pipeline and yield progress events.
+
+    Stage 1 (collect) runs up to `parallelism` LLM collections at once,
+    throttled by the "openai" provider rate limit. Stage 2 (write) upserts
+    finished topics with `db_writers` workers, so the DB write for topic A
+    overlaps the collection for topic B.
+
+    Every event is a dict with "topic" and "status"
+    (collecting / collected / done / skipped / failed); the last one has
+    status "summary" with throughput numbers.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    writes: asyncio.Queue = asyncio.Queue()
+    collect_slots = asyncio.Semaphore(max(1, parallelism))
+    totals = {"done": 0, "skipped": 0, "failed": 0, "llm_seconds": 0.0, "db_seconds": 0.0}
+    started = time.monotonic()
+
+    def emit(topic: Optional[str], status: str, **extra: Any) -> None:
+        if status in totals:
+            totals[status] += 1
+        events.put_nowait({"topic": topic, "status": status, **extra})
+
+    closed = False
+    # seed runs of this batch; the single-flight task they run in is shielded
+    # from the caller, so closing the batch cancels them directly
+    running: Set[asyncio.Task] = set()
+
+    async def store(rows: Dict[str, Any]) -> float:
+        # hand the rows to a writer and wait until they are stored, so the
+        # seed lease is held until then
+        stored: asyncio.Future = asyncio.get_running_loop().create_future()
+        writes.put_nowait((rows, stored))
+        return await stored
+
+    async def collect(topic: str) -> None:
+        theme_id = stable_id("theme", topic)
+        stage = "collect"
+        await collect_slots.acquire()
+        holding = True
+
+        def free_slot() -> None:
+            nonlocal holding
+            if holding:
+                holding = False
+                collect_slots.release()
+
+        async def work() -> Dict[str, Any]:
+            if closed:
+                raise RuntimeError("seed batch closed")
+            task = asyncio.current_task()
+            running.add(task)
+            try:
+                return await collect_and_store()
+            finally:
+                running.discard(task)
+
+        async def collect_and_store() -> Dict[str, Any]:
+            nonlocal stage
+            emit(topic, "collecting", themeId=theme_id)
+            # retries and the openai rate limit are handled inside collect_topic_cards
+            t0 = time.monotonic()
+            try:
+                collected = await asyncio.wait_for(
+                    collect_topic_cards(topic=topic, max_items=max_items, theme_statement=theme_statement),
+                    timeout=SEED_LEASE_TTL_SECONDS,
+                )
+            finally:
+                free_slot()
+            llm_seconds = time.monotonic() - t0
+            totals["llm_seconds"] += llm_seconds
+            rows = build_theme_rows(topic, collected)
+            emit(topic, "collected", themeId=theme_id, llmSeconds=round(llm_seconds, 2))
+
+            stage = "write"
+            db_seconds = await store(rows)
+            return {
+                "ok": True,
+                "themeId": rows["theme"]["id"],
+                "opinionsCount": len(rows["opinions"]),
+                "dbSeconds": round(db_seconds, 2),
+            }
+
+        try:
+            # exists check, lease and re-check are shared with /api/seed-theme;
+            # a topic that is being seeded in this process joins that run
+            result, shared = await run_seed_once(theme_id, work)
+        except ThemeAlreadyExists:
+            emit(topic, "skipped", themeId=theme_id, reason="exists")
+        except SeedInProgress:
+            emit(topic, "skipped", themeId=theme_id, reason="in_progress")
+        except Exception as e:
+            emit(topic, "failed", themeId=theme_id, stage=stage, error=str(e))
+        else:
+            extra = {"joined": True} if shared else {}
+            emit(topic, "done", themeId=theme_id, opinionsCount=result["opinionsCount"],
+                 dbSeconds=result.get("dbSeconds", 0.0), **extra)
+        finally:
+            free_slot()
+
+    async def write() -> None:
+        while True:
+            job = await writes.get()
+            if job is _DONE:
+                return
+            rows, stored = job
+            if stored.done():
+                continue
+            t0 = time.monotonic()
+            try:
+                await asyncio.to_thread(upsert_theme_and_opinions, rows["theme"], rows["opinions"])
+            except asyncio.CancelledError:
+                stored.cancel()
+                raise
+            except Exception as e:
+                if not stored.done():
+                    stored.set_exception(e)
+            else:
+                if not stored.done():
+                    stored.set_result(time.monotonic() - t0)
+            finally:
+                totals["db_seconds"] += time.monotonic() - t0
+
+    def close() -> None:
+        # the client went away: stop this batch's seed runs (collecting, or
+        # waiting for a writer) so they release their leases now, not at the TTL
+        nonlocal closed
+        closed = True
+        for task in list(running):
+            task.cancel()
+        while not writes.empty():
+            job = writes.get_nowait()
+            if job is not _DONE:
+                job[1].cancel()
+
+    async def run() -> None:
+        writers = [asyncio.create_task(write()) for _ in range(max(1, db_writers))]
+        try:
+            # duplicates in the request would only race each other for the lease
+            await asyncio.gather(*(collect(t) for t in dict.fromkeys(topics)))
+        except asyncio.CancelledError:
+            for w in writers:
+                w.cancel()
+            close()
+            raise
+        finally:
+            for _ in writers:
+                writes.put_nowait(_DONE)
+            await asyncio.gather(*writers, return_exceptions=True)
+        events.put_nowait(_DONE)
+
+    runner = asyncio.create_task(run())
+    try:
+        while True:
+            event = await events.get()
+            if event is _DONE:
+                break
+            yield event
+        await runner
+    finally:
+        if not runner.done():
+            runner.cancel()
+
+    wall = time.monotonic() - started
+    yield {
+        "topic": None,
+        "status": "summary",
+        "topics": len(dict.fromkeys(topics)),
+        "done": totals["done"],
+        "skipped": totals["skipped"],
+        "failed": totals["failed"],
+        "wallSeconds": round(wall, 2),
+        "topicsPerMin": round(totals["done"] / wall * 60.0, 2) if wall > 0 else 0.0,
+        "llmSeconds": round(totals["llm_seconds"], 2),
+        "dbSeconds": round(totals["db_seconds"], 2),
+    }
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from app.config import SEED_LEASE_TTL_SECONDS
+from app.services.lease_service import acquire_lease, release_lease
+from app.services.openai_data_collect_service import collect_topic_cards, stable_id
+from app.services.single_flight import SingleFlight
+from app.services.theme_store_service import theme_exists, upsert_theme_and_opinions
+from app.services.themes_builder import build_theme_rows
+
+
+class ThemeAlreadyExists(Exception):
+    pass
+
+
+class SeedInProgress(Exception):
+    """Another worker process currently holds the seed lease for this theme."""
+
+
+T = TypeVar("T")
+
+# in-process: concurrent seed requests for the same theme share one run
+_seed_flight = SingleFlight()
+
+
+async def seed_theme_once(topic: str, max_items: int, theme_statement: Optional[str]) -> Dict[str, Any]:
+    """
+    Collect + build + upsert a theme exactly once.
+
+    Callers in this process that arrive while a run for the same theme id is
+    in progress receive that run's result (or its exception). Across
+    processes, a lease row keeps two workers from paying for the same
+    collection.
+    """
+    theme_id = stable_id("theme", topic)
+    result, _ = await run_seed_once(theme_id, lambda: _seed(topic, max_items, theme_statement))
+    return result
+
+
+async def run_seed_once(theme_id: str, work: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+    """
+    Run `work()` for a theme that does not exist yet, holding its seed lease.
+
+    Shared by seed_theme_once and the batch pipeline. Returns (result, shared);
+    `shared` is True when this call joined a run already in progress in this
+    process. Raises ThemeAlreadyExists / SeedInProgress without calling `work`.
+    """
+    return await _seed_flight.do(theme_id, lambda: _leased(theme_id, work))
+
+
+async def _leased(theme_id: str, work: Callable[[], Awaitable[T]]) -> T:
+    if await asyncio.to_thread(theme_exists, theme_id):
+        raise ThemeAlreadyExists(theme_id)
+
+    lease_name = f"seed:{theme_id}"
+    token = await asyncio.to_thread(acquire_lease, lease_name, SEED_LEASE_TTL_SECONDS)
+    if token is None:
+        raise SeedInProgress(theme_id)
+
+    try:
+        # the lease holder before us may have finished between the two checks
+        if await asyncio.to_thread(theme_exists, theme_id):
+            raise ThemeAlreadyExists(theme_id)
+        return await work()
+    finally:
+        # also on cancellation; shielded so a second cancel cannot skip the release
+        await asyncio.shield(asyncio.to_thread(release_lease, lease_name, token))
+
+
+async def _seed(topic: str, max_items: int, theme_statement: Optional[str]) -> Dict[str, Any]:
+    collected = await asyncio.wait_for(
+        collect_topic_cards(topic=topic, max_items=max_items, theme_statement=theme_statement),
+        timeout=SEED_LEASE_TTL_SECONDS,
+    )
+    rows = build_theme_rows(topic, collected)
+    await asyncio.to_thread(upsert_theme_and_opinions, rows["theme"], rows["opinions"])
+    return {"ok": True, "themeId": rows["theme"]["id"], "opinionsCount": len(rows["opinions"])}
+
+
+def seed_stats() -> Dict[str, Any]:
+    return _seed_flight.stats()
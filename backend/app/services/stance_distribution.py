@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.config import (
+    STANCE_DISTRIBUTION_REFRESH_SECONDS,
+    STANCE_HIST_BINS,
+    STANCE_SKETCH_RESOLUTION,
+)
+from app.services.compact_user_store import IdInterner
+from app.services.stance_formula import STANCE_MAX, STANCE_MIN
+from app.services.stance_store import StanceWriteBehind, is_storable, stance_write_behind
+from app.services.supabase_service import enabled, client
+from app.utils.logger import logger
+
+
+def _unix_time(value: Optional[str]) -> float:
+    if not value:
+        return 0.0
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+class ThemeDistribution:
+    """
+    Stances of everyone on one theme, kept as counts.
+
+    - `hist`: STANCE_HIST_BINS equal-width bins over [-100, 100] for display
+    - a Fenwick tree over fine bins (`resolution` wide) as the quantile
+      sketch: rank / percentile / quantile in O(log bins), and unlike
+      t-digest style sketches it supports removal, which we need because a
+      user's stance moves with every vote
+
+    Values outside [-100, 100] count in the edge bins. The value counted
+    for each user is kept, so moving or removing a user always takes out
+    exactly what was counted for them. Users are the interned numbers of
+    user_store (not id strings): a sorted array('I') with a parallel
+    array('d') of scores, like CompactUserStore's stances.
+    """
+
+    def __init__(self, bins: int, resolution: float):
+        self.bins = bins
+        self.resolution = resolution
+        self.fine_bins = int(math.ceil((STANCE_MAX - STANCE_MIN) / resolution)) + 1
+        self.hist = array("q", bytes(8 * bins))
+        self._fine = array("q", bytes(8 * self.fine_bins))
+        self._tree = array("q", bytes(8 * (self.fine_bins + 1)))  # 1-based Fenwick
+        self._users = array("I")
+        self._scores = array("d")
+        self.total = 0
+
+    @classmethod
+    def build(cls, bins: int, resolution: float, scores: Dict[int, float]) -> "ThemeDistribution":
+        """A distribution of `scores` (user number -> score), filled in one pass."""
+        dist = cls(bins, resolution)
+        users = sorted(scores)
+        dist._users = array("I", users)
+        dist._scores = array("d", (scores[u] for u in users))
+        for score in dist._scores:
+            dist._count(score, 1)
+        return dist
+
+    def _bin(self, score: float) -> int:
+        x = min(max(score, STANCE_MIN), STANCE_MAX)
+        return min(int((x - STANCE_MIN) / (STANCE_MAX - STANCE_MIN) * self.bins), self.bins - 1)
+
+    def _fine_bin(self, score: float) -> int:
+        x = min(max(score, STANCE_MIN), STANCE_MAX)
+        return min(int(round((x - STANCE_MIN) / self.resolution)), self.fine_bins - 1)
+
+    def _tree_add(self, i: int, delta: int) -> None:
+        i += 1
+        n = self.fine_bins
+        tree = self._tree
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, i: int) -> int:
+        """Number of values in fine bins [0, i)."""
+        s = 0
+        tree = self._tree
+        while i > 0:
+            s += tree[i]
+            i -= i & -i
+        return s
+
+    def _count(self, score: float, delta: int) -> None:
+        f = self._fine_bin(score)
+        self._fine[f] += delta
+        self._tree_add(f, delta)
+        self.hist[self._bin(score)] += delta
+        self.total += delta
+
+    def _find(self, user: int) -> int:
+        i = bisect_left(self._users, user)
+        return i if i < len(self._users) and self._users[i] == user else -1
+
+    def score_of(self, user: int) -> Optional[float]:
+        i = self._find(user)
+        return None if i < 0 else self._scores[i]
+
+    def items(self) -> Iterator[Tuple[int, float]]:
+        return zip(self._users, self._scores)
+
+    def set(self, user: int, score: float) -> None:
+        """Count `user` at `score`, replacing the value counted for them before."""
+        i = bisect_left(self._users, user)
+        if i < len(self._users) and self._users[i] == user:
+            self._count(self._scores[i], -1)
+            self._scores[i] = score
+        else:
+            self._users.insert(i, user)
+            self._scores.insert(i, score)
+        self._count(score, 1)
+
+    def remove(self, user: int) -> bool:
+        i = self._find(user)
+        if i < 0:
+            return False
+        self._count(self._scores[i], -1)
+        del self._users[i]
+        del self._scores[i]
+        return True
+
+    def percentile(self, score: float) -> Optional[float]:
+        """Share of users below `score` (ties count half), 0..100."""
+        if self.total <= 0:
+            return None
+        f = self._fine_bin(score)
+        below = self._prefix(f)
+        return round((below + 0.5 * self._fine[f]) / self.total * 100.0, 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Smallest fine-bin value with at least q of the users at or below it."""
+        if self.total <= 0:
+            return None
+        target = max(1, int(math.ceil(q * self.total)))
+        # Fenwick binary lifting: largest prefix with count < target
+        pos = 0
+        step = 1 << (self.fine_bins.bit_length())
+        remaining = target
+        tree = self._tree
+        while step:
+            nxt = pos + step
+            if nxt <= self.fine_bins and tree[nxt] < remaining:
+                pos = nxt
+                remaining -= tree[nxt]
+            step >>= 1
+        return round(STANCE_MIN + pos * self.resolution, 2)
+
+    def histogram(self) -> List[Dict[str, Any]]:
+        width = (STANCE_MAX - STANCE_MIN) / self.bins
+        return [
+            {"from": round(STANCE_MIN + i * width, 2), "to": round(STANCE_MIN + (i + 1) * width, 2), "count": c}
+            for i, c in enumerate(self.hist)
+        ]
+
+
+# theme_id -> (user ids, stance scores, updated_at as Unix times) read from user_stances
+_Stored = Dict[str, Tuple[List[str], array, array]]
+
+
+class StanceDistributions:
+    """
+    Per-theme ThemeDistribution, updated by NewsService on every vote and
+    rebuilt from user_stances every `refresh_interval` seconds, which also
+    folds in votes handled by other workers.
+
+    A rebuild does not simply replace what this worker knows:
+
+    - a stance set here and not yet confirmed stored by the write-behind
+      (`_unsaved`, user number -> time of the vote) stays until user_stances
+      has a row for it at least as new. Entries go as soon as the
+      write-behind reports the row written, so this is bounded by its queue.
+    - users whose stances are never stored (ids that are not UUIDs, or no
+      Supabase) are flagged once in `_unstored` and always kept.
+
+    User ids are interned in `users`, which news_service shares with
+    user_store, so an id string is held once per process.
+    """
+
+    def __init__(
+        self,
+        bins: int,
+        resolution: float,
+        refresh_interval: float,
+        page_size: int = 10000,
+        users: Optional[IdInterner] = None,
+        write_behind: Optional[StanceWriteBehind] = None,
+    ):
+        self.bins = bins
+        self.resolution = resolution
+        self.refresh_interval = refresh_interval
+        self.page_size = page_size
+        self.users = IdInterner() if users is None else users
+        self._themes: Dict[str, ThemeDistribution] = {}
+        self._unsaved: Dict[str, Dict[int, float]] = {}
+        self._unstored = bytearray()
+        # set while a rebuild reads user_stances; rows acknowledged meanwhile
+        # may be missing from what it read, so they are dropped after the merge
+        self._loading = False
+        self._acked_while_loading: List[Tuple[str, int, float]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.rebuilds = 0
+        self.failed_rebuilds = 0
+        self.last_rebuild_at = 0.0
+        self.last_rebuild_seconds = 0.0
+        if write_behind is not None:
+            write_behind.on_stored(self.acknowledge)
+
+    def get(self, theme_id: str) -> Optional[ThemeDistribution]:
+        return self._themes.get(theme_id)
+
+    def score_of(self, theme_id: str, user_id: str) -> Optional[float]:
+        dist = self._themes.get(theme_id)
+        u = self.users.get(user_id)
+        return None if dist is None or u is None else dist.score_of(u)
+
+    def _theme(self, theme_id: str) -> ThemeDistribution:
+        dist = self._themes.get(theme_id)
+        if dist is None:
+            dist = self._themes[theme_id] = ThemeDistribution(self.bins, self.resolution)
+        return dist
+
+    def _is_unstored(self, u: int) -> bool:
+        return u < len(self._unstored) and self._unstored[u] == 1
+
+    def record(self, theme_id: str, user_id: str, score: float) -> None:
+        """`user_id`'s stance on `theme_id` is now `score`."""
+        u = self.users.intern(user_id)
+        self._theme(theme_id).set(u, score)
+        if is_storable(user_id):
+            self._unsaved.setdefault(theme_id, {})[u] = time.time()
+        else:
+            if u >= len(self._unstored):
+                self._unstored.extend(bytes(u + 1 - len(self._unstored)))
+            self._unstored[u] = 1
+
+    def acknowledge(self, keys: Iterable[Tuple[str, str]], written_at: float) -> None:
+        """
+        The write-behind stored these (user_id, theme_id) stances from values
+        taken at `written_at` (wall clock); later votes stay unsaved.
+        """
+        for user_id, theme_id in keys:
+            pending = self._unsaved.get(theme_id)
+            u = self.users.get(user_id)
+            if pending is None or u is None:
+                continue
+            at = pending.get(u)
+            if at is None or at > written_at:
+                continue
+            if self._loading:
+                self._acked_while_loading.append((theme_id, u, at))
+                continue
+            del pending[u]
+            if not pending:
+                del self._unsaved[theme_id]
+
+    def summary(self, theme_id: str, score: Optional[float] = None) -> Dict[str, Any]:
+        dist = self._themes.get(theme_id)
+        if dist is None:
+            dist = ThemeDistribution(self.bins, self.resolution)
+        return {
+            "themeId": theme_id,
+            "total": dist.total,
+            "bins": dist.histogram(),
+            "quantiles": {f"p{int(q * 100)}": dist.quantile(q) for q in (0.1, 0.25, 0.5, 0.75, 0.9)},
+            "you": None if score is None else {"stanceScore": score, "percentile": dist.percentile(score)},
+        }
+
+    def _load(self) -> _Stored:
+        """Every stored stance, per theme. Runs in a thread: no interning here."""
+        # keyset paging on (theme_id, user_id) over the whole table
+        sb = client()
+        stored: _Stored = {}
+        after: Optional[Tuple[str, str]] = None
+        while True:
+            q = sb.table("user_stances").select("theme_id,user_id,stance_score,updated_at")
+            if after is not None:
+                t, u = after
+                q = q.or_(f'theme_id.gt."{t}",and(theme_id.eq."{t}",user_id.gt."{u}")')
+            rows = q.order("theme_id").order("user_id").limit(self.page_size).execute().data or []
+            for r in rows:
+                users, scores, stamps = stored.setdefault(r["theme_id"], ([], array("d"), array("d")))
+                users.append(r["user_id"])
+                scores.append(float(r["stance_score"]))
+                stamps.append(_unix_time(r.get("updated_at")))
+            if len(rows) < self.page_size:
+                return stored
+            after = (rows[-1]["theme_id"], rows[-1]["user_id"])
+
+    def _merge(self, stored: _Stored) -> None:
+        """
+        Replace the distributions with `stored`, except where this worker set
+        a newer stance. Call on the event loop thread (record() runs there),
+        so no vote lands between the merge and the swap.
+        """
+        themes: Dict[str, ThemeDistribution] = {}
+        for theme_id in set(stored) | set(self._themes):
+            old = self._themes.get(theme_id)
+            pending = self._unsaved.get(theme_id, {})
+            scores: Dict[int, float] = {}
+            users, values, stamps = stored.get(theme_id, ((), (), ()))
+            for user_id, score, stored_at in zip(users, values, stamps):
+                u = self.users.intern(user_id)
+                at = pending.get(u)
+                if at is not None:
+                    if at > stored_at:
+                        continue  # not written yet: the value counted here stays
+                    # written, or overtaken by a vote on another worker
+                    del pending[u]
+                scores[u] = score
+            if old is not None:
+                for u, score in old.items():
+                    if u in pending or self._is_unstored(u):
+                        scores[u] = score
+            if not pending:
+                self._unsaved.pop(theme_id, None)
+            if scores:
+                themes[theme_id] = ThemeDistribution.build(self.bins, self.resolution, scores)
+        self._themes = themes
+
+        acked, self._acked_while_loading = self._acked_while_loading, []
+        for theme_id, u, at in acked:
+            pending = self._unsaved.get(theme_id)
+            if pending is not None and pending.get(u) == at:
+                del pending[u]
+                if not pending:
+                    del self._unsaved[theme_id]
+
+    def rebuild(self) -> None:
+        """Load and merge in one go (scripts); the background task loads in a thread instead."""
+        if not enabled():
+            return
+        t0 = time.monotonic()
+        self._loading = True
+        try:
+            stored = self._load()
+        finally:
+            self._loading = False
+        self._merge(stored)
+        self._rebuilt(t0)
+
+    def _rebuilt(self, t0: float) -> None:
+        self.rebuilds += 1
+        self.last_rebuild_at = time.time()
+        self.last_rebuild_seconds = time.monotonic() - t0
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if enabled():
+                    t0 = time.monotonic()
+                    self._loading = True
+                    try:
+                        stored = await asyncio.to_thread(self._load)
+                    finally:
+                        self._loading = False
+                    self._merge(stored)
+                    self._rebuilt(t0)
+            except Exception as e:
+                self.failed_rebuilds += 1
+                self._acked_while_loading.clear()
+                logger.error(f"stance distribution rebuild failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "themes": len(self._themes),
+            "stances": sum(d.total for d in self._themes.values()),
+            "unsaved_stances": sum(len(p) for p in self._unsaved.values()),
+            "rebuilds": self.rebuilds,
+            "failed_rebuilds": self.failed_rebuilds,
+            "last_rebuild_seconds": round(self.last_rebuild_seconds, 3),
+            "last_rebuild_age_seconds": round(time.time() - self.last_rebuild_at, 1) if self.last_rebuild_at else None,
+        }
+
+
+stance_distributions = StanceDistributions(
+    bins=STANCE_HIST_BINS,
+    resolution=STANCE_SKETCH_RESOLUTION,
+    refresh_interval=STANCE_DISTRIBUTION_REFRESH_SECONDS,
+    write_behind=stance_write_behind,
+)
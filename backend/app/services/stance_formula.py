@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Type
+
+from app.config import STANCE_FORMULA, STANCE_INFLUENCE_RATE
+
+
+# user_stances has CHECK (stance_score BETWEEN -100 AND 100); stances are
+# clamped after every vote, in memory as in the DB
+STANCE_MIN = -100.0
+STANCE_MAX = 100.0
+
+
+def clamp_stance(score: float) -> float:
+    return max(STANCE_MIN, min(STANCE_MAX, float(score)))
+
+
+class InfluenceFormula:
+    """
+    How one vote moves a user's stance on a theme.
+
+    `apply` is used per request by NewsService; `apply_many` is the same
+    formula over NumPy arrays for stance_replay. Formulas whose move does
+    not depend on the current stance set `additive = True` and implement
+    `moves_many`, which lets the replay sum moves per (user, theme) instead
+    of stepping through votes in order.
+    """
+
+    name = ""
+    additive = False
+
+    def __init__(self, rate: float = STANCE_INFLUENCE_RATE):
+        self.rate = rate
+
+    def apply(self, current: float, opinion_score: float, vote_type: str) -> float:
+        raise NotImplementedError
+
+    def apply_many(self, current: Any, opinion_scores: Any, agree: Any) -> Any:
+        """Vectorised apply: float arrays + bool array (True = agree)."""
+        raise NotImplementedError
+
+    def moves_many(self, opinion_scores: Any, agree: Any) -> Any:
+        raise NotImplementedError
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "rate": self.rate}
+
+
+class LinearInfluence(InfluenceFormula):
+    """
+    The original /api/vote formula.
+
+    agree moves the stance by score * rate (at least ±1 so a vote on a
+    near-neutral opinion still counts), oppose by -score * rate. The
+    result is not clamped here; callers apply clamp_stance after each vote.
+    """
+
+    name = "linear"
+    additive = True
+
+    def __init__(self, rate: float = STANCE_INFLUENCE_RATE, agree_min_move: float = 1.0):
+        super().__init__(rate)
+        self.agree_min_move = agree_min_move
+
+    def _move(self, opinion_score: float, vote_type: str) -> float:
+        if vote_type == "agree":
+            move = opinion_score * self.rate
+            if 0 < move < self.agree_min_move:
+                move = self.agree_min_move
+            if -self.agree_min_move < move < 0:
+                move = -self.agree_min_move
+            return move
+        if vote_type == "oppose":
+            return -opinion_score * self.rate
+        return 0.0
+
+    def apply(self, current: float, opinion_score: float, vote_type: str) -> float:
+        return current + self._move(opinion_score, vote_type)
+
+    def moves_many(self, opinion_scores, agree):
+        import numpy as np
+
+        move = opinion_scores * self.rate
+        m = self.agree_min_move
+        floored = np.where((move > 0) & (move < m), m, np.where((move < 0) & (move > -m), -m, move))
+        return np.where(agree, floored, -move)
+
+    def apply_many(self, current, opinion_scores, agree):
+        return current + self.moves_many(opinion_scores, agree)
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), "agree_min_move": self.agree_min_move}
+
+
+class AttractionInfluence(InfluenceFormula):
+    """
+    agree pulls the stance toward the opinion's score, oppose pushes it
+    away, by `rate` of the remaining distance. Depends on the current
+    stance, so replay has to follow vote order.
+    """
+
+    name = "attraction"
+
+    def apply(self, current: float, opinion_score: float, vote_type: str) -> float:
+        gap = opinion_score - current
+        if vote_type == "agree":
+            return current + gap * self.rate
+        if vote_type == "oppose":
+            return current - gap * self.rate
+        return current
+
+    def apply_many(self, current, opinion_scores, agree):
+        import numpy as np
+
+        gap = opinion_scores - current
+        return current + np.where(agree, gap, -gap) * self.rate
+
+
+FORMULAS: Dict[str, Type[InfluenceFormula]] = {
+    LinearInfluence.name: LinearInfluence,
+    AttractionInfluence.name: AttractionInfluence,
+}
+
+
+def get_formula(name: str, **params: Any) -> InfluenceFormula:
+    try:
+        cls = FORMULAS[name]
+    except KeyError:
+        raise ValueError(f"unknown stance formula: {name!r} (choose from {', '.join(FORMULAS)})")
+    return cls(**params)
+
+
+# the formula /api/vote applies; the replay job defaults to the same one
+stance_formula = get_formula(STANCE_FORMULA)
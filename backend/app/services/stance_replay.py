@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from app.services.stance_formula import STANCE_MAX, STANCE_MIN, InfluenceFormula
+from app.services.stance_store import _is_uuid
+from app.services.supabase_service import enabled, client
+from app.utils.logger import logger
+
+
+@dataclass
+class VoteLog:
+    """
+    The user_votes log in columnar form, in vote order.
+
+    users / themes are integer codes into user_ids / theme_ids. Votes on
+    deleted opinions, votes that are neither agree nor oppose (they never
+    move a stance) and repeat votes on the same opinion (only the first
+    counts, as in /api/vote) are dropped when the log is built.
+    """
+
+    users: np.ndarray       # int64 codes
+    themes: np.ndarray      # int64 codes
+    scores: np.ndarray      # float64 opinion position scores
+    agree: np.ndarray       # bool, False = oppose
+    user_ids: np.ndarray    # code -> id (object array)
+    theme_ids: np.ndarray
+    dropped: Dict[str, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+
+@dataclass
+class ReplayResult:
+    users: np.ndarray       # one entry per (user, theme) group
+    themes: np.ndarray
+    stances: np.ndarray
+    votes: np.ndarray       # votes applied per group
+    user_ids: np.ndarray
+    theme_ids: np.ndarray
+    steps: int              # vectorised passes (1 for additive formulas)
+    seconds: float
+
+    def rows(self) -> Iterable[Tuple[str, str, float]]:
+        for u, t, s in zip(self.users.tolist(), self.themes.tolist(), self.stances.tolist()):
+            yield self.user_ids[u], self.theme_ids[t], s
+
+
+def _codes(values: Iterable[str], index: Dict[str, int]) -> np.ndarray:
+    # dict interning: far less memory than np.unique over millions of UUID strings
+    return np.fromiter((index.setdefault(v, len(index)) for v in values), dtype=np.int64)
+
+
+def _labels(index: Dict[str, int]) -> np.ndarray:
+    out = np.empty(len(index), dtype=object)
+    for value, code in index.items():
+        out[code] = value
+    return out
+
+
+def build_vote_log(
+    user_ids: Iterable[str],
+    opinion_ids: Iterable[str],
+    vote_types: Iterable[str],
+    opinions: Mapping[str, Tuple[str, float]],
+) -> VoteLog:
+    """
+    :param user_ids / opinion_ids / vote_types: the log columns, oldest vote first
+    :param opinions: opinion id -> (theme_id, score)
+    """
+    user_index: Dict[str, int] = {}
+    opinion_index: Dict[str, int] = {}
+    type_index: Dict[str, int] = {"agree": 0, "oppose": 1}
+    users = _codes(user_ids, user_index)
+    ops = _codes(opinion_ids, opinion_index)
+    types = _codes(vote_types, type_index)
+
+    opinion_labels = _labels(opinion_index)
+    known_op = np.fromiter((o in opinions for o in opinion_labels), dtype=bool, count=len(opinion_labels))
+    known = known_op[ops] if len(ops) else np.zeros(0, dtype=bool)
+    counted = types <= 1
+    keep = known & counted
+    dropped = {
+        "unknown_opinion": int((~known).sum()),
+        "other_vote_type": int((known & ~counted).sum()),
+    }
+    users, ops, agree = users[keep], ops[keep], types[keep] == 0
+
+    # first vote per (user, opinion) wins
+    pair = users * max(1, len(opinion_labels)) + ops
+    _, first = np.unique(pair, return_index=True)
+    first.sort()
+    dropped["duplicate"] = int(len(pair) - len(first))
+    users, ops, agree = users[first], ops[first], agree[first]
+
+    theme_index: Dict[str, int] = {}
+    op_theme = np.zeros(len(opinion_labels), dtype=np.int64)
+    op_score = np.zeros(len(opinion_labels), dtype=np.float64)
+    for code, opinion_id in enumerate(opinion_labels.tolist()):
+        if known_op[code]:
+            theme_id, score = opinions[opinion_id]
+            op_theme[code] = theme_index.setdefault(theme_id, len(theme_index))
+            op_score[code] = float(score)
+
+    return VoteLog(
+        users=users,
+        themes=op_theme[ops],
+        scores=op_score[ops],
+        agree=agree,
+        user_ids=_labels(user_index),
+        theme_ids=_labels(theme_index),
+        dropped=dropped,
+    )
+
+
+def _step(
+    log: VoteLog, formula: InfluenceFormula, group: np.ndarray, votes: np.ndarray, stances: np.ndarray
+) -> int:
+    """
+    Apply `votes` (indices into the log, in vote order) to their groups'
+    stances in rank order: pass r updates, in one vectorised call, every
+    group's r-th vote. Returns the number of passes.
+    """
+    g_votes = group[votes]
+    order = votes[np.argsort(g_votes, kind="stable")]   # by group, vote order kept
+    g_sorted = group[order]
+    counts = np.bincount(g_sorted, minlength=len(stances))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.arange(len(order)) - starts[g_sorted]     # position of the vote within its group
+    by_rank = np.argsort(rank, kind="stable")
+    rank_counts = np.bincount(rank) if len(rank) else np.zeros(0, dtype=np.int64)
+
+    pos = 0
+    for n in rank_counts.tolist():
+        idx = order[by_rank[pos:pos + n]]               # one vote per group at this rank
+        g = group[idx]
+        stances[g] = np.clip(formula.apply_many(stances[g], log.scores[idx], log.agree[idx]), STANCE_MIN, STANCE_MAX)
+        pos += n
+    return len(rank_counts)
+
+
+def replay(log: VoteLog, formula: InfluenceFormula) -> ReplayResult:
+    """
+    Recompute every (user, theme) stance from zero, clamped to [-100, 100]
+    after every vote as /api/vote does.
+
+    Additive formulas sum their per-vote moves per group with one bincount;
+    only groups whose running sum leaves [-100, 100] (where the clamp makes
+    the order matter) are stepped through. Other formulas are applied in
+    rank order, so the number of Python-level steps is the largest number
+    of votes any user cast on one theme.
+    """
+    t0 = time.perf_counter()
+    key = log.users * max(1, len(log.theme_ids)) + log.themes
+    group_keys, group = np.unique(key, return_inverse=True)
+    n_groups = len(group_keys)
+    counts = np.bincount(group, minlength=n_groups)
+
+    if formula.additive:
+        moves = formula.moves_many(log.scores, log.agree)
+        stances = np.bincount(group, weights=moves, minlength=n_groups).astype(np.float64)
+        order = np.argsort(group, kind="stable")
+        g_sorted = group[order]
+        running = np.cumsum(moves[order])
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        before = np.concatenate(([0.0], running))[starts]
+        running -= before[g_sorted]                     # running stance within each group
+        out = (running < STANCE_MIN) | (running > STANCE_MAX)
+        saturated = np.unique(g_sorted[out])
+        steps = 1
+        if len(saturated):
+            stances[saturated] = 0.0
+            steps += _step(log, formula, group, np.flatnonzero(np.isin(group, saturated)), stances)
+    else:
+        stances = np.zeros(n_groups, dtype=np.float64)
+        steps = _step(log, formula, group, np.arange(len(group)), stances)
+
+    n_themes = max(1, len(log.theme_ids))
+    return ReplayResult(
+        users=group_keys // n_themes,
+        themes=group_keys % n_themes,
+        stances=stances,
+        votes=counts,
+        user_ids=log.user_ids,
+        theme_ids=log.theme_ids,
+        steps=steps,
+        seconds=time.perf_counter() - t0,
+    )
+
+
+def diff_against(result: ReplayResult, current: Mapping[Tuple[str, str], float]) -> Dict[str, Any]:
+    """Compare replayed stances with stored ones."""
+    replayed = result.stances
+    stored = np.fromiter(
+        (current.get(k, np.nan) for k in ((u, t) for u, t, _ in result.rows())),
+        dtype=np.float64,
+        count=len(replayed),
+    )
+    known = ~np.isnan(stored)
+    delta = np.abs(replayed[known] - stored[known])
+    return {
+        "groups": int(len(replayed)),
+        "new_groups": int((~known).sum()),
+        "changed": int((delta > 1e-6).sum()),
+        "max_abs_delta": round(float(delta.max()), 4) if len(delta) else 0.0,
+        "mean_abs_delta": round(float(delta.mean()), 4) if len(delta) else 0.0,
+    }
+
+
+# --- Supabase I/O (used by app.jobs.stance_replay and /admin/stances/replay) ---
+
+class ReplayTooLarge(RuntimeError):
+    """The vote log has more rows than the caller allows to load into this process."""
+
+
+def _fetch_all(
+    table: str, columns: str, key: Tuple[str, str], page_size: int, max_rows: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    # keyset paging on (key[0], key[1]); OFFSET would rescan the table per page
+    sb = client()
+    first, second = key
+    out: List[Dict[str, Any]] = []
+    after: Optional[Tuple[Any, Any]] = None
+    while True:
+        q = sb.table(table).select(columns)
+        if after is not None:
+            a, b = after
+            q = q.or_(f'{first}.gt."{a}",and({first}.eq."{a}",{second}.gt."{b}")')
+        rows = q.order(first).order(second).limit(page_size).execute().data or []
+        out.extend(rows)
+        if max_rows is not None and len(out) > max_rows:
+            raise ReplayTooLarge(f"{table} has more than {max_rows} rows")
+        if len(rows) < page_size:
+            return out
+        after = (rows[-1][first], rows[-1][second])
+
+
+def load_vote_log(page_size: int = 10000, max_votes: Optional[int] = None) -> VoteLog:
+    if not enabled():
+        raise RuntimeError("Supabase not enabled. Set SUPABASE_URL and SUPABASE_KEY.")
+    t0 = time.perf_counter()
+    opinions = {
+        r["id"]: (r["theme_id"], r["score"])
+        for r in _fetch_all("opinions", "id,theme_id,score", ("theme_id", "id"), page_size)
+    }
+    votes = _fetch_all(
+        "user_votes", "id,user_id,opinion_id,vote_type,created_at", ("created_at", "id"), page_size, max_votes
+    )
+    log = build_vote_log(
+        (v["user_id"] for v in votes),
+        (v["opinion_id"] for v in votes),
+        (v["vote_type"] for v in votes),
+        opinions,
+    )
+    logger.info(f"stance replay: loaded {len(votes)} votes / {len(opinions)} opinions in {time.perf_counter() - t0:.1f}s")
+    return log
+
+
+def load_current_stances(page_size: int = 10000) -> Dict[Tuple[str, str], float]:
+    rows = _fetch_all("user_stances", "user_id,theme_id,stance_score", ("user_id", "theme_id"), page_size)
+    return {(r["user_id"], r["theme_id"]): float(r["stance_score"]) for r in rows}
+
+
+def write_stances(result: ReplayResult, batch_size: int = 1000, progress: Optional[Any] = None) -> int:
+    """Upsert replayed stances into user_stances (same conflict key as the write-behind)."""
+    sb = client()
+    now = time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime())
+    batch: List[Dict[str, Any]] = []
+    written = 0
+    for user_id, theme_id, score in result.rows():
+        if not _is_uuid(user_id):
+            continue
+        batch.append({"user_id": user_id, "theme_id": theme_id, "stance_score": score, "updated_at": now})
+        if len(batch) >= batch_size:
+            sb.table("user_stances").upsert(batch, on_conflict="user_id,theme_id").execute()
+            written += len(batch)
+            batch = []
+            if progress is not None:
+                progress(written)
+    if batch:
+        sb.table("user_stances").upsert(batch, on_conflict="user_id,theme_id").execute()
+        written += len(batch)
+    return written
+
+
+def run_replay(
+    formula: InfluenceFormula, apply: bool = False, page_size: int = 10000, max_votes: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Replay the whole vote log with `formula` and compare with user_stances.
+    With apply=True the replayed stances are written back. With max_votes,
+    raises ReplayTooLarge instead of loading a longer log.
+    """
+    log = load_vote_log(page_size, max_votes)
+    result = replay(log, formula)
+    summary: Dict[str, Any] = {
+        "formula": formula.describe(),
+        "votes": len(log),
+        "dropped": log.dropped,
+        "users": int(len(log.user_ids)),
+        "themes": int(len(log.theme_ids)),
+        "steps": result.steps,
+        "replaySeconds": round(result.seconds, 3),
+        "diff": diff_against(result, load_current_stances(page_size)),
+    }
+    if apply:
+        summary["written"] = write_stances(result)
+    return summary
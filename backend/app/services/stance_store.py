@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from app.config import (
+    STANCE_DEAD_LETTER_MAX,
+    STANCE_FLUSH_INTERVAL_SECONDS,
+    STANCE_FLUSH_MAX_BATCH,
+    STANCE_FLUSH_MAX_RETRIES,
+    STANCE_MAX_PENDING,
+    VOTE_QUEUE_MAX_DEPTH,
+)
+from app.services.supabase_service import enabled, client, error_code, is_row_error
+from app.utils.logger import logger
+
+
+def _is_uuid(value: str) -> bool:
+    # user_stances / user_votes reference users(id) UUIDs; mock ids like
+    # "default_user" can never be stored and would fail the whole batch.
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+def is_storable(user_id: str) -> bool:
+    """True if the write-behind stores this user's votes and stances."""
+    return enabled() and _is_uuid(user_id)
+
+
+def load_user_state(user_id: str) -> Tuple[Dict[str, float], Set[str]]:
+    """Read one user's stances and voted opinion ids from Supabase."""
+    if not enabled() or not _is_uuid(user_id):
+        return {}, set()
+
+    sb = client()
+    stances_res = sb.table("user_stances").select("theme_id,stance_score").eq("user_id", user_id).execute()
+    votes_res = sb.table("user_votes").select("opinion_id").eq("user_id", user_id).execute()
+
+    stances = {r["theme_id"]: float(r["stance_score"]) for r in (stances_res.data or [])}
+    voted = {r["opinion_id"] for r in (votes_res.data or [])}
+    return stances, voted
+
+
+class VoteQueueFull(Exception):
+    """The vote ingestion queue is at capacity; the client should retry later."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("vote queue is full")
+        self.retry_after = retry_after
+
+
+class StanceWriteBehind:
+    """
+    Vote ingestion queue + stance write-behind buffer.
+
+    update_stance_score answers from memory and enqueues here; a background
+    task coalesces pending rows into bulk writes to Supabase when
+    `max_batch` votes are waiting, every `flush_interval` seconds, and once
+    more at shutdown.
+
+    - votes: FIFO bounded by `max_depth`. When it is full, `ensure_capacity`
+      raises VoteQueueFull so the API can answer 503 + Retry-After before
+      any in-memory state is changed.
+    - stances: keyed by (user_id, theme_id), so a user voting ten times in
+      one interval costs one upsert row; bounded by `max_pending`.
+    - a batch the database refuses because of a row in it (a foreign key to
+      a user that was never stored, a CHECK, a bad uuid) is written row by
+      row right away; the rows it refuses go to `dead_letter` instead of
+      blocking every vote behind them.
+    - any other failure (no answer, timeouts) puts the batch back at the
+      head of the queue for the next round. After `max_retries` failures
+      in a row the rows are tried one by one as well, still without
+      dropping any on such errors.
+
+    Listeners added with `on_stored` are called on the event loop with the
+    (user_id, theme_id) stances that left the buffer (written, or dropped
+    to the dead letter) and the wall-clock time their values were taken.
+    """
+
+    def __init__(
+        self,
+        max_batch: int,
+        flush_interval: float,
+        max_depth: int,
+        max_pending: int = STANCE_MAX_PENDING,
+        max_retries: int = STANCE_FLUSH_MAX_RETRIES,
+        dead_letter_max: int = STANCE_DEAD_LETTER_MAX,
+    ):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_depth = max_depth
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self._stances: Dict[Tuple[str, str], float] = {}
+        self._votes: Deque[Tuple[float, Dict[str, Any]]] = deque()  # (enqueued_at, row)
+        # {"table", "row", "error"} of rows the database refused, newest last
+        self.dead_letter: Deque[Dict[str, Any]] = deque(maxlen=dead_letter_max)
+        self._failures_in_row = 0
+        self._listeners: List[Callable[[List[Tuple[str, str]], float], None]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.enqueued_votes = 0
+        self.rejected_votes = 0
+        self.flushed_stances = 0
+        self.flushed_votes = 0
+        self.failed_flushes = 0
+        self.dropped_stances = 0
+        self.dropped_votes = 0
+        self.last_batch_size = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    def on_stored(self, listener: Callable[[List[Tuple[str, str]], float], None]) -> None:
+        self._listeners.append(listener)
+
+    def _stored(self, keys: List[Tuple[str, str]], taken_at: float) -> None:
+        if not keys:
+            return
+        for listener in self._listeners:
+            try:
+                listener(keys, taken_at)
+            except Exception as e:
+                logger.error(f"stance flush listener failed: {e}")
+
+    def depth(self) -> int:
+        return len(self._votes)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.flush_interval))
+
+    def ensure_capacity(self, user_id: str) -> None:
+        if not is_storable(user_id):
+            return
+        if len(self._votes) >= self.max_depth or len(self._stances) >= self.max_pending:
+            self.rejected_votes += 1
+            if self._wakeup is not None:
+                self._wakeup.set()
+            raise VoteQueueFull(self.retry_after())
+
+    def record(self, user_id: str, theme_id: str, opinion_id: str, vote_type: str, stance_score: float) -> None:
+        if not is_storable(user_id):
+            return
+        now = datetime.now(timezone.utc).isoformat()
+        self._stances[(user_id, theme_id)] = stance_score
+        self._votes.append((time.monotonic(), {
+            "user_id": user_id,
+            "opinion_id": opinion_id,
+            "vote_type": vote_type,
+            "created_at": now,
+        }))
+        self.enqueued_votes += 1
+        if len(self._votes) >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._stances or self._votes:
+                taken_at = time.time()
+                stances, self._stances = self._stances, {}
+                batch = [self._votes.popleft() for _ in range(min(self.max_batch, len(self._votes)))]
+                try:
+                    await asyncio.to_thread(self._write, stances, [row for _, row in batch])
+                except Exception as e:
+                    self.failed_flushes += 1
+                    self._failures_in_row += 1
+                    logger.error(f"stance flush failed ({len(stances)} stances, {len(batch)} votes): {e}")
+                    if not is_row_error(e) and self._failures_in_row < self.max_retries:
+                        self._requeue(stances, batch)
+                        return
+                    # find the rows the database refuses
+                    stances_left, batch_left = await asyncio.to_thread(self._write_rows, stances, batch)
+                    self._stored([k for k in stances if k not in stances_left], taken_at)
+                    if stances_left or batch_left:
+                        # not a row's fault (database unreachable...); try again next round
+                        self._requeue(stances_left, batch_left)
+                        return
+                    self._failures_in_row = 0
+                    continue
+
+                self._failures_in_row = 0
+                self._stored(list(stances), taken_at)
+                self.flushed_stances += len(stances)
+                self.flushed_votes += len(batch)
+                self.last_batch_size = len(batch)
+                if batch:
+                    lag = time.monotonic() - batch[0][0]
+                    self.last_lag_seconds = lag
+                    self.max_lag_seconds = max(self.max_lag_seconds, lag)
+
+    def _write_rows(
+        self, stances: Dict[Tuple[str, str], float], batch: List[Tuple[float, Dict[str, Any]]]
+    ) -> Tuple[Dict[Tuple[str, str], float], List[Tuple[float, Dict[str, Any]]]]:
+        """
+        Write one row per request. Rows the database refuses (is_row_error)
+        are dropped into the dead letter; on any other error stop and return
+        the rows not written yet.
+        """
+        keys = list(stances)
+        for i, key in enumerate(keys):
+            try:
+                self._write({key: stances[key]}, [])
+                self.flushed_stances += 1
+            except Exception as e:
+                if not is_row_error(e):
+                    return {k: stances[k] for k in keys[i:]}, batch
+                self._dead("user_stances", {"user_id": key[0], "theme_id": key[1], "stance_score": stances[key]}, e)
+                self.dropped_stances += 1
+        for i, (_, row) in enumerate(batch):
+            try:
+                self._write({}, [row])
+                self.flushed_votes += 1
+            except Exception as e:
+                if not is_row_error(e):
+                    return {}, batch[i:]
+                self._dead("user_votes", row, e)
+                self.dropped_votes += 1
+        return {}, []
+
+    def _dead(self, table: str, row: Dict[str, Any], e: Exception) -> None:
+        logger.error(f"stance flush: {table} row rejected, dropped: {row} ({e})")
+        self.dead_letter.append({"table": table, "row": row, "error": f"{error_code(e)}: {e}"})
+
+    def _requeue(self, stances: Dict[Tuple[str, str], float], batch: List[Tuple[float, Dict[str, Any]]]) -> None:
+        # newer in-memory values written since the swap win over the failed batch
+        for key, score in stances.items():
+            self._stances.setdefault(key, score)
+        # back to the head of the queue; while it stays full new votes get 503
+        self._votes.extendleft(reversed(batch))
+
+    @staticmethod
+    def _write(stances: Dict[Tuple[str, str], float], votes: List[Dict[str, Any]]) -> None:
+        sb = client()
+        now = datetime.now(timezone.utc).isoformat()
+        if stances:
+            rows = [
+                {"user_id": u, "theme_id": t, "stance_score": s, "updated_at": now}
+                for (u, t), s in stances.items()
+            ]
+            sb.table("user_stances").upsert(rows, on_conflict="user_id,theme_id").execute()
+        if votes:
+            sb.table("user_votes").insert(votes).execute()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        head_age = time.monotonic() - self._votes[0][0] if self._votes else 0.0
+        return {
+            "queue_depth": len(self._votes),
+            "queue_max_depth": self.max_depth,
+            "queue_lag_seconds": round(head_age, 3),
+            "last_flush_lag_seconds": round(self.last_lag_seconds, 3),
+            "max_flush_lag_seconds": round(self.max_lag_seconds, 3),
+            "last_batch_size": self.last_batch_size,
+            "enqueued_votes": self.enqueued_votes,
+            "rejected_votes": self.rejected_votes,
+            "pending_stances": len(self._stances),
+            "flushed_stances": self.flushed_stances,
+            "flushed_votes": self.flushed_votes,
+            "failed_flushes": self.failed_flushes,
+            "dropped_stances": self.dropped_stances,
+            "dropped_votes": self.dropped_votes,
+            "dead_letter": len(self.dead_letter),
+        }
+
+
+stance_write_behind = StanceWriteBehind(
+    max_batch=STANCE_FLUSH_MAX_BATCH,
+    flush_interval=STANCE_FLUSH_INTERVAL_SECONDS,
+    max_depth=VOTE_QUEUE_MAX_DEPTH,
+)
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import asyncio
+import zlib
+from typing import Any, Dict, List, Optional
+
+
+class StripedLock:
+    """
+    A fixed set of asyncio locks; a key always maps to the same stripe.
+
+    Two keys can share a stripe, so callers must not hold one stripe while
+    acquiring another. Locks are recreated if the running event loop
+    changes (asyncio locks cannot be shared between loops).
+    """
+
+    def __init__(self, stripes: int):
+        self.stripes = max(1, stripes)
+        self._locks: List[asyncio.Lock] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.contended = 0
+
+    def _index(self, key: str) -> int:
+        # crc32 is stable across processes, unlike hash(str)
+        return zlib.crc32(key.encode("utf-8")) % self.stripes
+
+    def get(self, key: str) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._locks = [asyncio.Lock() for _ in range(self.stripes)]
+            self._loop = loop
+        lock = self._locks[self._index(key)]
+        if lock.locked():
+            self.contended += 1
+        return lock
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stripes": self.stripes,
+            "held": sum(1 for lock in self._locks if lock.locked()),
+            "contended": self.contended,
+        }
@@ -1,6 +1,6 @@
 from __future__ import annotations
-from typing import Any
-from app.config import SUPABASE_URL, SUPABASE_KEY
+from typing import Any, Optional
+from app.config import FAKE_PROVIDERS, FAKE_SUPABASE_THEMES, SUPABASE_URL, SUPABASE_KEY
 from app.utils.logger import logger
 
 _supabase = None
@@ -13,14 +13,59 @@ def client() -> Any:
         raise RuntimeError("Supabase is not configured. Set SUPABASE_URL and SUPABASE_KEY.")
     return _supabase
 
-def init_supabase() -> None:
+def init_supabase(http_client: Any = None) -> None:
+    """
+    Create the process-wide Supabase client (idempotent).
+    `http_client` is the pooled httpx.Client from app.core.clients.
+    """
     global _supabase
     if _supabase is not None:
         return
+    if "supabase" in FAKE_PROVIDERS:
+        from app.services.fake_supabase import FakeSupabase, preload_themes
+
+        _supabase = FakeSupabase()
+        preload_themes(_supabase, FAKE_SUPABASE_THEMES)
+        logger.info(f"Using the in-memory fake Supabase ({FAKE_SUPABASE_THEMES} preloaded themes)")
+        return
     if not (SUPABASE_URL and SUPABASE_KEY):
         logger.warning("Supabase env vars not set; running without DB.")
         return
     
-    from supabase import create_client
-    _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    logger.info(f"✓ Supabaseに接続しました: {SUPABASE_URL}")
\ No newline at end of file
+    from supabase import create_client, ClientOptions
+    options = ClientOptions(httpx_client=http_client) if http_client is not None else None
+    _supabase = create_client(SUPABASE_URL, SUPABASE_KEY, options=options)
+    logger.info(f"✓ Supabaseに接続しました: {SUPABASE_URL}")
+
+def reset_supabase() -> None:
+    global _supabase
+    _supabase = None
+
+def error_code(e: BaseException) -> Optional[str]:
+    """
+    Postgres / PostgREST code of an error the database answered with
+    ("23505", "PGRST204", ...), or None when there was no answer (network
+    errors, timeouts).
+    """
+    code = getattr(e, "code", None)
+    if code is None and e.args and isinstance(e.args[0], dict):
+        # some postgrest versions only carry the error payload in args
+        code = e.args[0].get("code")
+    return None if code is None else str(code)
+
+
+# SQLSTATE classes that depend on the row itself: 22 data exception (bad
+# uuid / number), 23 integrity constraint (foreign key, check, unique).
+# Sending the same row again fails the same way; other rows may succeed.
+_ROW_ERROR_CLASSES = ("22", "23")
+
+
+def is_row_error(e: BaseException) -> bool:
+    """
+    True if the database refused the request because of a row in it
+    (retrying cannot help), False for errors worth retrying as they are:
+    no answer, timeouts, PostgREST connection errors (PGRST0xx), auth or
+    schema errors that no single row causes.
+    """
+    code = error_code(e)
+    return code is not None and code[:2] in _ROW_ERROR_CLASSES
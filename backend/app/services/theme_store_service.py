@@ -1,7 +1,110 @@
 from __future__ import annotations
-from typing import List, Dict, Any
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
+import base64
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
 
+from datetime import datetime, timezone
+
+from app.config import THEMES_SNAPSHOT_MAX_AGE_SECONDS
+from app.services.opinion_score_index import opinion_score_index
 from app.services.supabase_service import enabled, client
+from app.utils.logger import logger
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip is offered without it
+    brotli = None
+
+@dataclass(frozen=True)
+class ThemesSnapshot:
+    payload: Dict[str, Any]
+    body: bytes          # payload serialized once, sent as-is
+    etag: str            # content hash of body
+    version: int
+    built_at: float
+    encoded: Dict[str, bytes] = field(default_factory=dict)  # Content-Encoding -> compressed body
+
+def _dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _compress_variants(body: bytes) -> Dict[str, bytes]:
+    out = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        out["br"] = brotli.compress(body, quality=9)
+    return out
+
+def _validate_payload(payload: Dict[str, Any]) -> None:
+    # Checked once per rebuild instead of via response_model on every request.
+    from app.schemas.themes import ThemesResponse
+    try:
+        ThemesResponse.model_validate(payload)
+    except Exception as e:
+        logger.warning(f"themes payload does not match ThemesResponse: {e}")
+
+# Process-local read model of list_themes_with_opinions().
+# Local writes bump _version so the next read rebuilds; writes made by other
+# processes are picked up after THEMES_SNAPSHOT_MAX_AGE_SECONDS.
+_snapshot: Optional[ThemesSnapshot] = None
+_version = 0
+_rebuild_lock = threading.Lock()
+
+def invalidate_themes_snapshot() -> None:
+    global _version
+    _version += 1
+
+def themes_snapshot_if_fresh() -> Optional[ThemesSnapshot]:
+    snap = _snapshot
+    if snap is None or snap.version != _version:
+        return None
+    if time.monotonic() - snap.built_at > THEMES_SNAPSHOT_MAX_AGE_SECONDS:
+        return None
+    return snap
+
+def get_themes_snapshot() -> ThemesSnapshot:
+    """
+    Return the current snapshot, rebuilding it (one thread at a time) when a
+    local write invalidated it or it is older than the max staleness.
+    """
+    global _snapshot
+    snap = themes_snapshot_if_fresh()
+    if snap is not None:
+        return snap
+
+    with _rebuild_lock:
+        snap = themes_snapshot_if_fresh()
+        if snap is not None:
+            return snap
+
+        version = _version
+        payload = list_themes_with_opinions()
+        body = _dumps(payload)
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+        prev = _snapshot
+        if prev is not None and prev.etag == etag:
+            # periodic refresh with unchanged data: keep the compressed bodies
+            encoded = prev.encoded
+        else:
+            _validate_payload(payload)
+            encoded = _compress_variants(body)
+
+        _snapshot = ThemesSnapshot(
+            payload=payload, body=body, etag=etag, version=version, built_at=time.monotonic(), encoded=encoded
+        )
+        return _snapshot
 
 def list_themes_with_opinions() -> Dict[str, Any]:
     """
@@ -25,6 +128,13 @@ def list_themes_with_opinions() -> Dict[str, Any]:
     opinions_res = sb.table("opinions").select("id,theme_id,title,body,score,color,source_url").execute()
     opinions = opinions_res.data or []
 
+    return group_opinions_by_theme(themes, opinions)
+
+def group_opinions_by_theme(themes: List[dict], opinions: List[dict]) -> Dict[str, Any]:
+    """
+    Nest opinion rows under their theme rows (API shape: sourceUrl, opinions list per theme).
+    Pure; separated from the DB reads so it can be benchmarked.
+    """
     by_theme: Dict[str, List[dict]] = {}
     for op in opinions:
         by_theme.setdefault(op["theme_id"], []).append({
@@ -47,6 +157,139 @@ def list_themes_with_opinions() -> Dict[str, Any]:
 
     return {"themes": out}
 
+# API field name -> DB column, for fields= projection
+THEME_FIELDS = {"id": "id", "title": "title", "color": "color", "createdAt": "created_at"}
+OPINION_FIELDS = {
+    "id": "id",
+    "title": "title",
+    "body": "body",
+    "score": "score",
+    "color": "color",
+    "sourceUrl": "source_url",
+}
+DEFAULT_THEME_FIELDS = ("id", "title", "color")
+
+def parse_fields(fields: Optional[str]) -> tuple[list[str], Optional[list[str]]]:
+    """
+    "id,title,color"                -> themes only, no opinions fetched
+    "id,title,opinions"             -> themes with every opinion field
+    "title,opinions.title,opinions.score" -> themes with selected opinion fields
+    None                            -> the full document (same shape as list_themes_with_opinions)
+
+    Returns (theme_fields, opinion_fields or None). Raises ValueError on unknown names.
+    """
+    if not fields:
+        return list(DEFAULT_THEME_FIELDS), list(OPINION_FIELDS)
+
+    theme_fields: list[str] = []
+    opinion_fields: Optional[list[str]] = None
+    for name in (f.strip() for f in fields.split(",")):
+        if not name:
+            continue
+        if name == "opinions":
+            opinion_fields = list(OPINION_FIELDS)
+        elif name.startswith("opinions."):
+            sub = name[len("opinions."):]
+            if sub not in OPINION_FIELDS:
+                raise ValueError(f"unknown opinion field: {sub}")
+            if opinion_fields is None:
+                opinion_fields = []
+            if sub not in opinion_fields:
+                opinion_fields.append(sub)
+        elif name in THEME_FIELDS:
+            if name not in theme_fields:
+                theme_fields.append(name)
+        else:
+            raise ValueError(f"unknown field: {name}")
+    return theme_fields, opinion_fields
+
+# theme ids are stable_id() hashes ("theme_<hex>") or uuid4 strings
+_CURSOR_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+def encode_cursor(created_at: Optional[str], theme_id: str) -> str:
+    raw = json.dumps([created_at, theme_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[Optional[str], str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, theme_id = json.loads(raw)
+    except Exception:
+        raise ValueError("invalid cursor")
+    # both values end up inside a PostgREST filter string, so only accept
+    # what we put there ourselves: an ISO timestamp (or None) and a plain id
+    if not isinstance(theme_id, str) or not _CURSOR_ID.fullmatch(theme_id):
+        raise ValueError("invalid cursor")
+    if created_at is not None:
+        try:
+            datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            raise ValueError("invalid cursor")
+    return created_at, theme_id
+
+def list_themes_page(
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    max_opinions: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    One page of themes ordered by (created_at, id), oldest first.
+
+    Projection and the per-theme opinion cap are pushed down into a single
+    PostgREST query (opinions are embedded through the theme_id foreign key),
+    so rows and columns the client did not ask for are never fetched.
+
+    :return: {"themes": [...], "nextCursor": str | None}
+    """
+    theme_fields, opinion_fields = parse_fields(fields)
+    after = decode_cursor(cursor) if cursor else None
+
+    if not enabled():
+        return {"themes": [], "nextCursor": None}
+
+    # id / created_at are always needed to build the next cursor
+    cols = {"id", "created_at"} | {THEME_FIELDS[f] for f in theme_fields}
+    select = ",".join(sorted(cols))
+    if opinion_fields is not None:
+        op_cols = ",".join(OPINION_FIELDS[f] for f in opinion_fields) or "id"
+        select += f",opinions({op_cols})"
+
+    sb = client()
+    q = sb.table("themes").select(select).order("created_at").order("id").limit(limit + 1)
+    if after is not None:
+        created_at, last_id = after
+        if created_at is None:
+            # NULL created_at sorts last, so only NULL rows can follow
+            q = q.is_("created_at", "null").gt("id", last_id)
+        else:
+            # values are quoted because timestamps contain ':' and '+'; rows
+            # without created_at sort after every timestamp, so they follow too
+            q = q.or_(
+                f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt."{last_id}"),created_at.is.null'
+            )
+    if opinion_fields is not None:
+        q = q.order("created_at", foreign_table="opinions")
+        if max_opinions is not None:
+            q = q.limit(max_opinions, foreign_table="opinions")
+
+    rows = q.execute().data or []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    out = []
+    for t in rows:
+        theme = {f: t[THEME_FIELDS[f]] for f in theme_fields}
+        if opinion_fields is not None:
+            theme["opinions"] = [
+                {f: op.get(OPINION_FIELDS[f]) for f in opinion_fields}
+                for op in (t.get("opinions") or [])
+            ]
+        out.append(theme)
+
+    next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if has_more and rows else None
+    return {"themes": out, "nextCursor": next_cursor}
+
 def theme_exists(theme_id: str) -> bool:
     if not enabled():
         return False
@@ -67,17 +310,26 @@ def upsert_theme_and_opinions(theme: dict, opinions: list[dict]) -> None:
     
     sb = client()
 
-    sb.table("themes").upsert(theme).execute()
+    try:
+        sb.table("themes").upsert(theme).execute()
 
-    if opinions:
-        db_ops = []
-        for op in opinions:
-            op2 = dict(op)
-            if "sourceUrl" in op2:
-                op2["source_url"] = op2.pop("sourceUrl")
-            db_ops.append(op2)
+        if opinions:
+            # the column default only applies on insert; the score index
+            # refreshes incrementally by updated_at, so set it on every write
+            now = datetime.now(timezone.utc).isoformat()
+            db_ops = []
+            for op in opinions:
+                op2 = dict(op)
+                if "sourceUrl" in op2:
+                    op2["source_url"] = op2.pop("sourceUrl")
+                op2["updated_at"] = now
+                db_ops.append(op2)
 
-        sb.table("opinions").upsert(db_ops).execute()
+            sb.table("opinions").upsert(db_ops).execute()
+            opinion_score_index.put_rows(db_ops)
+    finally:
+        # even a half-applied write changes what readers see
+        invalidate_themes_snapshot()
 
 # DELETE AFTER TESTING
 def insert_opinions_only(opinion_rows):
@@ -95,6 +347,8 @@ def insert_opinions_only(opinion_rows):
         res = sb.table("opinions").insert(db_ops).execute()
         if getattr(res, "error", None):
             raise RuntimeError(f"opinions insert failed: {res.error}")
+        opinion_score_index.put_rows(db_ops)
+        invalidate_themes_snapshot()
         
 def delete_opinions_for_theme(theme_id: str) -> int:
     """
@@ -110,6 +364,8 @@ def delete_opinions_for_theme(theme_id: str) -> int:
     err = getattr(res, "error", None)
     if err:
         raise RuntimeError(f"opinions delete failed: {err}")
+    opinion_score_index.remove_theme(theme_id)
+    invalidate_themes_snapshot()
 
     # Some supabase-py versions return deleted rows in res.data; some return [].
     data = getattr(res, "data", None) or []
@@ -1,5 +1,6 @@
 from __future__ import annotations
 from typing import Dict, List
+from app.services.near_duplicates import find_near_duplicates, stance_side
 from app.services.openai_data_collect_service import CollectedItems, stable_id
 
 from uuid import uuid4
@@ -66,7 +67,7 @@ def _normalize_text(s: str) -> str:
     s = re.sub(r"\s+", " ", s)
     return s
 
-def dedupe_opinions_by_content(opinion_rows: list[dict]) -> list[dict]:
+def dedupe_opinions_by_content(opinion_rows: list[dict], near_duplicates: bool = True) -> list[dict]:
     seen = set()
     out = []
     for op in opinion_rows:
@@ -75,6 +76,13 @@ def dedupe_opinions_by_content(opinion_rows: list[dict]) -> list[dict]:
             continue
         seen.add(key)
         out.append(op)
+    if near_duplicates and len(out) > 1:
+        # paraphrases / reprints of an earlier opinion on the same side (NEAR_DUP_THRESHOLD); the first one is kept
+        dup_of = find_near_duplicates(
+            [f"{op['title']}\n{op['body']}" for op in out],
+            groups=[stance_side(op.get("score")) for op in out],
+        )
+        out = [op for op, dup in zip(out, dup_of) if dup is None]
     return out
 
 
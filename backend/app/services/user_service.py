@@ -11,8 +11,10 @@ from app.utils.logger import logger
 class UserService:
     """ユーザー関連のビジネスロジックを提供するサービスクラス"""
     
-    def __init__(self):
-        self.supabase = get_supabase()
+    @property
+    def supabase(self):
+        # lifespan で作られる共有クライアントを毎回参照する（インポート時には作らない）
+        return get_supabase()
     
     async def register_user(self, nickname: str) -> Dict[str, Any]:
         """
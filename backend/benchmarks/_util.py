@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import contextlib
+import os
+import socket
+import statistics
+import threading
+import time
+from typing import Dict, Iterator, List
+
+# Supabase はつながらないダミーの宛先にしておく（DB アクセスはすぐ失敗し、.env の本番DBには触れない）
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    k = (len(xs) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+def summarize_ms(values: List[float]) -> Dict[str, float]:
+    ms = [v * 1000.0 for v in values]
+    return {
+        "n": len(ms),
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(max(ms) if ms else 0.0, 2),
+        "mean_ms": round(statistics.fmean(ms) if ms else 0.0, 2),
+    }
+
+
+@contextlib.contextmanager
+def serve(app) -> Iterator[str]:
+    """
+    app を uvicorn でバックグラウンド起動し、ベースURLを返す。
+    httpx.ASGITransport はレスポンスをバッファするので、ストリーミングの計測にはこちらを使う。
+    """
+    import uvicorn
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
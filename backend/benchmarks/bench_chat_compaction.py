@@ -0,0 +1,126 @@
+"""
+長い会話（30ターン）での1ターンあたりのプロンプトトークン数と返答レイテンシ：全履歴を送る場合 vs 要約による圧縮。
+
+    cd backend
+    python -m benchmarks.bench_chat_compaction [--turns 30] [--base-ms 300] [--ms-per-1k-tokens 80]
+
+Gemini はスタブ。返答までの時間を「base-ms + プロンプトトークン数に比例する分」とみなして sleep する。
+要約の生成（バックグラウンド）も同じスタブを通るので、そのトークン数も別に数える。
+トークン数は app.services.chat_compaction.estimate_tokens による見積もり。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import _util
+
+import httpx
+import google.generativeai as genai
+
+import app.api.main as api_main
+from app.services.chat_compaction import chat_compactor, estimate_tokens, history_tokens
+
+USER_TEXT = "私は地域の安全を優先すべきだと思います。実際に近所で目撃情報があり、子どもの通学路が心配です。"
+REPLY_TEXT = (
+    "通学路のご心配、よくわかります。身近な場所での目撃情報は不安になりますよね。"
+    "一方で、駆除に反対する人たちは生態系への影響や、人間側の開発が原因ではないかという点を気にしています。"
+    "例えば、電気柵や餌となる果樹の管理など、駆除以外の対策を組み合わせる考え方もあるようですが、"
+    "これについてはどう思いますか？"
+)
+SUMMARY_TEXT = "・" + "ユーザーは地域の安全を重視し、通学路の不安を挙げた。AIは共存策を提案した。" * 5
+
+
+class _Timing:
+    base = 0.3
+    per_token = 0.00008
+    chat_tokens = []
+    summary_tokens = []
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StubChat:
+    def __init__(self, instruction: str, history):
+        self.prompt_tokens = estimate_tokens(instruction) + history_tokens(history or [])
+
+    def send_message(self, message, stream=False, **kwargs):
+        tokens = self.prompt_tokens + estimate_tokens(message)
+        _Timing.chat_tokens.append(tokens)
+        time.sleep(_Timing.base + _Timing.per_token * tokens)
+        return _StubResponse(REPLY_TEXT)
+
+
+class _StubModel:
+    def __init__(self, model_name, system_instruction="", **kwargs):
+        self.instruction = system_instruction or ""
+
+    def start_chat(self, history=None):
+        return _StubChat(self.instruction, history)
+
+    def generate_content(self, prompt, **kwargs):
+        tokens = estimate_tokens(self.instruction) + estimate_tokens(prompt)
+        _Timing.summary_tokens.append(tokens)
+        time.sleep(_Timing.base + _Timing.per_token * tokens)
+        return _StubResponse(SUMMARY_TEXT)
+
+
+async def _conversation(client: httpx.AsyncClient, turns: int):
+    session_id, latency = None, []
+    for i in range(turns):
+        body = {"message": f"{i}: {USER_TEXT}"}
+        body.update({"sessionId": session_id} if session_id else {"newSession": True, "topic": "熊の駆除", "viewpoint": "賛成"})
+        t0 = time.perf_counter()
+        r = await client.post("/simple-chat", json=body)
+        latency.append(time.perf_counter() - t0)
+        r.raise_for_status()
+        session_id = r.json()["sessionId"]
+        # ユーザーが返答を読んで次を書く間（要約はこの間にバックグラウンドで進む）
+        await asyncio.sleep(0.5)
+    await chat_compactor.drain()
+    return latency
+
+
+async def _run(turns: int):
+    genai.GenerativeModel = _StubModel
+    transport = httpx.ASGITransport(app=api_main.app)
+    out = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        budget, hard = chat_compactor.token_budget, chat_compactor.hard_limit_tokens
+        for label, enabled in (("full_history", False), ("compacted", True)):
+            chat_compactor.token_budget = budget if enabled else 10**9
+            chat_compactor.hard_limit_tokens = hard if enabled else 10**9
+            _Timing.chat_tokens, _Timing.summary_tokens = [], []
+            latency = await _conversation(client, turns)
+            tokens = _Timing.chat_tokens
+            out[label] = {
+                "prompt_tokens_by_turn": {f"turn{t}": tokens[t - 1] for t in (1, 5, 10, 15, 20, 25, 30) if t <= len(tokens)},
+                "prompt_tokens_total": sum(tokens),
+                "summary_calls": len(_Timing.summary_tokens),
+                "summary_tokens_total": sum(_Timing.summary_tokens),
+                "reply_latency_all": _util.summarize_ms(latency),
+                "reply_latency_last10": _util.summarize_ms(latency[-10:]),
+            }
+        chat_compactor.token_budget, chat_compactor.hard_limit_tokens = budget, hard
+    out["compaction"] = chat_compactor.stats()
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--base-ms", type=float, default=300.0)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=80.0)
+    args = parser.parse_args()
+    _Timing.base = args.base_ms / 1000.0
+    _Timing.per_token = args.ms_per_1k_tokens / 1000.0 / 1000.0
+    print(json.dumps(asyncio.run(_run(args.turns)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+/simple-chat：全履歴を毎ターン送る従来の形と、サーバー側セッション（最初に newSession、以降は sessionId + 新しい発言だけ）の比較。
+
+    cd backend
+    python -m benchmarks.bench_chat_sessions [--turns 30] [--conversations 20]
+
+- request_bytes: 1会話で送ったリクエストボディの合計（従来はターン数の2乗で増える）
+- server_ms: 1ターンあたりのサーバー処理時間（Gemini はすぐ返すスタブ。JSON 解析・履歴の組み立て分）
+- モデルが受け取った履歴が両方式で同じになることも確認する
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import _util
+
+import httpx
+import google.generativeai as genai
+
+import app.api.main as api_main
+from app.services.chat_session_store import chat_sessions
+
+USER_TEXT = "その点については、地域の事情によって考え方が大きく変わると思います。" * 3
+REPLY_TEXT = "なるほど、地域ごとの事情を重視されているのですね。例えば、" + "具体的な取り組みの例を挙げると、" * 10
+
+
+class _StubResponse:
+    text = REPLY_TEXT
+
+
+class _StubChat:
+    def __init__(self, history):
+        _StubModel.seen.append([(h["role"], h["parts"][0]) for h in history or []])
+
+    def send_message(self, message, stream=False, **kwargs):
+        return _StubResponse()
+
+
+class _StubModel:
+    seen = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def start_chat(self, history=None):
+        return _StubChat(history)
+
+
+async def _conversation(client: httpx.AsyncClient, turns: int, use_session: bool):
+    history, session_id = [], None
+    sent, server = 0, []
+    for i in range(turns):
+        message = f"{i}: {USER_TEXT}"
+        if use_session and session_id:
+            body = {"message": message, "sessionId": session_id}
+        else:
+            body = {"message": message, "history": history, "topic": "熊の駆除", "viewpoint": "賛成", "content": "特になし"}
+            if use_session:
+                body["newSession"] = True
+        raw = json.dumps(body, ensure_ascii=False).encode()
+        sent += len(raw)
+        t0 = time.perf_counter()
+        r = await client.post("/simple-chat", content=raw, headers={"Content-Type": "application/json"})
+        server.append(time.perf_counter() - t0)
+        r.raise_for_status()
+        data = r.json()
+        session_id = data.get("sessionId")
+        history += [{"sender": "user", "text": message}, {"sender": "bot", "text": data["reply"]}]
+    return sent, server
+
+
+async def _run(turns: int, conversations: int):
+    genai.GenerativeModel = _StubModel
+    transport = httpx.ASGITransport(app=api_main.app)
+    out = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for label, use_session in (("stateless", False), ("session", True)):
+            _StubModel.seen = []
+            sent, server = 0, []
+            for _ in range(conversations):
+                s, t = await _conversation(client, turns, use_session)
+                sent += s
+                server += t
+            out[label] = {
+                "request_bytes_per_conversation": sent // conversations,
+                "last_turn_history_messages": len(_StubModel.seen[turns - 1]),
+                "server": _util.summarize_ms(server),
+            }
+            out[label]["_seen"] = _StubModel.seen[:turns]
+    same = out["stateless"].pop("_seen") == out["session"].pop("_seen")
+    out["model_saw_same_history"] = same
+    out["chat_sessions"] = chat_sessions.stats()
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--conversations", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(_run(args.turns, args.conversations)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+/simple-chat と /simple-chat/stream の time-to-first-token を比較する。
+
+    cd backend
+    python -m benchmarks.bench_chat_stream [--chunks 20] [--chunk-latency 0.1]
+
+Gemini はチャンクごとに sleep するスタブ。非ストリーミング版は全文生成後に初めて返る。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import _util
+
+import httpx
+import google.generativeai as genai
+
+import app.api.main as api_main
+
+
+class _StubChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StubResponse:
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    def __iter__(self):
+        for c in self._chunks:
+            time.sleep(_StubModel.chunk_latency)
+            yield _StubChunk(c)
+
+    @property
+    def text(self):
+        return "".join(self._chunks)
+
+
+class _StubChat:
+    def send_message(self, message, stream=False, **kwargs):
+        chunks = [f"トークン{i} " for i in range(_StubModel.chunks)] + ["ありがとうございました。[[", "END]]"]
+        resp = _StubResponse(chunks)
+        if not stream:
+            for _ in resp:
+                pass
+        return resp
+
+
+class _StubModel:
+    chunks = 20
+    chunk_latency = 0.1
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def start_chat(self, history=None):
+        return _StubChat()
+
+
+async def _run(base_url: str, requests: int):
+    body = {"message": "こんにちは", "history": []}
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        blocking_total = []
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            r = await client.post("/simple-chat", json=body)
+            r.raise_for_status()
+            blocking_total.append(time.perf_counter() - t0)
+
+        ttft, total, last_event = [], [], None
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            first = None
+            async with client.stream("POST", "/simple-chat/stream", json=body) as r:
+                async for line in r.aiter_lines():
+                    if line.startswith("event: token") and first is None:
+                        first = time.perf_counter() - t0
+                    if line.startswith("data: "):
+                        last_event = json.loads(line[6:])
+            ttft.append(first or 0.0)
+            total.append(time.perf_counter() - t0)
+
+    return {
+        "simple_chat_ttft": _util.summarize_ms(blocking_total),
+        "stream_ttft": _util.summarize_ms(ttft),
+        "stream_total": _util.summarize_ms(total),
+        "final_event": last_event,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=5)
+    ap.add_argument("--chunks", type=int, default=20)
+    ap.add_argument("--chunk-latency", type=float, default=0.1)
+    args = ap.parse_args()
+
+    _StubModel.chunks = args.chunks
+    _StubModel.chunk_latency = args.chunk_latency
+    genai.GenerativeModel = _StubModel
+
+    with _util.serve(api_main.app) as base_url:
+        result = asyncio.run(_run(base_url, args.requests))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
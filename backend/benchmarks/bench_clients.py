@@ -0,0 +1,213 @@
+"""
+共有クライアント（app.core.clients）の効果：ローカルの HTTPS スタブサーバーに対する接続数（= TLS ハンドシェイク数）とレイテンシ。
+
+    cd backend
+    python -m benchmarks.bench_clients [--calls 60] [--parallel 8] [--rtt-ms 20]
+
+- openai: collect_topic_cards を呼ぶ。per_call は変更前（呼び出しごとに OpenAI(...) を作る）、shared は共有クライアント
+- supabase: ユーザー系（core.supabase_client）とテーマ系（supabase_service）を交互に呼ぶ。
+  before は変更前の2つのシングルトン、shared は1つに統合したクライアント
+
+スタブは自己署名証明書で TLS を話し、新しい TCP 接続ごとに --rtt-ms だけ待ってからハンドシェイクする（実ネットワークの往復を模す）。
+openssl が無ければ平文 HTTP で接続数だけ比べる。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks import _util
+
+_CARDS = {
+    "items": [
+        {"topic_name": f"論点{i}", "summary": f"要約{i}", "url": f"https://news{i}.example.com/a{i}", "agreement_score": s}
+        for i, s in enumerate([80, 40, 10, -10, -40, -80, 60, -60])
+    ]
+}
+
+_RESPONSE = {
+    "id": "resp_stub",
+    "object": "response",
+    "created_at": 0,
+    "model": "stub",
+    "status": "completed",
+    "output": [{
+        "type": "message",
+        "id": "msg_stub",
+        "role": "assistant",
+        "status": "completed",
+        "content": [{"type": "output_text", "text": json.dumps(_CARDS, ensure_ascii=False), "annotations": []}],
+    }],
+}
+
+
+class _Stub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, rtt: float, ctx: ssl.SSLContext | None):
+        super().__init__(addr, _Handler)
+        self.rtt = rtt
+        self.ctx = ctx
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def get_request(self):
+        sock, addr = super().get_request()
+        with self._lock:
+            self.connections += 1
+        return sock, addr
+
+    def finish_request(self, request, client_address):
+        # ハンドシェイクは接続スレッドで行う（accept ループを止めない）
+        time.sleep(self.rtt)
+        if self.ctx is not None:
+            request = self.ctx.wrap_socket(request, server_side=True)
+        super().finish_request(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, payload):
+        with self.server._lock:
+            self.server.requests += 1
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._send([])
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._send(_RESPONSE if "/responses" in self.path else [])
+
+
+def _self_signed(tmp: str) -> tuple[str, str] | None:
+    if not shutil.which("openssl"):
+        return None
+    cert, key = os.path.join(tmp, "cert.pem"), os.path.join(tmp, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-keyout", key, "-out", cert, "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def _run(stub: _Stub, fn, calls: int, parallel: int) -> dict:
+    c0, r0 = stub.connections, stub.requests
+    lat = []
+
+    def one(_):
+        t0 = time.perf_counter()
+        fn()
+        lat.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(parallel) as pool:
+        list(pool.map(one, range(calls)))
+    wall = time.perf_counter() - t0
+    return {
+        "calls": calls,
+        "connections": stub.connections - c0,
+        "requests": stub.requests - r0,
+        "wall_s": round(wall, 3),
+        **_util.summarize_ms(lat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=60)
+    parser.add_argument("--parallel", type=int, default=8)
+    parser.add_argument("--rtt-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    pair = _self_signed(tmp)
+    ctx = None
+    if pair:
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(*pair)
+        os.environ["SSL_CERT_FILE"] = pair[0]  # httpx がこの証明書を信頼する
+
+    stub = _Stub(("127.0.0.1", 0), args.rtt_ms / 1000.0, ctx)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    base = f"{'https' if ctx else 'http'}://127.0.0.1:{stub.server_address[1]}"
+
+    # app の設定はインポート時に読まれるので、先に環境変数を入れる
+    os.environ["OPENAI_API_KEY"] = "sk-stub"
+    os.environ["OPENAI_BASE_URL"] = f"{base}/v1"
+    os.environ["SUPABASE_URL"] = base
+    os.environ["SUPABASE_KEY"] = "stub"
+    os.environ["PROVIDER_RATE_LIMITS"] = ""  # 接続数を比べたいので流量制限はかけない
+
+    from openai import OpenAI
+    from supabase import create_client
+
+    import app.services.openai_data_collect_service as collect
+    from app.core import clients
+    from app.services import supabase_service
+    from app.services.theme_store_service import theme_exists
+
+    shared_openai = collect.openai_client
+
+    def collect_once():
+        asyncio.run(collect.collect_topic_cards("ベンチマーク", max_items=8))
+
+    out = {"tls": bool(ctx), "rtt_ms": args.rtt_ms}
+
+    collect.openai_client = lambda: OpenAI(api_key="sk-stub")   # 変更前: 呼び出しごとに新しいクライアント
+    out["openai/per_call"] = _run(stub, collect_once, args.calls, args.parallel)
+    collect.openai_client = shared_openai
+    out["openai/shared"] = _run(stub, collect_once, args.calls, args.parallel)
+
+    # 変更前: core.supabase_client と supabase_service がそれぞれ別のクライアント（別の接続プール）
+    user_sb = create_client(base, "stub")
+    theme_sb = create_client(base, "stub")
+    counter = iter(range(10**9))
+
+    def two_singletons():
+        sb = user_sb if next(counter) % 2 else theme_sb
+        sb.table("users").select("id").eq("nickname", "x").execute()
+
+    out["supabase/two_clients"] = _run(stub, two_singletons, args.calls, args.parallel)
+
+    clients.init_clients()
+
+    def shared_supabase():
+        if next(counter) % 2:
+            supabase_service.client().table("users").select("id").eq("nickname", "x").execute()
+        else:
+            theme_exists("theme_x")
+
+    out["supabase/shared"] = _run(stub, shared_supabase, args.calls, args.parallel)
+    out["client_stats"] = clients.client_stats()
+    clients.close_clients()
+    stub.shutdown()
+    shutil.rmtree(tmp, ignore_errors=True)
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+pick_diverse_items のスケール：旧実装（1件選ぶたびに残り全件をソート）vs ヒープによる遅延再評価（coverage / mmr）。
+
+    cd backend
+    python -m benchmarks.bench_diversity_pick [--sizes 100,1000,10000] [--targets 6,100,1000] [--seeds 20]
+
+候補は「複数の検索結果を束ねた」想定の合成データ：記事の1割強は同じ話題の言い換え（別ドメインの転載・要約違い）で、
+ドメインは最大 200 種類、賛否スコアは一様。
+旧実装と比べるため、言い換えの除去（near_duplicates）は切って選択そのものだけを測る。
+
+- ms: 1回の呼び出し時間（best of --repeat）。before が 30 秒を超えそうな組み合わせは飛ばす（null）
+- same_picks: --seeds 個の入力のうち、coverage の選択結果が旧実装と完全に一致した割合（同点の扱いも旧実装と同じなので 1.0 になる）
+- same_meta: unique_domains と bucket_counts が旧実装と一致した割合
+- max_similarity: 選ばれた記事どうしの文字 bigram Jaccard 類似度の最大値（平均）。mmr で下がるほど言い換えの重複が少ない
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from benchmarks import _util  # noqa: F401  (Supabase の宛先をダミーにする)
+
+from app.services import diversity_pick
+from app.services.diversity_pick import CoverageObjective, MMRObjective, pick_diverse_items
+from app.services.openai_data_collect_service import CollectedItem
+
+_WORDS = ["安全", "財源", "環境", "地域", "教育", "雇用", "外交", "医療", "交通", "住宅", "農業", "観光", "物価", "税制"]
+_ENDINGS = ["が議論になっている。", "について賛否が分かれる。", "をめぐり関係者が意見を述べた。", "の見直しが検討されている。"]
+
+
+def _legacy_pick(items: List, target_n: int = 6):
+    # 変更前の pick_diverse_items（比較用にそのまま残す）
+    _norm, _domain, _stance_bucket = diversity_pick._norm, diversity_pick._domain, diversity_pick._stance_bucket
+    seen = set()
+    uniq = []
+    for it in items:
+        key = (_norm(getattr(it, "topic_name", "")), _norm(getattr(it, "summary", "")))
+        if key in seen:
+            continue
+        seen.add(key)
+        uniq.append(it)
+    annotated = [(it, _domain(str(it.url)), _stance_bucket(int(it.agreement_score))) for it in uniq]
+    picked = []
+    used_domains = set()
+    bucket_counts = {"pro": 0, "con": 0, "neutral": 0, "other": 0}
+
+    def cand_score(dom: str, b: str) -> int:
+        s = 0
+        if bucket_counts.get(b, 0) == 0:
+            s += 4
+        if dom not in used_domains:
+            s += 3
+        if b == "other":
+            s -= 1
+        return s
+
+    remaining = annotated[:]
+    while remaining and len(picked) < target_n:
+        remaining.sort(key=lambda x: cand_score(x[1], x[2]), reverse=True)
+        it, dom, b = remaining.pop(0)
+        picked.append(it)
+        used_domains.add(dom)
+        bucket_counts[b] = bucket_counts.get(b, 0) + 1
+    meta = {"unique_domains": len(used_domains), "bucket_counts": bucket_counts, "kept": len(picked), "candidates": len(items)}
+    return picked, meta
+
+
+def _candidates(n: int, rng: random.Random) -> List[CollectedItem]:
+    stories: List[str] = []
+    out = []
+    for i in range(n):
+        if stories and rng.random() < 0.15:
+            # 同じ話題の言い換え（語尾だけ違う）
+            base = rng.choice(stories)
+            summary = base + rng.choice(_ENDINGS)
+        else:
+            base = "、".join(rng.sample(_WORDS, 4)) + f"（{i}）"
+            stories.append(base)
+            summary = base + _ENDINGS[0]
+        out.append(CollectedItem(
+            topic_name=f"{base[:2]}の話題{i}"[:15],
+            summary=summary[:100],
+            url=f"https://www.news{rng.randrange(200)}.example.com/a/{i}",
+            agreement_score=rng.randint(-100, 100),
+        ))
+    return out
+
+
+def _best_ms(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return round(best * 1000.0, 2)
+
+
+def _max_similarity(picked: List) -> float:
+    cands = [diversity_pick.Candidate(i, it, "", "", f"{it.topic_name} {it.summary}") for i, it in enumerate(picked)]
+    best = 0.0
+    for i, a in enumerate(cands):
+        for b in cands[i + 1:]:
+            inter = len(a.shingles & b.shingles)
+            best = max(best, inter / (len(a.shingles) + len(b.shingles) - inter))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--targets", default="6,100,1000")
+    parser.add_argument("--seeds", type=int, default=20, help="一致率・類似度を数える入力の数")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    objectives = {"coverage": CoverageObjective(), "mmr": MMRObjective()}
+    out: Dict[str, Any] = {}
+    for n in [int(s) for s in args.sizes.split(",")]:
+        items = _candidates(n, random.Random(n))
+        for target in [int(t) for t in args.targets.split(",")]:
+            if target > n:
+                continue
+            # 旧実装は (選ぶ数) × n log n。30 秒を超えそうなら測らない
+            before = _best_ms(lambda: _legacy_pick(items, target), args.repeat) if target * n <= 20_000_000 else None
+            row: Dict[str, Any] = {"before_ms": before}
+            for name, obj in objectives.items():
+                row[f"{name}_ms"] = _best_ms(lambda: pick_diverse_items(items, target, obj, near_duplicates=False), args.repeat)
+            if before is not None and row["coverage_ms"]:
+                row["speedup"] = round(before / row["coverage_ms"], 1)
+            out[f"n={n} target={target}"] = row
+
+    # 一致率と類似度（選ぶ数は本番と同じ 6）
+    same_picks = same_meta = 0
+    sims = {"legacy": 0.0, "coverage": 0.0, "mmr": 0.0}
+    for seed in range(args.seeds):
+        items = _candidates(300, random.Random(1000 + seed))
+        old, old_meta = _legacy_pick(items, 6)
+        new, new_meta = pick_diverse_items(items, 6, objectives["coverage"], near_duplicates=False)
+        mmr, _ = pick_diverse_items(items, 6, objectives["mmr"], near_duplicates=False)
+        same_picks += [id(x) for x in old] == [id(x) for x in new]
+        same_meta += (old_meta["unique_domains"], old_meta["bucket_counts"]) == (new_meta["unique_domains"], new_meta["bucket_counts"])
+        for name, picked in (("legacy", old), ("coverage", new), ("mmr", mmr)):
+            sims[name] += _max_similarity(picked) / args.seeds
+    out["agreement (n=300, target=6)"] = {
+        "same_picks": round(same_picks / args.seeds, 2),
+        "same_meta": round(same_meta / args.seeds, 2),
+        "max_similarity": {k: round(v, 3) for k, v in sims.items()},
+    }
+    out["settings"] = vars(args)
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
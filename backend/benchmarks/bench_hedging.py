@@ -0,0 +1,121 @@
+"""
+/api/opinions の意見生成：Gemini だけに投げる場合 vs 遅いときに OpenAI へヘッジする場合のテールレイテンシ。
+
+    cd backend
+    python -m benchmarks.bench_hedging [--requests 300] [--concurrency 8] [--hedge-ms 300]
+
+Gemini・OpenAI はどちらもスタブ。返答時間は「通常 base-ms 前後、tail の確率で slow-ms 前後」という裾の重い分布で、
+invalid の確率で使えない出力（JSON でない）を返す。2つのプロバイダーの遅延は独立。
+
+- latency: generate_opinions の呼び出しから結果が返るまで（失敗も含む）
+- empty: 意見が取れず [] が返った件数（API では 500 になる）
+- extra_calls_pct: ヘッジで追加した呼び出しの割合（余分なコスト）
+- hedging: Hedger.stats()（勝ったプロバイダー、ヘッジで短縮できた時間）
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from benchmarks import _util
+
+# app の設定はインポート時に読まれる
+os.environ["GOOGLE_API_KEY"] = os.environ.get("GOOGLE_API_KEY") or "stub"
+os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY") or "sk-stub"
+
+from app import ai_logic
+from app.services import llm_providers, resilience
+from app.utils.logger import logger
+
+_ANSWER = json.dumps(
+    [
+        {"viewpoint": f"立場{i}", "content": f"意見{i}", "source_name": f"媒体{i}", "position_score": s}
+        for i, s in enumerate([80, 40, 0, -40, -80])
+    ],
+    ensure_ascii=False,
+)
+
+
+class _StubProvider(llm_providers.LLMProvider):
+    def __init__(self, name: str, base: float, slow: float, tail: float, invalid: float, seed: int):
+        self.name = name
+        self.base, self.slow, self.tail, self.invalid = base, slow, tail, invalid
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def complete(self, prompt: str, json_output: bool = False) -> str:
+        with self.lock:
+            self.calls += 1
+            slow = self.rng.random() < self.tail
+            bad = self.rng.random() < self.invalid
+            jitter = self.rng.uniform(0.7, 1.3)
+        time.sleep((self.slow if slow else self.base) * jitter)
+        return "申し訳ありません、生成できませんでした。" if bad else _ANSWER
+
+
+async def _scenario(label: str, order, args):
+    providers = {
+        "gemini": _StubProvider("gemini", args.base_ms / 1000, args.slow_ms / 1000, args.tail, args.invalid, 1),
+        "openai": _StubProvider("openai", args.base_ms / 1000 * 1.3, args.slow_ms / 1000, args.tail, args.invalid, 2),
+    }
+    resilience._breakers.clear()
+    hedger = llm_providers.Hedger(providers, order, args.hedge_ms / 1000)
+    ai_logic.opinion_hedger = hedger
+
+    sem = asyncio.Semaphore(args.concurrency)
+    latency, empty = [], 0
+
+    async def one(i: int):
+        nonlocal empty
+        async with sem:
+            t0 = time.perf_counter()
+            opinions = await ai_logic.generate_opinions(f"テーマ{i}")
+            latency.append(time.perf_counter() - t0)
+            empty += not opinions
+
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    # 負けた呼び出しの終了を待って「短縮できた時間」を確定させる
+    while hedger._watchers:
+        await asyncio.sleep(0.05)
+    calls = sum(p.calls for p in providers.values())
+    return {
+        "latency": _util.summarize_ms(latency),
+        "empty": empty,
+        "provider_calls": calls,
+        "extra_calls_pct": round(100.0 * (calls - args.requests) / args.requests, 1),
+        "hedging": hedger.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--base-ms", type=float, default=150.0)
+    parser.add_argument("--slow-ms", type=float, default=1500.0)
+    parser.add_argument("--tail", type=float, default=0.08, help="遅い返答になる確率")
+    parser.add_argument("--invalid", type=float, default=0.03, help="使えない出力を返す確率")
+    parser.add_argument("--hedge-ms", type=float, default=300.0, help="ヘッジを送るまでの待ち時間")
+    args = parser.parse_args()
+
+    logger.setLevel(logging.ERROR)  # 不採用の出力ごとの warning を抑える
+    out = {}
+    # generate_opinions は失敗を print する
+    with contextlib.redirect_stdout(io.StringIO()):
+        for label, order in (("gemini_only", ["gemini"]), ("hedged", ["gemini", "openai"])):
+            out[label] = asyncio.run(_scenario(label, order, args))
+    out["settings"] = vars(args)
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+/api/themes のレイテンシが、50件のチャット（Gemini呼び出し）実行中でも悪化しないことを確認する。
+
+    cd backend
+    python -m benchmarks.bench_llm_gateway [--chats 50] [--llm-latency 1.0]
+
+Gemini はブロッキングで sleep するスタブに差し替え、Supabase も固定データを返す。
+"inline" モードはゲートウェイ導入前（async def 内で同期呼び出し）の挙動を再現する。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import _util
+
+import httpx
+import google.generativeai as genai
+
+import app.api.main as api_main
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StubChat:
+    def __init__(self, latency: float):
+        self._latency = latency
+
+    def send_message(self, message, **kwargs):
+        time.sleep(self._latency)  # 実SDKと同じくスレッドをブロックする
+        return _StubResponse(f"echo: {message}")
+
+
+class _StubModel:
+    latency = 1.0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def start_chat(self, history=None):
+        return _StubChat(self.latency)
+
+
+async def _inline_llm(fn, *args, timeout=None, **kwargs):
+    return fn(*args, **kwargs)
+
+
+async def _measure_themes(client: httpx.AsyncClient, n: int, interval: float):
+    # 予定到着時刻からの遅延で測る（ループが止まっていた時間も含めるため）
+    lat = []
+    base = time.perf_counter()
+    for i in range(n):
+        scheduled = base + i * interval
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        r = await client.get("/api/themes")
+        r.raise_for_status()
+        lat.append(time.perf_counter() - scheduled)
+    return lat
+
+
+async def _run(mode: str, chats: int, samples: int, interval: float):
+    transport = httpx.ASGITransport(app=api_main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        idle = await _measure_themes(client, samples, interval)
+
+        body = {"message": "こんにちは", "history": []}
+
+        async def fire_chats():
+            # 計測期間中にチャットが順次到着する状況を作る
+            tasks = []
+            for _ in range(chats):
+                tasks.append(asyncio.create_task(client.post("/simple-chat", json=body)))
+                await asyncio.sleep(interval)
+            return await asyncio.gather(*tasks)
+
+        t0 = time.perf_counter()
+        chat_driver = asyncio.create_task(fire_chats())
+        loaded = await _measure_themes(client, samples, interval)
+        await chat_driver
+        chat_wall = time.perf_counter() - t0
+
+    return {
+        "mode": mode,
+        "themes_idle": _util.summarize_ms(idle),
+        "themes_under_load": _util.summarize_ms(loaded),
+        "chat_wall_s": round(chat_wall, 2),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chats", type=int, default=50)
+    ap.add_argument("--samples", type=int, default=100)
+    ap.add_argument("--interval", type=float, default=0.01)
+    ap.add_argument("--llm-latency", type=float, default=1.0)
+    ap.add_argument("--skip-inline", action="store_true", help="ゲートウェイなしの比較を省略する")
+    args = ap.parse_args()
+
+    _StubModel.latency = args.llm_latency
+    genai.GenerativeModel = _StubModel
+    api_main.list_themes_with_opinions = lambda: {"themes": [{"id": "t1", "title": "bench", "color": "#FFFFFF", "opinions": []}]}
+
+    results = [asyncio.run(_run("gateway", args.chats, args.samples, args.interval))]
+
+    if not args.skip_inline:
+        gateway_run_llm = api_main.run_llm
+        api_main.run_llm = _inline_llm
+        try:
+            # チャット1件ごとにループ全体が latency 秒止まるので件数を絞る
+            results.append(asyncio.run(_run("inline", min(args.chats, 5), 20, args.interval)))
+        finally:
+            api_main.run_llm = gateway_run_llm
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
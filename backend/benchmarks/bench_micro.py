@@ -0,0 +1,302 @@
+"""
+リクエスト経路上の純粋関数のマイクロベンチマーク（合成データ、サイズ 10 / 1k / 100k）とベースライン比較。
+
+    cd backend
+    python -m benchmarks.bench_micro                       # 計測して表示
+    python -m benchmarks.bench_micro --save                # benchmarks/baselines/micro.json に保存
+    python -m benchmarks.bench_micro --compare             # 保存したベースラインと比較（遅くなったら終了コード 1）
+    python -m benchmarks.bench_micro --only pick_diverse_items --sizes 10,1000
+
+- 値は1回の呼び出しにかかる時間（GC を止めて複数回繰り返した中の最小値。最小値は他プロセスの割り込みの影響を受けにくい）
+- スカラー関数（opinion_color_from_score、_build_prompt、get_chat_instruction）は「サイズ = 連続で呼ぶ回数」
+- --tolerance（既定 0.3）より遅くなったケースを regression、速くなったケースを improvement とする
+  （regression になったケースは一度測り直し、それでも遅いときだけ報告する）
+- マシン自体の速さの揺れ（CPU の割り当て・クロック）を打ち消すため、各ケースと交互に固定の計算（calibration）を測り、
+  比較は「calibration 何回分か」（relative）の比で行う（--no-normalize なら秒の比）
+- ベースラインは計測したマシンに依存する。別のマシンでは先に --save してから変更前後を比べること
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks import _util  # noqa: F401  (Supabase の宛先をダミーにする)
+
+from app.services.diversity_pick import pick_diverse_items
+from app.services.openai_data_collect_service import THEME_PROFILES, CollectedItem, CollectedItems, _build_prompt
+from app.services.theme_store_service import group_opinions_by_theme
+from app.services.themes_builder import build_theme_rows, dedupe_opinions_by_content, opinion_color_from_score
+
+DEFAULT_SIZES = (10, 1000, 100000)
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "micro.json")
+
+_WORDS = ["安全", "財源", "環境", "地域", "教育", "雇用", "外交", "医療", "交通", "住宅", "農業", "観光"]
+
+
+def _text(rng: random.Random, n_words: int) -> str:
+    return "、".join(rng.choice(_WORDS) for _ in range(n_words)) + "について議論がある。"
+
+
+def _card_dicts(n: int, rng: random.Random) -> List[Dict[str, Any]]:
+    # 1割は同じ内容（空白違い）の重複、ドメインは最大 50 種類
+    out = []
+    for i in range(n):
+        if out and rng.random() < 0.1:
+            dup = dict(rng.choice(out))
+            dup["summary"] = " " + dup["summary"].replace("、", "、 ")
+            out.append(dup)
+            continue
+        out.append({
+            "topic_name": f"{rng.choice(_WORDS)}{i}"[:15],
+            "summary": _text(rng, 6)[:100],
+            "url": f"https://www.news{rng.randrange(min(n, 50))}.example.com/a/{i}",
+            "agreement_score": rng.randint(-100, 100),
+        })
+    return out
+
+
+def _opinion_rows(n: int, rng: random.Random, n_themes: int) -> List[Dict[str, Any]]:
+    rows = []
+    for i in range(n):
+        if rows and rng.random() < 0.1:
+            dup = dict(rng.choice(rows))
+            dup["id"] = f"op_{i}"
+            dup["body"] = dup["body"] + "  "
+            rows.append(dup)
+            continue
+        score = rng.randint(-100, 100)
+        rows.append({
+            "id": f"op_{i}",
+            "theme_id": f"theme_{rng.randrange(n_themes)}",
+            "title": f"{rng.choice(_WORDS)}{i}",
+            "body": _text(rng, 8),
+            "score": score,
+            "color": opinion_color_from_score(score),
+            "source_url": f"https://news{i % 50}.example.com/{i}",
+        })
+    return rows
+
+
+def _get_chat_instruction() -> Callable[..., str]:
+    # /simple-chat が使う版（app.api.main）
+    from app.api.main import get_chat_instruction
+
+    return get_chat_instruction
+
+
+# name -> (setup(n, rng) -> args, fn(*args))
+def _cases() -> Dict[str, Tuple[Callable[[int, random.Random], tuple], Callable[..., Any]]]:
+    def scores(n, rng):
+        return ([rng.randint(-100, 100) for _ in range(n)],)
+
+    def topics(n, rng):
+        known = list(THEME_PROFILES)
+        return ([known[i % len(known)] if i % 2 else f"トピック{i}" for i in range(n)],)
+
+    def chat_args(n, rng):
+        return ([(f"トピック{i}", "賛成", _text(rng, 4), i % 10 + 1) for i in range(n)], _get_chat_instruction())
+
+    return {
+        "pick_diverse_items": (
+            lambda n, rng: ([CollectedItem(**d) for d in _card_dicts(n, rng)],),
+            lambda items: pick_diverse_items(items, target_n=6),
+        ),
+        "dedupe_opinions_by_content": (
+            lambda n, rng: ([{"title": r["title"], "body": r["body"]} for r in _opinion_rows(n, rng, 1)],),
+            dedupe_opinions_by_content,
+        ),
+        "opinion_color_from_score": (
+            scores,
+            lambda xs: [opinion_color_from_score(s) for s in xs],
+        ),
+        "build_theme_rows": (
+            lambda n, rng: (CollectedItems(items=[CollectedItem(**d) for d in _card_dicts(n, rng)]),),
+            lambda collected: build_theme_rows("ベンチマーク", collected),
+        ),
+        "_build_prompt": (
+            topics,
+            lambda ts: [_build_prompt(t, 8, None, min_sources=4, max_per_url=2) for t in ts],
+        ),
+        "get_chat_instruction": (
+            chat_args,
+            lambda calls, fn: [fn(*c) for c in calls],
+        ),
+        "group_opinions_by_theme": (
+            lambda n, rng: (
+                [{"id": f"theme_{i}", "title": f"テーマ{i}", "color": "#81C784"} for i in range(max(1, n // 6))],
+                _opinion_rows(n, rng, max(1, n // 6)),
+            ),
+            group_opinions_by_theme,
+        ),
+    }
+
+
+def _loops(fn: Callable[..., Any], args: tuple, min_time: float) -> int:
+    t0 = time.perf_counter()
+    fn(*args)
+    return max(1, int(min_time / max(time.perf_counter() - t0, 1e-9)))
+
+
+def _calibration_workload() -> int:
+    # 文字列整形・dict・整数演算を混ぜた固定の計算（対象の関数と同じ種類の処理）
+    acc, d = 0, {}
+    for i in range(2000):
+        key = f"k{i % 97}"
+        d[key] = d.get(key, 0) + i
+        acc += len(key) * (i & 7)
+    return acc + len(d)
+
+
+def _time(fn: Callable[..., Any], args: tuple, repeat: int, min_time: float) -> Tuple[float, float]:
+    """
+    (1回あたりの秒数, 同じ時間帯の calibration 1回あたりの秒数)。
+    ループ回数は1試行が min_time 以上になるよう決め、calibration と交互に repeat 回測ってそれぞれの最小値を取る
+    """
+    # timeit と同じく GC は止める（前のケースが残したオブジェクト数で結果が揺れないように）
+    gc.collect()
+    gc.disable()
+    try:
+        loops = _loops(fn, args, min_time)
+        calib_loops = _loops(_calibration_workload, (), min_time / 4)
+        best, calib = float("inf"), float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for _ in range(calib_loops):
+                _calibration_workload()
+            calib = min(calib, (time.perf_counter() - t0) / calib_loops)
+            t0 = time.perf_counter()
+            for _ in range(loops):
+                fn(*args)
+            best = min(best, (time.perf_counter() - t0) / loops)
+    finally:
+        gc.enable()
+    return best, calib
+
+
+def run(
+    only: List[str], sizes: List[int], repeat: int, min_time: float, keys: Optional[List[str]] = None
+) -> Dict[str, Dict[str, float]]:
+    """{"case[size]": {"seconds": 1回の秒数, "relative": calibration 何回分か}}"""
+    results = {}
+    for name, (setup, fn) in _cases().items():
+        if only and name not in only:
+            continue
+        for n in sizes:
+            if keys is not None and f"{name}[{n}]" not in keys:
+                continue
+            args = setup(n, random.Random(f"{name}:{n}"))
+            seconds, calib = _time(fn, args, repeat, min_time)
+            results[f"{name}[{n}]"] = {"seconds": seconds, "relative": seconds / calib}
+            print(f"{name}[{n}]: {_fmt(seconds)}", file=sys.stderr)
+    return results
+
+
+def _fmt(seconds: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def _environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], tolerance: float, normalize: bool = True
+) -> Dict[str, Any]:
+    metric = "relative" if normalize else "seconds"
+    rows, regressions, improvements = {}, [], []
+    for key, now in results.items():
+        before = baseline["results"].get(key)
+        if before is None:
+            rows[key] = {"now": _fmt(now["seconds"]), "baseline": None, "status": "new"}
+            continue
+        ratio = now[metric] / before[metric]
+        status = "regression" if ratio > 1 + tolerance else "improvement" if ratio < 1 / (1 + tolerance) else "ok"
+        rows[key] = {
+            "now": _fmt(now["seconds"]),
+            "baseline": _fmt(before["seconds"]),
+            "raw_ratio": round(now["seconds"] / before["seconds"], 3),
+            "ratio": round(ratio, 3),
+            "status": status,
+        }
+        if status == "regression":
+            regressions.append(key)
+        elif status == "improvement":
+            improvements.append(key)
+    return {"metric": metric, "cases": rows, "regressions": regressions, "improvements": improvements}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    parser.add_argument("--only", default="", help="カンマ区切りのケース名")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1, help="1試行の最低秒数")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="結果をベースラインとして保存する")
+    parser.add_argument("--compare", action="store_true", help="ベースラインと比較する")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--no-normalize", action="store_true", help="calibration で補正しない")
+    args = parser.parse_args()
+
+    only = [s for s in args.only.split(",") if s]
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = run(only, sizes, args.repeat, args.min_time)
+    out: Dict[str, Any] = {"environment": _environment(), "results": results}
+
+    code = 0
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        out["baseline_environment"] = baseline.get("environment")
+        out["comparison"] = compare(results, baseline, args.tolerance, normalize=not args.no_normalize)
+        flagged = out["comparison"]["regressions"]
+        if flagged:
+            # 一度だけの揺れで落とさないよう、遅くなったケースは測り直して速い方を採る
+            print(f"re-measuring {len(flagged)} regressed case(s)", file=sys.stderr)
+            again = run(only, sizes, args.repeat, args.min_time, keys=flagged)
+            for key, r in again.items():
+                if r["relative"] < results[key]["relative"]:
+                    results[key] = r
+            out["comparison"] = compare(results, baseline, args.tolerance, normalize=not args.no_normalize)
+        code = 1 if out["comparison"]["regressions"] else 0
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        saved = {"results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                saved = json.load(f)
+        # 一部のケースだけ計測したときは、そのケースだけ置き換える
+        saved["environment"] = out["environment"]
+        saved["results"].update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(saved, f, indent=2, ensure_ascii=False, sort_keys=True)
+            f.write("\n")
+
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
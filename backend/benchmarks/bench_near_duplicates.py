@@ -0,0 +1,203 @@
+"""
+言い換え（near-duplicate）の意見の検出：完全一致の重複除去 vs MinHash/LSH（文字 n-gram）。
+
+    cd backend
+    python -m benchmarks.bench_near_duplicates [--sizes 1000,10000,100000] [--per-theme 20] [--dup-rate 0.3]
+
+意見は合成データ（3,000語の漢字語と助詞・語尾からなる2文）。--dup-rate の割合で、既存の意見を言い換えたもの
+（語の置き換え・文の入れ替え・語尾の変更・「（共同）」などの付け足しを 1〜3 個）を同じテーマに混ぜる。
+--across-rate の割合は、言い回し違いで再シードした別テーマに入れる。
+
+- precision / recall: 「重複」と判定した意見のうち本当に言い換えだった割合 / 言い換えのうち見つけた割合
+- us_per_opinion: 意見1件あたりの検出時間。件数が増えてもほぼ一定なら、1件の照合がインデックスの大きさによらない（sub-linear）
+- brute_pairs / brute_ms: 全ペアを比べる場合のペア数と、正確な Jaccard を全ペアで計算した時間（--brute-max 件まで。それより多いと null）
+- inline: build_theme_rows の中で呼ぶ dedupe_opinions_by_content 1回（意見 --inline-items 件）の時間と残った件数（near-duplicate の除去あり / なし）
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks import _util  # noqa: F401  (Supabase の宛先をダミーにする)
+
+from app.config import NEAR_DUP_NGRAM, NEAR_DUP_THRESHOLD
+from app.services.near_duplicates import find_near_duplicates, normalize
+from app.services.opinion_dedupe import find_duplicate_opinions
+from app.services.themes_builder import dedupe_opinions_by_content
+
+_PARTICLES = ["は", "が", "を", "に", "で", "と", "の", "から", "について、", "によると、"]
+_ENDINGS = ["と主張している。", "を問題視している。", "が必要だという。", "に懸念を示した。", "を評価している。", "と指摘した。"]
+
+
+def _vocabulary(rng: random.Random, size: int = 3000) -> List[str]:
+    # 2〜3文字の漢字語（実在の語ではないが、文字の出現のしかたは日本語の文に近い）
+    return ["".join(chr(rng.randrange(0x4E00, 0x9FA0)) for _ in range(rng.choice((2, 2, 3)))) for _ in range(size)]
+
+
+def _sentence(rng: random.Random, words: List[str]) -> str:
+    parts = []
+    for _ in range(rng.randint(3, 5)):
+        parts.append(rng.choice(words) + rng.choice(_PARTICLES))
+    return "".join(parts) + rng.choice(words) + rng.choice(_ENDINGS)
+
+
+def _opinion(rng: random.Random, words: List[str], theme: str) -> Tuple[str, str]:
+    title = rng.choice(words) + "の" + rng.choice(words)
+    body = theme + "について、" + "".join(_sentence(rng, words) for _ in range(2))
+    return title, body
+
+
+def _paraphrase(rng: random.Random, body: str, words: List[str]) -> str:
+    # 言い換え：語の置き換え・文の入れ替え・語尾の変更・前置き / 出典の付け足しを 1〜3 個
+    for op in rng.sample(["synonym", "swap", "ending", "suffix", "prefix"], rng.randint(1, 3)):
+        if op == "synonym":
+            for _ in range(2):
+                start = rng.randrange(max(1, len(body) - 2))
+                body = body[:start] + rng.choice(words) + body[start + 2:]
+        elif op == "swap" and body.count("。") >= 2:
+            first, rest = body.split("。", 1)
+            body = rest + first + "。"
+        elif op == "ending":
+            body = body.replace("。", "という。", 1)
+        elif op == "suffix":
+            body += rng.choice(["（共同）", "（時事）", "と報じられた。"])
+        elif op == "prefix":
+            body = rng.choice(["一方で、", "なお、", "これに関連し、"]) + body
+    return body
+
+
+def _corpus(n: int, per_theme: int, dup_rate: float, across_rate: float, seed: int) -> List[Dict[str, Any]]:
+    """opinions rows; `source` = id of the original (the same for an original and its paraphrases)."""
+    rng = random.Random(seed)
+    words = _vocabulary(rng)
+    rows: List[Dict[str, Any]] = []
+    n_themes = max(1, n // per_theme)
+    themes = [rng.choice(words) + rng.choice(words) for _ in range(n_themes)]
+    for i in range(n):
+        t = rng.randrange(n_themes)
+        if rows and rng.random() < dup_rate:
+            orig = rng.choice(rows)
+            theme_id = orig["theme_id"]
+            if rng.random() < across_rate:
+                theme_id = f"{theme_id}_reseed"  # the same topic seeded again under other wording
+            rows.append({
+                "id": f"op_{i}", "theme_id": theme_id, "title": orig["title"], "body": _paraphrase(rng, orig["body"], words),
+                "created_at": f"2026-01-01T00:00:{i:09d}", "source": orig["source"],
+            })
+        else:
+            title, body = _opinion(rng, words, themes[t])
+            rows.append({
+                "id": f"op_{i}", "theme_id": f"theme_{t}", "title": title, "body": body,
+                "created_at": f"2026-01-01T00:00:{i:09d}", "source": f"op_{i}",
+            })
+    return rows
+
+
+def _score(rows: List[Dict[str, Any]], removed: Dict[str, str], across_themes: bool) -> Dict[str, Any]:
+    by_id = {r["id"]: r for r in rows}
+    # what a perfect detector would remove: every row after the first of its source (per theme unless across)
+    first: Dict[Tuple[str, Optional[str]], str] = {}
+    expected = set()
+    for r in sorted(rows, key=lambda r: (r["created_at"], r["id"])):
+        key = (r["source"], None if across_themes else r["theme_id"])
+        if key in first:
+            expected.add(r["id"])
+        else:
+            first[key] = r["id"]
+    correct = sum(1 for i, kept in removed.items() if by_id[i]["source"] == by_id[kept]["source"])
+    return {
+        "removed": len(removed),
+        "expected": len(expected),
+        "precision": round(correct / len(removed), 3) if removed else 1.0,
+        "recall": round(len(expected & set(removed)) / len(expected), 3) if expected else 1.0,
+    }
+
+
+def _brute_ms(rows: List[Dict[str, Any]]) -> float:
+    n = NEAR_DUP_NGRAM
+    sets = []
+    for r in rows:
+        s = normalize(f"{r['title']}\n{r['body']}")
+        sets.append({s[i:i + n] for i in range(max(1, len(s) - n + 1))})
+    t0 = time.perf_counter()
+    for i, a in enumerate(sets):
+        for b in sets[i + 1:]:
+            inter = len(a & b)
+            _ = inter / (len(a) + len(b) - inter)
+    return round((time.perf_counter() - t0) * 1000.0, 1)
+
+
+def _inline(items: int, repeat: int) -> Dict[str, float]:
+    # build_theme_rows が保存する前の、1テーマ分の意見（3割は直前の意見の言い換え）
+    rng = random.Random(0)
+    words = _vocabulary(rng)
+    rows: List[Dict[str, Any]] = []
+    for i in range(items):
+        title, body = _opinion(rng, words, "熊の駆除")
+        if rows and rng.random() < 0.3:
+            title, body = rows[-1]["title"], _paraphrase(rng, rows[-1]["body"], words)
+        rows.append({"title": title, "body": body})
+    out = {}
+    for label, near in (("exact_only_ms", False), ("near_duplicates_ms", True)):
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            dedupe_opinions_by_content(rows, near_duplicates=near)
+            best = min(best, time.perf_counter() - t0)
+        out[label] = round(best * 1000.0, 3)
+    out["kept_exact_only"] = len(dedupe_opinions_by_content(rows, near_duplicates=False))
+    out["kept_near_duplicates"] = len(dedupe_opinions_by_content(rows))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--per-theme", type=int, default=20, help="テーマあたりの意見数（平均）")
+    parser.add_argument("--dup-rate", type=float, default=0.3)
+    parser.add_argument("--across-rate", type=float, default=0.2, help="言い換えのうち別テーマ（再シード）に入る割合")
+    parser.add_argument("--threshold", type=float, default=NEAR_DUP_THRESHOLD)
+    parser.add_argument("--brute-max", type=int, default=3000)
+    parser.add_argument("--inline-items", type=int, default=12)
+    args = parser.parse_args()
+
+    find_near_duplicates(["ウォームアップ"])  # hash functions / LSH parameters are built once per process
+    out: Dict[str, Any] = {}
+    for n in [int(s) for s in args.sizes.split(",")]:
+        rows = _corpus(n, args.per_theme, args.dup_rate, args.across_rate, seed=n)
+        row: Dict[str, Any] = {}
+
+        # before: exact match after whitespace normalisation (per theme)
+        exact: Dict[str, str] = {}
+        seen: Dict[Tuple[str, str, str], str] = {}
+        for r in sorted(rows, key=lambda r: (r["created_at"], r["id"])):
+            key = (r["theme_id"], " ".join(r["title"].split()), " ".join(r["body"].split()))
+            if key in seen:
+                exact[r["id"]] = seen[key]
+            else:
+                seen[key] = r["id"]
+        row["exact"] = _score(rows, exact, across_themes=False)
+
+        for label, across in (("per_theme", False), ("across_themes", True)):
+            t0 = time.perf_counter()
+            dups = find_duplicate_opinions(rows, args.threshold, across_themes=across)
+            seconds = time.perf_counter() - t0
+            row[label] = {
+                **_score(rows, {d["id"]: d["duplicate_of"] for d in dups}, across),
+                "ms": round(seconds * 1000.0, 1),
+                "us_per_opinion": round(seconds * 1e6 / n, 1),
+            }
+        row["brute_pairs"] = n * (n - 1) // 2
+        row["brute_ms"] = _brute_ms(rows) if n <= args.brute_max else None
+        out[f"n={n}"] = row
+
+    out["inline (dedupe_opinions_by_content)"] = _inline(args.inline_items, repeat=50)
+    out["settings"] = vars(args)
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
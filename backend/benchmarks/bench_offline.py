@@ -0,0 +1,96 @@
+"""
+ネットワーク無しの負荷試験：FAKE_PROVIDERS=all（Gemini / OpenAI / Supabase をプロセス内のフェイクに置き換え）で
+/api/themes・/api/opinions・/simple-chat・/api/admin/seed-theme を並行に叩き、エンドポイントごとのレイテンシと req/s を出す。
+
+    cd backend
+    python -m benchmarks.bench_offline [--requests 200] [--concurrency 16] [--themes 500]
+    FAKE_LATENCY="gemini=lognormal:800:0.6" FAKE_ERROR_RATES="openai=0.1" python -m benchmarks.bench_offline
+
+- フェイクの遅延・エラー率は FAKE_LATENCY / FAKE_ERROR_RATES で変えられる（未指定ならこのスクリプトの既定値）
+- --themes: フェイク DB に事前に入れておくテーマ数（/api/themes の応答サイズが決まる）
+- 応答の中身は決定的（同じ入力なら同じ結果）なので、実行ごとの差はレイテンシだけになる
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+
+def _configure(args) -> None:
+    # app の設定はインポート時に読まれる
+    os.environ["FAKE_PROVIDERS"] = "all"
+    os.environ["FAKE_SUPABASE_THEMES"] = str(args.themes)
+    os.environ.setdefault("FAKE_LATENCY", "gemini=lognormal:300:0.4,openai=lognormal:1500:0.5,supabase=lognormal:10:0.3")
+    os.environ.setdefault("PROVIDER_RATE_LIMITS", "")
+
+
+async def _run(args):
+    from benchmarks import _util
+
+    import httpx
+
+    import app.api.main as api_main
+    import app.main as admin_main
+    from app.core.clients import client_stats
+    from app.core.lifespan import lifespan
+
+    out = {}
+    async with lifespan(api_main.app):
+        api = httpx.AsyncClient(transport=httpx.ASGITransport(app=api_main.app), base_url="http://bench", timeout=None)
+        admin = httpx.AsyncClient(transport=httpx.ASGITransport(app=admin_main.app), base_url="http://bench", timeout=None)
+        scenarios = {
+            "GET /api/themes": lambda i: api.get("/api/themes"),
+            "POST /api/opinions": lambda i: api.post("/api/opinions", json={"topic": f"テーマ{i}"}),
+            "POST /simple-chat": lambda i: api.post(
+                "/simple-chat", json={"topic": "熊の駆除", "viewpoint": "賛成", "message": f"{i}: どう思いますか"}
+            ),
+            "POST /api/admin/seed-theme": lambda i: admin.post("/api/admin/seed-theme", json={"topic": f"シード{i}"}),
+        }
+        async with api, admin:
+            for name, call in scenarios.items():
+                sem = asyncio.Semaphore(args.concurrency)
+                latency, statuses = [], {}
+
+                async def one(i: int):
+                    async with sem:
+                        t0 = time.perf_counter()
+                        r = await call(i)
+                        latency.append(time.perf_counter() - t0)
+                        statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+                t0 = time.perf_counter()
+                await asyncio.gather(*(one(i) for i in range(args.requests)))
+                wall = time.perf_counter() - t0
+                out[name] = {
+                    **_util.summarize_ms(latency),
+                    "req_per_s": round(args.requests / wall, 1),
+                    "status": statuses,
+                }
+        out["fakes"] = client_stats().get("fakes")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--themes", type=int, default=500)
+    args = parser.parse_args()
+    _configure(args)
+
+    # シードやキャッシュのログは結果の JSON に混ぜない
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = asyncio.run(_run(args))
+    out["settings"] = {**vars(args), "FAKE_LATENCY": os.environ["FAKE_LATENCY"], "FAKE_ERROR_RATES": os.environ.get("FAKE_ERROR_RATES", "")}
+    json.dump(out, sys.stdout, indent=2, ensure_ascii=False)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+OpenAI 障害時の collect_topic_cards：旧（ワーカースレッドで time.sleep しながら3回リトライ）vs 新（非同期の指数バックオフ＋ジッター、サーキットブレーカー）。
+
+    cd backend
+    python -m benchmarks.bench_resilience [--requests 40] [--outage 4] [--call-ms 200]
+
+OpenAI はスタブ。開始から --outage 秒の間は 503 を返し、その後は正常に返す。リクエストは 2×outage 秒の間に均等に到着する。
+
+- provider_calls_during_outage: 障害中に OpenAI へ送った呼び出し数（少ないほど相手を叩かない）
+- thread_seconds: LLM ゲートウェイのスレッドを占有した合計秒数（sleep 中も含む）
+- failed_ms: 失敗したリクエストが失敗を返すまでの時間
+- recovered_after_ms: 障害の終了から、最初に成功が返るまで
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import threading
+import time
+
+from benchmarks import _util
+
+# app の設定はインポート時に読まれる
+os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY") or "sk-stub"
+os.environ["PROVIDER_RATE_LIMITS"] = ""
+
+import app.services.openai_data_collect_service as collect
+from app.services import resilience
+from app.services.llm_gateway import run_llm
+
+_CARDS = {
+    "items": [
+        {"topic_name": f"論点{i}", "summary": f"要約{i}", "url": f"https://news{i}.example.com/a", "agreement_score": s}
+        for i, s in enumerate([80, 40, 10, -10, -40, -80])
+    ]
+}
+
+
+class _Unavailable(Exception):
+    status_code = 503
+
+
+class _Provider:
+    def __init__(self, outage: float, call_seconds: float):
+        self.outage = outage
+        self.call_seconds = call_seconds
+        self.started = time.monotonic()
+        self.calls_during_outage = 0
+        self.thread_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        time.sleep(self.call_seconds)
+        if time.monotonic() - self.started < self.outage:
+            with self._lock:
+                self.calls_during_outage += 1
+            raise _Unavailable("503 Service Unavailable")
+        return type("Resp", (), {"output_text": json.dumps(_CARDS)})()
+
+
+def _legacy_collect(provider: _Provider, prompt: str):
+    """The loop collect_topic_cards used before: retry three times, time.sleep in the worker thread."""
+    t0 = time.monotonic()
+    try:
+        last_err = None
+        for attempt in range(1, 4):
+            try:
+                resp = provider.create(input=prompt)
+                return collect.CollectedItems(**json.loads(resp.output_text))
+            except Exception as e:
+                last_err = e
+            time.sleep(0.6 * attempt)
+        raise RuntimeError(f"AI collection failed after retries: {last_err}")
+    finally:
+        with provider._lock:
+            provider.thread_seconds += time.monotonic() - t0
+
+
+async def _scenario(label: str, requests: int, outage: float, call_seconds: float, breaker_reset: float):
+    provider = _Provider(outage, call_seconds)
+    client = type("Client", (), {"responses": provider})()
+
+    if label == "legacy":
+        async def one():
+            return await run_llm(_legacy_collect, provider, "prompt", timeout=300)
+    else:
+        collect.openai_client = lambda: client
+        resilience._breakers.clear()
+        resilience.provider_breaker("openai").reset_timeout = breaker_reset
+        original = collect._request_topic_cards
+
+        def timed(client, prompt):
+            t0 = time.monotonic()
+            try:
+                return original(client, prompt)
+            finally:
+                with provider._lock:
+                    provider.thread_seconds += time.monotonic() - t0
+
+        collect._request_topic_cards = timed
+
+        async def one():
+            return await collect.collect_topic_cards("ベンチマーク")
+
+    failed, succeeded_at = [], []
+
+    async def request(delay: float):
+        await asyncio.sleep(delay)
+        t0 = time.monotonic()
+        try:
+            await one()
+            succeeded_at.append(time.monotonic() - provider.started)
+        except Exception:
+            failed.append(time.monotonic() - t0)
+
+    span = 2 * outage
+    await asyncio.gather(*(request(span * i / requests) for i in range(requests)))
+    if label != "legacy":
+        collect._request_topic_cards = original
+    return {
+        "succeeded": len(succeeded_at),
+        "failed": len(failed),
+        "provider_calls_during_outage": provider.calls_during_outage,
+        "thread_seconds": round(provider.thread_seconds, 2),
+        "failed_ms": _util.summarize_ms(failed),
+        "recovered_after_ms": round((min(succeeded_at) - outage) * 1000, 1) if succeeded_at else None,
+        "breaker": resilience.breaker_stats().get("openai"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--outage", type=float, default=4.0)
+    parser.add_argument("--call-ms", type=float, default=200.0)
+    parser.add_argument("--breaker-reset", type=float, default=1.0, help="ブレーカーが再試行を許すまでの秒数")
+    args = parser.parse_args()
+
+    out = {}
+    # collect_topic_cards は成功のたびに [diversity_pick] を print する
+    with contextlib.redirect_stdout(io.StringIO()):
+        for label in ("legacy", "retry_and_breaker"):
+            out[label] = asyncio.run(
+                _scenario(label, args.requests, args.outage, args.call_ms / 1000.0, args.breaker_reset)
+            )
+    out["settings"] = {
+        "retry": vars(resilience.default_retry_policy),
+        "breaker_threshold": resilience.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        "breaker_reset_seconds": args.breaker_reset,
+    }
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+「全員の中で自分はどこか」を求めるコスト（全ユーザー走査 vs テーマごとの分布）。
+
+    cd backend
+    python -m benchmarks.bench_stance_distribution [--users 10000 100000 1000000]
+
+scan は user_stances_db 相当の dict を毎回なめてパーセンタイルを出す方法。
+sketch は ThemeDistribution（ヒストグラム＋Fenwick木）で、投票時の差分更新とリクエスト時の参照を測る。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+
+from benchmarks import _util  # noqa: F401  (ダミー環境変数)
+
+from app.config import STANCE_HIST_BINS, STANCE_SKETCH_RESOLUTION
+from app.services.stance_distribution import ThemeDistribution
+
+
+def _per_call_us(fn, args_list) -> float:
+    t0 = time.perf_counter()
+    for a in args_list:
+        fn(*a)
+    return (time.perf_counter() - t0) / len(args_list) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    for n in args.users:
+        stances = {f"user{i}": {"theme": rng.gauss(0, 35)} for i in range(n)}
+        dist = ThemeDistribution(STANCE_HIST_BINS, STANCE_SKETCH_RESOLUTION)
+        # the distribution is keyed by interned user numbers (user_store.users)
+        numbers = {user_id: i for i, user_id in enumerate(stances)}
+        for user_id, s in stances.items():
+            dist.set(numbers[user_id], s["theme"])
+
+        def scan(user_id):
+            mine = stances[user_id]["theme"]
+            below = sum(1 for s in stances.values() if "theme" in s and s["theme"] < mine)
+            return below / len(stances) * 100.0
+
+        def sketch(user_id):
+            return dist.percentile(stances[user_id]["theme"]), dist.histogram()
+
+        def vote(user_id, delta):
+            old = stances[user_id]["theme"]
+            stances[user_id]["theme"] = old + delta
+            dist.set(numbers[user_id], old + delta)
+
+        users = [(f"user{rng.randrange(n)}",) for _ in range(args.queries)]
+        scan_queries = users[: max(5, min(len(users), 2_000_000 // n))]
+        max_err = max(abs(scan(*u) - sketch(*u)[0]) for u in scan_queries[:5])
+        print(json.dumps({
+            "users": n,
+            "scan_us": round(_per_call_us(scan, scan_queries), 1),
+            "sketch_query_us": round(_per_call_us(sketch, users), 1),
+            "sketch_update_us": round(_per_call_us(vote, [(u, rng.uniform(-10, 10)) for (u,) in users]), 2),
+            "max_percentile_error": round(max_err, 2),
+        }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
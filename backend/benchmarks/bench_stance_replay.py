@@ -0,0 +1,106 @@
+"""
+投票ログからの立場スコア再計算（app.services.stance_replay）の速度と正しさ。
+
+    cd backend
+    python -m benchmarks.bench_stance_replay [--votes 5000000] [--users 200000]
+
+合成ログを NumPy で再計算し、/api/vote と同じ 1票ずつの Python ループ（formula.apply）の結果と一致するか確認する。
+linear は加算型（bincount 1回。-100〜100 を超えてクリップが効いた (user, theme) だけ票順に計算し直す）、attraction は票の順番に依存するので rank ごとのベクトル演算になる。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+import uuid
+
+from benchmarks import _util  # noqa: F401  (ダミー環境変数)
+
+import numpy as np
+
+from app.services.stance_formula import clamp_stance, get_formula
+from app.services.stance_replay import build_vote_log, replay
+
+
+def _synthetic(votes: int, users: int, opinions: int, themes: int, seed: int = 1):
+    rng = random.Random(seed)
+    user_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(users)]
+    theme_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(themes)]
+    opinion_map = {
+        f"op-{i}": (theme_ids[rng.randrange(themes)], float(rng.randint(-100, 100)))
+        for i in range(opinions)
+    }
+    opinion_ids = list(opinion_map)
+    # 人気のあるユーザー・意見に偏らせる（hot な (user, theme) ほど票が多い）
+    u = np.minimum((np.random.default_rng(seed).pareto(1.2, votes) * users / 20).astype(np.int64), users - 1)
+    o = np.random.default_rng(seed + 1).integers(0, opinions, votes)
+    t = np.random.default_rng(seed + 2).random(votes)
+    log_users = [user_ids[i] for i in u.tolist()]
+    log_opinions = [opinion_ids[i] for i in o.tolist()]
+    log_types = ["agree" if x < 0.6 else ("oppose" if x < 0.98 else "neutral") for x in t.tolist()]
+    return log_users, log_opinions, log_types, opinion_map
+
+
+def _reference(log_users, log_opinions, log_types, opinion_map, formula, limit_users):
+    # /api/vote と同じ逐次処理（対象ユーザーを絞って計算）
+    stances, voted = {}, set()
+    for user_id, opinion_id, vote_type in zip(log_users, log_opinions, log_types):
+        if user_id not in limit_users or vote_type not in ("agree", "oppose"):
+            continue
+        if (user_id, opinion_id) in voted:
+            continue
+        voted.add((user_id, opinion_id))
+        theme_id, score = opinion_map[opinion_id]
+        key = (user_id, theme_id)
+        stances[key] = clamp_stance(formula.apply(stances.get(key, 0.0), score, vote_type))
+    return stances
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--votes", type=int, default=5_000_000)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--opinions", type=int, default=5000)
+    parser.add_argument("--themes", type=int, default=100)
+    parser.add_argument("--check-users", type=int, default=2000)
+    parser.add_argument("--baseline", action="store_true", help="全件を1票ずつのPythonループでも計算して時間を比べる")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    log_users, log_opinions, log_types, opinion_map = _synthetic(args.votes, args.users, args.opinions, args.themes)
+    gen_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    log = build_vote_log(log_users, log_opinions, log_types, opinion_map)
+    build_s = time.perf_counter() - t0
+    print(json.dumps({"votes": args.votes, "kept": len(log), "dropped": log.dropped,
+                      "generate_s": round(gen_s, 2), "build_log_s": round(build_s, 2)}))
+
+    check = set(random.Random(3).sample(sorted(set(log_users)), min(args.check_users, len(set(log_users)))))
+    for name in ("linear", "attraction"):
+        formula = get_formula(name)
+        result = replay(log, formula)
+        got = {(u, t): s for u, t, s in result.rows() if u in check}
+        want = _reference(log_users, log_opinions, log_types, opinion_map, formula, check)
+        mismatched = sum(1 for k, v in want.items() if abs(got.get(k, 0.0) - v) > 1e-6)
+        print(json.dumps({
+            "formula": name,
+            "groups": int(len(result.stances)),
+            "steps": result.steps,
+            "replay_s": round(result.seconds, 3),
+            "votes_per_s": round(len(log) / result.seconds),
+            "checked_groups": len(want),
+            "mismatched": mismatched,
+        }))
+        assert mismatched == 0
+
+    if args.baseline:
+        everyone = set(log_users)
+        t0 = time.perf_counter()
+        _reference(log_users, log_opinions, log_types, opinion_map, get_formula("linear"), everyone)
+        print(json.dumps({"formula": "linear", "python_loop_s": round(time.perf_counter() - t0, 2)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+コールドスタート：アプリのインポート時間と time-to-first-request（プロセス起動 → 最初のリクエストが返るまで）。
+
+    cd backend
+    python -m benchmarks.bench_startup [--runs 5] [--app app.api.main:app] [--ref HEAD~1]
+
+- import: 新しいプロセスで `python -X importtime -c "import <module>"` を実行し、合計時間と重いモジュール上位を出す
+- first_request: `uvicorn <app>` を起動し、GET /api/themes が返るまでの時間（lifespan の起動処理を含む）
+- --ref を付けると、そのコミットを git worktree に展開して同じ計測を行い、並べて表示する
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+from benchmarks import _util  # noqa: F401  (ダミーの SUPABASE_* を子プロセスに引き継ぐ)
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("openai", "google.generativeai", "supabase", "httpx", "numpy")
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = "."
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    env.setdefault("PYTHONWARNINGS", "ignore")
+    return env
+
+
+def _import_profile(cwd: str, module: str) -> Dict[str, object]:
+    probe = f"import sys; import {module}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=cwd, env=_env(), capture_output=True, text=True, check=True,
+    )
+    top: List[tuple] = []
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        cumulative, depth, name = int(m.group(2)), len(m.group(3)), m.group(4)
+        if depth == 1:
+            total_us += cumulative
+        top.append((cumulative, name))
+    top.sort(reverse=True)
+    return {
+        "total_ms": total_us / 1000.0,
+        "heavy_loaded": [m for m in proc.stdout.strip().split(",") if m],
+        "top": [f"{name} {us / 1000.0:.0f}ms" for us, name in top[:8]],
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _first_request(cwd: str, app: str, timeout: float = 60.0) -> float:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/themes"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=cwd, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - t0 < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {proc.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=5) as r:
+                    r.read()
+                return time.perf_counter() - t0
+            except OSError:
+                time.sleep(0.005)
+        raise TimeoutError(url)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _measure(cwd: str, app: str, runs: int) -> Dict[str, object]:
+    module = app.split(":")[0]
+    profiles = [_import_profile(cwd, module) for _ in range(runs)]
+    ttfr = [_first_request(cwd, app) for _ in range(runs)]
+    best = min(profiles, key=lambda p: p["total_ms"])
+    return {
+        "import_ms_median": round(statistics.median(p["total_ms"] for p in profiles), 1),
+        "heavy_sdks_loaded_by_import": best["heavy_loaded"],
+        "import_top": best["top"],
+        "first_request": _util.summarize_ms(ttfr),
+    }
+
+
+def _worktree(ref: str) -> str:
+    path = tempfile.mkdtemp(prefix="bench_startup_")
+    subprocess.run(["git", "worktree", "add", "--detach", path, ref], cwd=BACKEND, check=True, capture_output=True)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--app", default="app.api.main:app")
+    parser.add_argument("--ref", default=None, help="比較するコミット（例: HEAD~1）")
+    args = parser.parse_args()
+
+    out: Dict[str, object] = {"app": args.app, "runs": args.runs}
+    tree: Optional[str] = None
+    try:
+        if args.ref:
+            tree = _worktree(args.ref)
+            out[args.ref] = _measure(os.path.join(tree, "backend"), args.app, args.runs)
+        out["working tree"] = _measure(BACKEND, args.app, args.runs)
+    finally:
+        if tree:
+            subprocess.run(["git", "worktree", "remove", "--force", tree], cwd=BACKEND, capture_output=True)
+            shutil.rmtree(tree, ignore_errors=True)
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+/api/themes/ のスループット比較（1,000テーマ × 10意見）
+
+    cd backend
+    python -m benchmarks.bench_themes_payload [--themes 1000] [--opinions 10] [--requests 200]
+
+before: 旧実装（毎回 ThemesResponse で検証 → JSONエンコード、非圧縮）
+after : 事前シリアライズ・事前圧縮済みスナップショットをそのまま返す
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import _util
+
+import httpx
+from fastapi import FastAPI
+
+from app.schemas.themes import ThemesResponse
+import app.services.theme_store_service as theme_store
+from app.api.routes_themes import router as themes_router
+
+
+def synthetic_catalog(n_themes: int, n_opinions: int) -> dict:
+    themes = []
+    for t in range(n_themes):
+        themes.append({
+            "id": f"theme_{t:06d}",
+            "title": f"テーマ{t}",
+            "color": "#81C784",
+            "opinions": [
+                {
+                    "id": f"op_{t:06d}_{o:02d}",
+                    "title": f"論点{o}",
+                    "body": "これはベンチマーク用の意見本文である。" * 3,
+                    "score": (o * 37) % 201 - 100,
+                    "color": "#FFD54F",
+                    "sourceUrl": f"https://example.com/news/{t}/{o}",
+                }
+                for o in range(n_opinions)
+            ],
+        })
+    return {"themes": themes}
+
+
+def _before_app(payload: dict) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/themes/", response_model=ThemesResponse)
+    def get_themes():
+        return payload
+
+    return app
+
+
+def _after_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(themes_router, prefix="/api/themes")
+    return app
+
+
+async def _get_raw(client: httpx.AsyncClient, headers: dict) -> int:
+    # クライアント側の解凍コストを含めないよう、圧縮されたまま読む
+    n = 0
+    async with client.stream("GET", "/api/themes/", headers=headers) as r:
+        r.raise_for_status()
+        async for chunk in r.aiter_raw():
+            n += len(chunk)
+    return n
+
+
+async def _throughput(app: FastAPI, requests: int, headers: dict) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        wire_bytes = await _get_raw(client, headers)
+        lat = []
+        t0 = time.perf_counter()
+        for _ in range(requests):
+            s = time.perf_counter()
+            await _get_raw(client, headers)
+            lat.append(time.perf_counter() - s)
+        wall = time.perf_counter() - t0
+    return {"req_per_s": round(requests / wall, 1), "wire_bytes": wire_bytes, **_util.summarize_ms(lat)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--themes", type=int, default=1000)
+    ap.add_argument("--opinions", type=int, default=10)
+    ap.add_argument("--requests", type=int, default=200)
+    args = ap.parse_args()
+
+    payload = synthetic_catalog(args.themes, args.opinions)
+    theme_store.list_themes_with_opinions = lambda: payload
+    theme_store.invalidate_themes_snapshot()
+
+    t0 = time.perf_counter()
+    snap = theme_store.get_themes_snapshot()
+    rebuild_ms = (time.perf_counter() - t0) * 1000.0
+
+    before_requests = max(1, args.requests // 10)
+    result = {
+        "catalog": f"{args.themes} themes x {args.opinions} opinions",
+        "snapshot_rebuild_ms": round(rebuild_ms, 1),
+        "bytes": {"identity": len(snap.body), **{k: len(v) for k, v in snap.encoded.items()}},
+        "before": asyncio.run(_throughput(_before_app(payload), before_requests, {"Accept-Encoding": "identity"})),
+        "after_identity": asyncio.run(_throughput(_after_app(), args.requests, {"Accept-Encoding": "identity"})),
+        "after_gzip": asyncio.run(_throughput(_after_app(), args.requests, {"Accept-Encoding": "gzip"})),
+        "after_br": asyncio.run(_throughput(_after_app(), args.requests, {"Accept-Encoding": "br, gzip"})),
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+投票履歴・立場スコアのメモリ使用量（旧: dict/set + UUID文字列 vs 新: CompactUserStore）。
+
+    cd backend
+    python -m benchmarks.bench_user_store_memory [--users 100000 1000000] [--votes-per-user 10]
+
+ケースごとに別プロセスで合成ユーザーを読み込み、読み込み前後の RSS の差を測る。
+DB から読んだ ID は行ごとに別の文字列オブジェクトになるので、旧レイアウトでもそれを再現する。
+あわせて重複チェック・スコア参照の速度も測る。
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import random
+import subprocess
+import sys
+import time
+import uuid
+
+from benchmarks import _util  # noqa: F401  (ダミー環境変数)
+
+from app.services.compact_user_store import CompactUserStore
+
+OPINIONS = 5000
+THEMES = 200
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _fresh(s: str) -> str:
+    # JSON デコード結果と同じく、毎回新しい str オブジェクトを作る
+    return (s + " ")[:-1]
+
+
+def _synthetic(users: int, votes_per_user: int, seed: int = 1):
+    rng = random.Random(seed)
+    opinion_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(OPINIONS)]
+    theme_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(THEMES)]
+    opinion_theme = [rng.randrange(THEMES) for _ in range(OPINIONS)]
+    for _ in range(users):
+        user_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        k = rng.randint(1, 2 * votes_per_user - 1)
+        voted = rng.sample(range(OPINIONS), k)
+        stances = {}
+        for o in voted:
+            stances[_fresh(theme_ids[opinion_theme[o]])] = rng.uniform(-100, 100)
+        yield user_id, stances, [_fresh(opinion_ids[o]) for o in voted]
+
+
+def _build_legacy(rows):
+    user_stances_db, user_vote_history, loaded_users = {}, {}, set()
+    for user_id, stances, voted in rows:
+        user_stances_db.setdefault(user_id, {}).update(stances)
+        user_vote_history.setdefault(user_id, set()).update(voted)
+        loaded_users.add(user_id)
+
+    def lookup(user_id, opinion_id, theme_id):
+        return opinion_id in user_vote_history.get(user_id, ()), user_stances_db.get(user_id, {}).get(theme_id, 0.0)
+
+    return (user_stances_db, user_vote_history, loaded_users), lookup
+
+
+def _build_compact(rows):
+    store = CompactUserStore()
+    for user_id, stances, voted in rows:
+        store.merge_loaded(user_id, stances, voted)
+
+    def lookup(user_id, opinion_id, theme_id):
+        return store.has_voted(user_id, opinion_id), store.get_stance(user_id, theme_id)
+
+    return store, lookup
+
+
+def run_case(layout: str, users: int, votes_per_user: int) -> dict:
+    build = _build_legacy if layout == "legacy" else _build_compact
+    # 生成しながら読み込む（保持されるものだけが差分に残る）
+    gc.collect()
+    before = _rss_bytes()
+    t0 = time.perf_counter()
+    state, lookup = build(_synthetic(users, votes_per_user))
+    build_s = time.perf_counter() - t0
+    gc.collect()
+    after = _rss_bytes()
+
+    # 参照するキーは同じシードで作り直す（測定中に余計な参照を持たないため）
+    sample = [
+        (user_id, voted[0], next(iter(stances)))
+        for user_id, stances, voted in _synthetic(min(users, 200000), votes_per_user)
+    ]
+    t0 = time.perf_counter()
+    for k in sample:
+        lookup(*k)
+    lookup_s = time.perf_counter() - t0
+
+    return {
+        "layout": layout,
+        "users": users,
+        "rss_mb": round((after - before) / 2**20, 1),
+        "bytes_per_user": round((after - before) / users),
+        "build_s": round(build_s, 2),
+        "lookups_per_s": round(len(sample) / lookup_s),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--votes-per-user", type=int, default=10)
+    parser.add_argument("--case", choices=["legacy", "compact"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.users[0], args.votes_per_user)))
+        return
+
+    results = []
+    for users in args.users:
+        for layout in ("legacy", "compact"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_user_store_memory", "--case", layout,
+                 "--users", str(users), "--votes-per-user", str(args.votes_per_user)],
+                check=True, capture_output=True, text=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+            print(json.dumps(results[-1], ensure_ascii=False), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+投票パス（NewsService.update_stance_score）のユーザー単位ロックの検証。
+
+    cd backend
+    python -m benchmarks.bench_vote_contention [--votes 20000] [--load-latency 0.005]
+
+1. ストレステスト: 同じユーザーの同じ意見への連打（ダブルクリック）を大量に同時投入し、
+   1回だけ数えられること・最終スコアが逐次実行と一致することを確認する。
+   "unlocked" は重複チェックと書き込みの間に await が入った場合（スコア取得の非同期化など）
+   を再現したもので、ロックなしだと二重投票・更新の消失が起きることを示す。
+2. スループット: 1ユーザーに集中（hot）と多数ユーザーに分散（spread）で、ロック有無の votes/s を比較する。
+   cold は初回アクセス（DB読み込みあり）、warm は読み込み済みの状態。
+
+DB 読み込み（load_user_state）は sleep するスタブ、write-behind は無効（Supabase 未接続扱い）。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import time
+
+from benchmarks import _util  # noqa: F401  (ダミー環境変数)
+
+import app.services.news_service as ns
+from app.services.opinion_score_index import opinion_score_index
+from app.services.striped_lock import StripedLock
+
+
+class _NoLock:
+    def get(self, key):
+        return contextlib.nullcontext()
+
+
+def _reset():
+    ns.user_store.clear()
+    opinion_score_index.clear()
+
+
+def _patch_load(latency: float):
+    def load_user_state(user_id):
+        time.sleep(latency * random.uniform(0.5, 1.5))
+        return {}, set()
+    ns.load_user_state = load_user_state
+
+
+async def _vote(user, theme, opinion, vote_type, yield_inside: bool):
+    if not yield_inside:
+        return await ns.news_service.update_stance_score(user, theme, opinion, vote_type)
+    # 重複チェックの後に await が入る版（ロックが無いと check-then-add が壊れる）
+    async with ns.user_locks.get(user):
+        await ns.news_service._ensure_user_loaded(user)
+        if ns.user_store.has_voted(user, opinion):
+            raise Exception("すでにこの意見に投票済みです")
+        await asyncio.sleep(random.uniform(0, 0.005))  # 非同期のスコア取得など
+        ns.user_store.add_vote(user, opinion)
+        current = ns.user_store.get_stance(user, theme)
+        await asyncio.sleep(random.uniform(0, 0.005))
+        ns.user_store.set_stance(user, theme, current + ns.news_service._get_opinion_score(opinion))
+        return {"newScore": ns.user_store.get_stance(user, theme)}
+
+
+async def stress(locks, users: int, clicks: int, opinions: int, yield_inside: bool):
+    _reset()
+    ns.user_locks = locks
+    for o in range(opinions):
+        opinion_score_index.put(f"op{o}", 1.0 + o)
+    if yield_inside:
+        # 読み込み待ちでタイミングがばらけないよう、読み込み済みにして連打を同時に当てる
+        for u in range(users):
+            ns.user_store.mark_loaded(f"user{u}")
+
+    tasks = []
+    for u in range(users):
+        for o in range(opinions):
+            for _ in range(clicks):
+                tasks.append(_vote(f"user{u}", "theme", f"op{o}", "agree", yield_inside))
+    random.shuffle(tasks)
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    accepted = sum(1 for r in results if not isinstance(r, Exception))
+    expected_accepted = users * opinions
+    # 逐次実行した場合のスコア（yield 版は加算、通常版は NewsService の計算式）
+    expected_score = None
+    if yield_inside:
+        expected_score = sum(1.0 + o for o in range(opinions))
+    wrong_scores = 0
+    if expected_score is not None:
+        wrong_scores = sum(
+            1 for u in range(users)
+            if abs(ns.user_store.get_stance(f"user{u}", "theme") - expected_score) > 1e-9
+        )
+    return {
+        "requests": len(tasks),
+        "accepted": accepted,
+        "expected_accepted": expected_accepted,
+        "double_votes": accepted - expected_accepted,
+        "users_with_wrong_score": wrong_scores,
+    }
+
+
+async def throughput(locks, votes: int, users: int, concurrency: int, warm: bool):
+    _reset()
+    ns.user_locks = locks
+    if warm:
+        # 読み込み済みの状態から測る（ロック自体のコストだけを見る）
+        for u in range(users):
+            ns.user_store.mark_loaded(f"user{u}")
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            await ns.news_service.update_stance_score(f"user{i % users}", "theme", f"op{i}", "agree")
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(votes)))
+    wall = time.perf_counter() - t0
+    return {
+        "votes": votes,
+        "users": users,
+        "votes_per_s": round(votes / wall, 1),
+        "contended": getattr(locks, "contended", None),
+    }
+
+
+async def main_async(args):
+    _patch_load(args.load_latency)
+    out = {"stress": {}, "throughput": {}}
+    with contextlib.redirect_stdout(io.StringIO()):  # "Update: ..." の print を黙らせる
+        for name, locks, yield_inside in [
+            ("locked", StripedLock(args.stripes), False),
+            ("locked_await_inside", StripedLock(args.stripes), True),
+            ("unlocked_await_inside", _NoLock(), True),
+        ]:
+            out["stress"][name] = await stress(locks, users=50, clicks=4, opinions=5, yield_inside=yield_inside)
+
+        for warm in (False, True):
+            for name, users in [("hot", 1), ("spread", args.votes)]:
+                for mode, locks in [("locked", StripedLock(args.stripes)), ("unlocked", _NoLock())]:
+                    key = f"{'warm' if warm else 'cold'}/{name}/{mode}"
+                    out["throughput"][key] = await throughput(
+                        locks, votes=args.votes, users=users, concurrency=args.concurrency, warm=warm,
+                    )
+    ns.user_locks = StripedLock(args.stripes)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--votes", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--stripes", type=int, default=256)
+    parser.add_argument("--load-latency", type=float, default=0.005)
+    args = parser.parse_args()
+
+    out = asyncio.run(main_async(args))
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+    assert out["stress"]["locked"]["double_votes"] == 0
+    assert out["stress"]["locked_await_inside"]["double_votes"] == 0
+    assert out["stress"]["locked_await_inside"]["users_with_wrong_score"] == 0
+
+
+if __name__ == "__main__":
+    main()
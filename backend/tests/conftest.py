@@ -0,0 +1,19 @@
+import os
+
+# Tests run against the in-process fakes (no keys, no network) without fake latency.
+# Set before app.config is imported.
+os.environ.setdefault("FAKE_PROVIDERS", "all")
+os.environ.setdefault("FAKE_LATENCY", "gemini=fixed:0,openai=fixed:0,supabase=fixed:0")
+
+import pytest  # noqa: E402
+
+from app.services import supabase_service  # noqa: E402
+
+
+@pytest.fixture
+def fake_db():
+    """A fresh, empty in-memory Supabase for one test."""
+    supabase_service.reset_supabase()
+    supabase_service.init_supabase()
+    yield supabase_service.client()
+    supabase_service.reset_supabase()
@@ -0,0 +1,48 @@
+import asyncio
+
+from app.services.chat_compaction import ChatCompactor
+from app.services.chat_session_store import ChatSessionStore
+
+
+def _message(role: str, i: int):
+    return {"role": role, "parts": [f"{i:02d}" + "x" * 38]}  # 10 tokens each
+
+
+def _history(roles: str):
+    return [_message("user" if r == "u" else "model", i) for i, r in enumerate(roles)]
+
+
+def _compactor(store, summarize=None, **limits):
+    return ChatCompactor(store, keep_turns=1, summarize=summarize, **limits)
+
+
+def test_hard_limit_trim_of_odd_history_starts_with_a_user_turn():
+    store = ChatSessionStore(ttl_seconds=60, max_sessions=10, max_bytes=1 << 20)
+    # the third user message never got a reply
+    session = store.create("chat", {}, _history("umuumum"), store=False)
+    compactor = _compactor(store, token_budget=40, hard_limit_tokens=40)
+
+    sent = compactor.prompt_history(session)
+    assert sent[0]["role"] == "user"
+    assert sent == session.history[3:]
+    assert compactor.trimmed_messages == 3
+
+
+def test_fold_leaves_history_starting_with_a_user_turn():
+    store = ChatSessionStore(ttl_seconds=60, max_sessions=10, max_bytes=1 << 20)
+    folded = []
+
+    async def summarize(summary, messages):
+        folded.append(len(messages))
+        return "要約"
+
+    async def run():
+        session = store.create("chat", {}, _history("umumumu"))
+        compactor = _compactor(store, summarize, token_budget=40, hard_limit_tokens=1000)
+        compactor.prompt_history(session)
+        await compactor.drain()
+        return session
+
+    session = asyncio.run(run())
+    assert folded == [4]
+    assert [m["role"] for m in session.history] == ["user", "model", "user"]
@@ -0,0 +1,34 @@
+import pytest
+
+from app.services.chat_stream_service import END_MARKER, EndMarkerFilter
+
+
+def _run(chunks):
+    marker = EndMarkerFilter()
+    shown = [marker.feed(c) for c in chunks]
+    return shown, marker.flush(), marker.ended
+
+
+@pytest.mark.parametrize("chunks", [
+    ["またお話ししましょう。[[EN", "D]]"],
+    ["またお話ししましょう。[", "[END", "]]"],
+    ["またお話ししましょう。", "[[", "E", "ND]]"],
+])
+def test_marker_split_across_chunks_is_removed(chunks):
+    shown, tail, ended = _run(chunks)
+    assert "".join(shown) + tail == "またお話ししましょう。"
+    assert ended
+    # nothing that could still become the marker is shown early
+    assert not any("[" in s for s in shown)
+
+
+def test_text_that_only_looks_like_the_marker_is_kept():
+    shown, tail, ended = _run(["配列 a[[0", "]] と [[EX", "]] です"])
+    assert "".join(shown) + tail == "配列 a[[0]] と [[EX]] です"
+    assert not ended
+
+
+def test_unfinished_marker_prefix_is_flushed_at_the_end():
+    shown, tail, ended = _run(["おわり[[EN"])
+    assert shown == ["おわり"] and tail == "[[EN" and not ended
+    assert END_MARKER not in "".join(shown) + tail
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+from app.services import rate_limit, resilience
+from app.services.llm_providers import Hedger, LLMProvider
+
+
+class _Provider(LLMProvider):
+    def __init__(self, name: str, delay: float, answer: str = "ok"):
+        self.name = name
+        self.delay = delay
+        self.answer = answer
+        self.calls = 0
+
+    def complete(self, prompt: str, json_output: bool = False) -> str:
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.answer
+
+
+def _validate(text: str) -> str:
+    if text != "ok":
+        raise ValueError("not a valid answer")
+    return text
+
+
+def _hedger(monkeypatch, *providers, limits=None) -> Hedger:
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(rate_limit, "_limiters", dict(limits or {}))
+    return Hedger({p.name: p for p in providers}, [p.name for p in providers], hedge_delay=0.05)
+
+
+def test_fallback_after_a_bad_answer_is_not_a_hedge(monkeypatch):
+    hedger = _hedger(monkeypatch, _Provider("a", 0.0, answer="garbage"), _Provider("b", 0.0))
+    result = asyncio.run(hedger.run("p", _validate))
+    assert result.provider == "b" and not result.hedged
+    assert hedger.stats()["hedged"] == 0
+
+
+def test_slow_primary_is_hedged(monkeypatch):
+    hedger = _hedger(monkeypatch, _Provider("a", 0.5), _Provider("b", 0.0))
+    result = asyncio.run(hedger.run("p", _validate))
+    assert result.provider == "b" and result.hedged
+    assert hedger.stats()["hedged"] == 1
+
+
+def test_hedges_wait_for_the_provider_rate_limit(monkeypatch):
+    # no token left for "b": the hedge waits in the limiter, so the slow primary wins
+    limiter = rate_limit.AsyncRateLimiter(rate_per_minute=60, burst=1)
+    limiter._tokens = 0.0
+    b = _Provider("b", 0.0)
+    hedger = _hedger(monkeypatch, _Provider("a", 0.3), b, limits={"b": limiter})
+    result = asyncio.run(hedger.run("p", _validate))
+    assert result.provider == "a" and result.hedged
+    assert b.calls == 0 and limiter.waited_seconds > 0
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+from app.services import llm_gateway
+from app.services.llm_gateway import stream_llm
+
+
+def _stalling(release: threading.Event):
+    yield "first"
+    release.wait(5)
+    yield "late"
+
+
+def test_stalled_stream_times_out_between_chunks(monkeypatch):
+    monkeypatch.setitem(llm_gateway._stats, "timed_out", 0)
+    release = threading.Event()
+
+    async def run():
+        got = []
+        try:
+            async for text in stream_llm(_stalling, release, timeout=0.05):
+                got.append(text)
+        except asyncio.TimeoutError:
+            return got
+        finally:
+            release.set()
+        raise AssertionError("the stream did not time out")
+
+    assert asyncio.run(run()) == ["first"]
+    assert llm_gateway.gateway_stats()["timed_out"] == 1
+
+
+def test_abandoned_stream_is_counted_as_cancelled(monkeypatch):
+    monkeypatch.setitem(llm_gateway._stats, "cancelled", 0)
+    monkeypatch.setitem(llm_gateway._stats, "completed", 0)
+
+    async def run():
+        stream = stream_llm(lambda: iter(["a", "b", "c"]))
+        assert await stream.__anext__() == "a"
+        await stream.aclose()  # the client went away
+        assert [t async for t in stream_llm(lambda: iter(["x"]))] == ["x"]
+
+    asyncio.run(run())
+    stats = llm_gateway.gateway_stats()
+    assert stats["cancelled"] == 1 and stats["completed"] == 1
@@ -0,0 +1,74 @@
+from app.services.diversity_pick import pick_diverse_items
+from app.services.openai_data_collect_service import CollectedItem
+from app.services.opinion_dedupe import find_duplicate_opinions, remove_duplicate_opinions
+from app.services.themes_builder import dedupe_opinions_by_content
+
+# the same claim and its opposite, in shared wording (estimated Jaccard ~0.45 and ~0.6)
+PRO_NUCLEAR = ("【賛成】原発再稼働", "原発再稼働は電力の安定供給に必要だ。電気料金の高騰を抑え、脱炭素にもつながる。", 70)
+CON_NUCLEAR = ("【反対】原発再稼働", "原発再稼働は電力の安定供給に不要だ。電気料金の高騰を抑えるには再エネを増やすべきだ。", -70)
+TAX_CUT = ("消費税の減税", "消費税の減税は家計の負担を軽くする。物価高が続くいま、生活を守るために必要な政策だ。", 60)
+TAX_RISE = ("消費税の増税", "消費税の増税は家計の負担を重くする。物価高が続くいま、生活を守るために避けるべき政策だ。", -60)
+# a light paraphrase of PRO_NUCLEAR
+PRO_NUCLEAR_AGAIN = ("原発の再稼働に賛成", "原発の再稼働は電力の安定供給に必要だ。電気料金の高騰を抑え、脱炭素にもつながるはずだ。", 50)
+
+
+def _opinion(i, card, theme_id="t", created_at=None):
+    title, body, score = card
+    return {
+        "id": f"op{i}", "theme_id": theme_id, "title": title, "body": body, "score": score,
+        "created_at": created_at or f"2026-01-01T00:00:0{i}+00:00",
+    }
+
+
+def test_opposite_stances_are_kept():
+    cards = [PRO_NUCLEAR, CON_NUCLEAR, TAX_CUT, TAX_RISE]
+    rows = [_opinion(i, c) for i, c in enumerate(cards)]
+    assert [r["id"] for r in dedupe_opinions_by_content(rows)] == ["op0", "op1", "op2", "op3"]
+    assert find_duplicate_opinions(rows) == []
+
+    items = [
+        CollectedItem(topic_name=title, summary=body, url=f"https://example{i}.jp/a", agreement_score=score)
+        for i, (title, body, score) in enumerate(cards)
+    ]
+    picked, _ = pick_diverse_items(items, target_n=4)
+    assert {it.topic_name for it in picked} == {c[0] for c in cards}
+
+
+def test_same_side_paraphrase_is_removed():
+    rows = [_opinion(0, PRO_NUCLEAR), _opinion(1, CON_NUCLEAR), _opinion(2, PRO_NUCLEAR_AGAIN)]
+    assert [r["id"] for r in dedupe_opinions_by_content(rows)] == ["op0", "op1"]
+    dups = find_duplicate_opinions(rows)
+    assert [(d["id"], d["duplicate_of"]) for d in dups] == [("op2", "op0")]
+
+
+def test_remove_moves_votes_and_collapses_double_votes(fake_db):
+    rows = [_opinion(0, PRO_NUCLEAR), _opinion(1, PRO_NUCLEAR_AGAIN)]
+    fake_db.table("themes").insert({"id": "t", "title": "t", "color": "#000000"}).execute()
+    fake_db.table("users").insert([{"id": u, "nickname": u} for u in ("both", "dup-twice", "dup-only")]).execute()
+    fake_db.table("opinions").insert([
+        {**r, "color": "#000000"} for r in rows
+    ]).execute()
+    fake_db.table("user_votes").insert([
+        {"user_id": "both", "opinion_id": "op0", "vote_type": "agree", "created_at": "2026-01-02T00:00:00+00:00"},
+        {"user_id": "both", "opinion_id": "op1", "vote_type": "disagree", "created_at": "2026-01-01T00:00:00+00:00"},
+        {"user_id": "dup-twice", "opinion_id": "op1", "vote_type": "agree", "created_at": "2026-01-03T00:00:00+00:00"},
+        {"user_id": "dup-twice", "opinion_id": "op1", "vote_type": "agree", "created_at": "2026-01-04T00:00:00+00:00"},
+        {"user_id": "dup-only", "opinion_id": "op1", "vote_type": "disagree", "created_at": "2026-01-05T00:00:00+00:00"},
+    ]).execute()
+
+    dups = find_duplicate_opinions(rows)
+    result = remove_duplicate_opinions(dups, {r["id"]: r["score"] for r in rows})
+    assert result == {"votesMoved": 2, "votesCollapsed": 2, "scoresUpdated": 1, "deleted": 1}
+
+    votes = fake_db.table("user_votes").select("user_id,opinion_id,vote_type,created_at").execute().data
+    assert {v["opinion_id"] for v in votes} == {"op0"}
+    by_user = {v["user_id"]: v for v in votes}
+    assert len(votes) == len(by_user) == 3
+    # the vote already on the kept opinion wins, otherwise the earliest
+    assert by_user["both"]["vote_type"] == "agree"
+    assert by_user["dup-twice"]["created_at"] == "2026-01-03T00:00:00+00:00"
+    assert by_user["dup-only"]["vote_type"] == "disagree"
+
+    kept = fake_db.table("opinions").select("id,score,color").execute().data
+    assert [(o["id"], o["score"]) for o in kept] == [("op0", 60)]
+    assert kept[0]["color"] != "#000000"
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from app.services import lease_service, seed_pipeline, seed_service
+from app.services.openai_data_collect_service import stable_id
+from app.services.seed_pipeline import run_seed_batch
+
+
+def _leases(db):
+    return db.table("seed_leases").select("name").execute().data
+
+
+def test_theme_stored_while_taking_the_lease_is_skipped(fake_db, monkeypatch):
+    theme_id = stable_id("theme", "熊の駆除")
+
+    def acquire_after_other_worker(name, ttl):
+        token = lease_service.acquire_lease(name, ttl)
+        # the previous lease holder finished just before we got the lease
+        fake_db.table("themes").insert({"id": theme_id, "title": "熊の駆除"}).execute()
+        return token
+
+    async def must_not_collect(**kwargs):
+        raise AssertionError("collected a theme that already exists")
+
+    monkeypatch.setattr(seed_service, "acquire_lease", acquire_after_other_worker)
+    monkeypatch.setattr(seed_pipeline, "collect_topic_cards", must_not_collect)
+
+    async def run():
+        return [e async for e in run_seed_batch(["熊の駆除"])]
+
+    events = asyncio.run(run())
+    assert [(e["status"], e.get("reason")) for e in events[:-1]] == [("skipped", "exists")]
+    assert events[-1]["skipped"] == 1
+    assert _leases(fake_db) == []
+
+
+def test_closing_the_batch_releases_every_lease(fake_db, monkeypatch):
+    collect = seed_pipeline.collect_topic_cards
+
+    async def collect_slowly(topic, **kwargs):
+        if topic == "遅い":
+            await asyncio.sleep(30)
+        return await collect(topic=topic, **kwargs)
+
+    def slow_upsert(theme, opinions):
+        time.sleep(0.3)
+
+    monkeypatch.setattr(seed_pipeline, "collect_topic_cards", collect_slowly)
+    monkeypatch.setattr(seed_pipeline, "upsert_theme_and_opinions", slow_upsert)
+
+    async def run():
+        # one writer: the first topic is being written, the second waits in the
+        # queue, the third is still collecting when the client goes away
+        batch = run_seed_batch(["書き込み中", "待ち", "遅い"], parallelism=3, db_writers=1)
+        seen = []
+        async for event in batch:
+            seen.append(event["status"])
+            if seen.count("collected") == 2 and seen.count("collecting") == 3:
+                break
+        assert len(_leases(fake_db)) == 3
+        await batch.aclose()
+        for _ in range(50):
+            if not _leases(fake_db):
+                break
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert _leases(fake_db) == []
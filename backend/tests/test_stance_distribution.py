@@ -0,0 +1,94 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.services.compact_user_store import CompactUserStore
+from app.services.stance_distribution import StanceDistributions, ThemeDistribution
+from app.services.stance_store import StanceWriteBehind
+
+
+def _iso(seconds_from_now: float) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds_from_now)).isoformat()
+
+
+def _dists(**kwargs) -> StanceDistributions:
+    return StanceDistributions(bins=20, resolution=0.1, refresh_interval=60, **kwargs)
+
+
+def test_moves_and_removals_are_keyed_by_user():
+    dist = ThemeDistribution(bins=20, resolution=0.1)
+    dist.set(7, 10.0)
+    dist.set(3, -50.0)
+    dist.set(7, 30.0)  # 7 moves; 3's bin is untouched
+    assert dist.total == 2
+    assert dist.quantile(0.5) == -50.0 and dist.quantile(1.0) == 30.0
+
+    assert not dist.remove(5)
+    assert dist.remove(3)
+    assert dist.total == 1 and dist.quantile(0.5) == 30.0
+    assert sum(b["count"] for b in dist.histogram()) == 1
+    assert list(dist.items()) == [(7, 30.0)]
+
+
+def test_user_ids_are_shared_with_the_user_store():
+    dists = _dists()
+    store = CompactUserStore(users=dists.users)
+    dists.record("t", "from-distribution", 5.0)  # interned before the store has seen the user
+    store.set_stance("other", "t", 1.0)
+    assert store.get_stance("from-distribution", "t", None) is None
+    store.set_stance("from-distribution", "t", 5.0)
+    assert dists.users.get("from-distribution") == 0 and len(dists.users) == 2
+
+    store.clear()  # a shared interner is not the store's to clear
+    assert dists.score_of("t", "from-distribution") == 5.0
+
+
+def test_rebuild_keeps_stances_that_are_not_stored_yet(fake_db):
+    dists = _dists()
+    stored, elsewhere, pending, other = users = [str(uuid.uuid4()) for _ in range(4)]
+    fake_db.table("users").insert([{"id": u, "nickname": u[:8]} for u in users]).execute()
+    fake_db.table("themes").insert({"id": "t", "title": "t", "color": "#000000"}).execute()
+    fake_db.table("user_stances").insert([
+        # stored by this worker's write-behind after the vote below
+        {"user_id": stored, "theme_id": "t", "stance_score": 10.0, "updated_at": _iso(60)},
+        # another worker's vote, newer than ours
+        {"user_id": elsewhere, "theme_id": "t", "stance_score": 40.0, "updated_at": _iso(60)},
+        # our newer vote is still waiting in the write-behind queue
+        {"user_id": pending, "theme_id": "t", "stance_score": -5.0, "updated_at": _iso(-60)},
+        {"user_id": other, "theme_id": "t", "stance_score": 0.0, "updated_at": _iso(-60)},
+    ]).execute()
+
+    dists.record("t", stored, 10.0)
+    dists.record("t", elsewhere, -20.0)
+    dists.record("t", pending, -80.0)
+    dists.record("t", "default_user", 90.0)  # never written: not a UUID
+
+    dists.rebuild()
+    assert dists.get("t").total == 5
+    assert dists.score_of("t", stored) == 10.0
+    assert dists.score_of("t", elsewhere) == 40.0
+    assert dists.score_of("t", pending) == -80.0
+    assert dists.score_of("t", "default_user") == 90.0
+    assert dists.score_of("t", other) == 0.0
+    # only the stance the database does not have yet is still tracked
+    assert dists.stats()["unsaved_stances"] == 1
+
+
+def test_stored_stances_stop_being_tracked_without_a_rebuild(fake_db):
+    write_behind = StanceWriteBehind(max_batch=10, flush_interval=60, max_depth=100)
+    dists = _dists(write_behind=write_behind)
+    users = [str(uuid.uuid4()) for _ in range(3)]
+    fake_db.table("users").insert([{"id": u, "nickname": u[:8]} for u in users]).execute()
+    opinion = {"id": "op", "theme_id": "t", "title": "x", "body": "x", "score": 0, "color": "#000000"}
+    fake_db.table("themes").insert({"id": "t", "title": "t", "color": "#000000"}).execute()
+    fake_db.table("opinions").insert(opinion).execute()
+
+    for i, u in enumerate(users):
+        dists.record("t", u, float(i))
+        write_behind.record(u, "t", "op", "agree", float(i))
+    dists.record("t", "default_user", 50.0)
+    assert dists.stats()["unsaved_stances"] == 3
+
+    asyncio.run(write_behind.flush())
+    assert dists.stats()["unsaved_stances"] == 0
+    assert dists.get("t").total == 4
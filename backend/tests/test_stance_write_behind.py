@@ -0,0 +1,97 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.services.fake_supabase import FakeAPIError
+from app.services.stance_store import StanceWriteBehind, VoteQueueFull
+
+
+def _store(**kwargs) -> StanceWriteBehind:
+    return StanceWriteBehind(**{"max_batch": 10, "flush_interval": 60, "max_depth": 100, "max_retries": 2, **kwargs})
+
+
+def _record(store: StanceWriteBehind, opinion_ids):
+    users = [str(uuid.uuid4()) for _ in opinion_ids]
+    for user_id, opinion_id in zip(users, opinion_ids):
+        store.record(user_id, "theme_1", opinion_id, "agree", 10.0)
+    return users
+
+
+def _seed(db, users, opinion_ids):
+    """The rows the votes reference (the fake enforces the schema's foreign keys)."""
+    db.table("users").insert([{"id": u, "nickname": u[:8]} for u in users]).execute()
+    db.table("themes").insert({"id": "theme_1", "title": "t", "color": "#000000"}).execute()
+    db.table("opinions").insert([
+        {"id": o, "theme_id": "theme_1", "title": o, "body": o, "score": 0, "color": "#000000"} for o in opinion_ids
+    ]).execute()
+
+
+def test_poison_row_is_dead_lettered_without_retries(fake_db, monkeypatch):
+    store = _store()
+    users = _record(store, ["op_1", "op_missing", "op_2"])
+    _seed(fake_db, users, ["op_1", "op_2"])  # op_missing violates user_votes' foreign key
+    write = store._write
+    calls = []
+
+    def counted(stances, votes):
+        calls.append(len(votes))
+        write(stances, votes)
+
+    monkeypatch.setattr(store, "_write", counted)
+
+    # a foreign key error is the row's fault: isolate it in the same round
+    asyncio.run(store.flush())
+    assert store.depth() == 0
+    assert store.stats()["dropped_votes"] == 1
+    assert store.flushed_votes == 2 and store.flushed_stances == 3
+    assert [d["row"]["opinion_id"] for d in store.dead_letter] == ["op_missing"]
+    assert calls == [3, 0, 0, 0, 1, 1, 1]
+    stored = fake_db.table("user_votes").select("opinion_id").execute().data
+    assert sorted(r["opinion_id"] for r in stored) == ["op_1", "op_2"]
+
+
+def test_timeouts_are_retried_not_dead_lettered(fake_db, monkeypatch):
+    store = _store()
+    _seed(fake_db, _record(store, ["op_1", "op_2"]), ["op_1", "op_2"])
+    write = store._write
+    failures = iter([FakeAPIError("57014", "canceling statement due to statement timeout")])
+
+    def flaky(stances, votes):
+        for e in failures:
+            raise e
+        write(stances, votes)
+
+    monkeypatch.setattr(store, "_write", flaky)
+    asyncio.run(store.flush())
+    assert store.depth() == 2 and store.dropped_votes == 0
+
+    asyncio.run(store.flush())
+    assert store.depth() == 0 and store.flushed_votes == 2
+    assert len(store.dead_letter) == 0
+
+
+def test_unreachable_database_drops_nothing(fake_db, monkeypatch):
+    store = _store()
+    _seed(fake_db, _record(store, ["op_1", "op_2"]), ["op_1", "op_2"])
+
+    def down(stances, votes):
+        raise ConnectionError("connection refused")
+
+    monkeypatch.setattr(store, "_write", down)
+    for _ in range(5):
+        asyncio.run(store.flush())
+    assert store.depth() == 2
+    assert store.dropped_votes == 0 and store.dropped_stances == 0
+    assert len(store.dead_letter) == 0
+
+    monkeypatch.undo()
+    asyncio.run(store.flush())
+    assert store.depth() == 0 and store.flushed_votes == 2
+
+
+def test_pending_stances_are_capped(fake_db):
+    store = _store(max_pending=2)
+    _record(store, ["op_1", "op_2"])
+    with pytest.raises(VoteQueueFull):
+        store.ensure_capacity(str(uuid.uuid4()))
@@ -0,0 +1,51 @@
+import pytest
+
+from app.services.theme_store_service import decode_cursor, encode_cursor, list_themes_page
+
+
+def _themes(db):
+    rows = []
+    for i in range(23):
+        # ties on created_at, and a few rows without one (sorted last)
+        created_at = None if i >= 20 else f"2026-01-01T00:00:0{i // 3}+00:00"
+        rows.append({"id": f"theme_{i:02d}", "title": f"テーマ{i}", "color": "#000000", "created_at": created_at})
+    db.table("themes").insert(rows).execute()
+    db.table("opinions").insert([
+        {"id": f"op_{i:02d}_{j}", "theme_id": f"theme_{i:02d}", "title": "x", "body": "x", "score": 0, "color": "#000000"}
+        for i in range(23) for j in range(3)
+    ]).execute()
+    return rows
+
+
+@pytest.mark.parametrize("limit", [1, 4, 7, 23, 50])
+def test_pages_cover_every_theme_once(fake_db, limit):
+    rows = _themes(fake_db)
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = list_themes_page(limit=limit, cursor=cursor, fields="id,opinions.id", max_opinions=2)
+        assert len(page["themes"]) <= limit
+        assert all(len(t["opinions"]) == 2 for t in page["themes"])
+        seen.extend(t["id"] for t in page["themes"])
+        pages += 1
+        cursor = page["nextCursor"]
+        if cursor is None:
+            break
+    assert seen == [r["id"] for r in rows]
+    assert pages == -(-len(rows) // limit)
+
+
+def test_cursor_round_trips():
+    assert decode_cursor(encode_cursor("2026-01-01T00:00:00+00:00", "theme_ab")) == ("2026-01-01T00:00:00+00:00", "theme_ab")
+    assert decode_cursor(encode_cursor(None, "theme_ab")) == (None, "theme_ab")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    encode_cursor("2026-01-01T00:00:00+00:00", "theme_ab")[:-3],  # truncated
+    encode_cursor("2026-01-01T00:00:00+00:00", 'x",id.gt."'),  # filter injection through the id
+    encode_cursor('2026",id.gt."x', "theme_ab"),  # ... or through the timestamp
+    encode_cursor("2026-01-01T00:00:00+00:00", "theme_ab") + "Zm9v",
+])
+def test_tampered_cursor_is_rejected(fake_db, cursor):
+    with pytest.raises(ValueError):
+        list_themes_page(limit=5, cursor=cursor)
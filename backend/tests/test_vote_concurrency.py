@@ -0,0 +1,85 @@
+import asyncio
+import random
+import time
+import uuid
+
+import pytest
+
+import app.services.news_service as ns
+from app.services.opinion_score_index import opinion_score_index
+from app.services.stance_formula import clamp_stance, get_formula
+from app.services.stance_store import StanceWriteBehind
+
+
+# what the database already has for the user: a stance and one earlier vote
+STORED_STANCE = 20.0
+STORED_VOTE = "op_0"
+
+
+@pytest.fixture
+def vote_env(fake_db, monkeypatch):
+    """news_service on an empty user store and its own write-behind, with a slow first load."""
+    ns.user_store.clear()
+    opinion_score_index.clear()
+    write_behind = StanceWriteBehind(max_batch=1000, flush_interval=60, max_depth=10000)
+    monkeypatch.setattr(ns, "stance_write_behind", write_behind)
+
+    def slow_load(user_id):
+        # the first vote of the user awaits this while holding the user's lock
+        time.sleep(random.uniform(0.001, 0.01))
+        return {"theme_1": STORED_STANCE}, {STORED_VOTE}
+
+    monkeypatch.setattr(ns, "load_user_state", slow_load)
+    yield write_behind
+    ns.user_store.clear()
+    opinion_score_index.clear()
+
+
+# attraction is order dependent, so it also checks that votes are applied one at a time in arrival order
+@pytest.mark.parametrize("formula", ["linear", "attraction"])
+def test_concurrent_votes_for_one_user(vote_env, fake_db, monkeypatch, formula):
+    stance_formula = get_formula(formula)
+    monkeypatch.setattr(ns, "stance_formula", stance_formula)
+    user = str(uuid.uuid4())
+    rng = random.Random(0)
+    opinions = [(f"op_{i}", float(rng.randint(-100, 100)), rng.choice(["agree", "oppose"])) for i in range(40)]
+    for opinion_id, score, _ in opinions:
+        opinion_score_index.put(opinion_id, score, "theme_1")
+    fake_db.table("users").insert({"id": user, "nickname": "voter"}).execute()
+    fake_db.table("themes").insert({"id": "theme_1", "title": "t", "color": "#000000"}).execute()
+    fake_db.table("opinions").insert([
+        {"id": o, "theme_id": "theme_1", "title": o, "body": o, "score": s, "color": "#000000"} for o, s, _ in opinions
+    ]).execute()
+
+    # every opinion is clicked three times (double / triple clicks), all at once
+    calls = [o for o in opinions for _ in range(3)]
+
+    async def run():
+        return await asyncio.gather(
+            *(ns.news_service.update_stance_score(user, "theme_1", op, vote) for op, _, vote in calls),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+
+    new = [o for o in opinions if o[0] != STORED_VOTE]
+    accepted = [r for r in results if not isinstance(r, Exception)]
+    rejected = [r for r in results if isinstance(r, Exception)]
+    assert len(accepted) == len(new)
+    assert len(rejected) == len(calls) - len(new)
+    assert all("投票済み" in str(e) for e in rejected)
+
+    # the per-user lock is FIFO, so the first click of each opinion wins in submission order
+    expected = STORED_STANCE
+    for _, score, vote in new:
+        expected = clamp_stance(stance_formula.apply(expected, score, vote))
+    final = asyncio.run(ns.news_service.get_user_stance(user, "theme_1"))["stance_score"]
+    assert final == pytest.approx(expected)
+    assert accepted[-1]["newScore"] == pytest.approx(expected)
+
+    # one vote row per opinion reaches the database, and the stored stance is the final one
+    asyncio.run(vote_env.flush())
+    votes = fake_db.table("user_votes").select("opinion_id").eq("user_id", user).execute().data
+    assert sorted(v["opinion_id"] for v in votes) == sorted(o for o, _, _ in new)
+    stances = fake_db.table("user_stances").select("stance_score").eq("user_id", user).execute().data
+    assert [s["stance_score"] for s in stances] == [pytest.approx(expected)]
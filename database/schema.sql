@@ -55,7 +55,16 @@ CREATE TABLE user_votes (
 
 -- インデックス作成
 CREATE INDEX idx_opinions_theme_id ON opinions(theme_id);
+CREATE INDEX idx_opinions_updated_at ON opinions(updated_at, id);
 CREATE INDEX idx_user_stances_user_id ON user_stances(user_id);
 CREATE INDEX idx_user_stances_theme_id ON user_stances(theme_id);
 CREATE INDEX idx_user_votes_user_id ON user_votes(user_id);
 CREATE INDEX idx_user_votes_opinion_id ON user_votes(opinion_id);
+
+-- シード処理のリーステーブル（複数ワーカーが同じテーマを同時に収集しないためのロック行）
+CREATE TABLE seed_leases (
+  name TEXT PRIMARY KEY,
+  owner TEXT NOT NULL,
+  expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);